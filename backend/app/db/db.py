@@ -1,9 +1,27 @@
 import json
 import os
+import tempfile
+import threading
 from pathlib import Path
 
+from app.services.metrics import (
+    DB_BYTES_WRITTEN, DB_WRITE_SECONDS, JSON_PARSE_SECONDS, JSON_SERIALIZE_SECONDS, metrics
+)
+
 FILE = "app/db/data.json"
 
+# Highest state version written by this process; every save gets a new, unique one
+_last_version = 0
+_version_lock = threading.Lock()
+
+def bump_version(data):
+    """Mark the data as changed so caches keyed by state_version miss"""
+    global _last_version
+    with _version_lock:
+        _last_version = max(_last_version, data.get("state_version", 0)) + 1
+        data["state_version"] = _last_version
+    return _last_version
+
 def load_data():
     """Load data from JSON file with error handling"""
     try:
@@ -13,7 +31,8 @@ def load_data():
             content = f.read().strip()
             if not content:
                 return {}
-            return json.loads(content)
+            with metrics.timed(JSON_PARSE_SECONDS):
+                return json.loads(content)
     except json.JSONDecodeError:
         return {}
     except Exception as e:
@@ -22,11 +41,40 @@ def load_data():
 
 def save_data(data):
     """Save data to JSON file with error handling"""
+    bump_version(data)
+    write_payload(serialize(data))
+
+def serialize(data):
+    with metrics.timed(JSON_SERIALIZE_SECONDS):
+        return json.dumps(data, indent=2)
+
+def write_payload(payload, fsync=False):
+    """Replace the data file with already serialized data (fsync: durable on return)"""
     try:
         # Ensure directory exists
         Path(FILE).parent.mkdir(parents=True, exist_ok=True)
-        with open(FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        # Write to a temp file and swap it in, so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=Path(FILE).parent, suffix=".tmp")
+        try:
+            with metrics.timed(DB_WRITE_SECONDS):
+                with os.fdopen(fd, "w") as f:
+                    f.write(payload)
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, FILE)
+                if fsync:
+                    # Make the rename itself durable
+                    dir_fd = os.open(Path(FILE).parent, os.O_RDONLY)
+                    try:
+                        os.fsync(dir_fd)
+                    finally:
+                        os.close(dir_fd)
+            metrics.observe(DB_BYTES_WRITTEN, len(payload))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
     except Exception as e:
         print(f"Error saving data: {e}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,148 @@
+"""
+Incremental reader for arrays inside the JSON data file
+Yields one element at a time (constant memory in the array length) instead of
+json.load-ing the whole document; other values on the way are skipped the same way
+"""
+import json
+import re
+from typing import Any, Iterator, List
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+_SKIP_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamReader:
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read another chunk, dropping what was already consumed"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of input)"""
+        while True:
+            self.pos = _SKIP_WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in data file")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more input until it fits"""
+        if self.pos >= len(self.buf) or self.buf[self.pos] in _WHITESPACE:
+            self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number cut off by the chunk boundary ("2.5e" of "2.5e10") decodes as a prefix
+                complete = not isinstance(value, (int, float)) or (
+                    end < len(self.buf) and self.buf[end] in _DELIMITERS
+                )
+                if complete or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+            if not self._fill():
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                self.pos = end
+                return value
+
+    def _more(self, closing: str) -> bool:
+        """After an element/member: True if another one follows"""
+        char = self.peek()
+        if char == ",":
+            self.pos += 1
+            return True
+        self.expect(closing)
+        return False
+
+    def elements(self) -> Iterator[Any]:
+        """Elements of the array at the current position, decoded one by one"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            # Fast path: separator and the start of the next element are already buffered
+            match = _SEPARATOR.match(self.buf, self.pos)
+            if match and match.end() < len(self.buf):
+                self.pos = match.end()
+                if match.group(1) == "]":
+                    return
+            elif not self._more("]"):
+                return
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object at the current position; the caller consumes or skips each value"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if not self._more("}"):
+                return
+
+    def skip(self) -> None:
+        """Skip the next value without decoding large containers as a whole"""
+        char = self.peek()
+        if char == "[":
+            for _ in self.elements():
+                pass
+        elif char == "{":
+            for _ in self.members():
+                self.skip()
+        else:
+            self.value()
+
+    def array_at(self, path: List[str]) -> Iterator[Any]:
+        """Elements of the array at a key path such as ["wallet", "transactions"]"""
+        if self.peek() != "{":
+            self.skip()
+            return
+        for key in self.members():
+            if key != path[0]:
+                self.skip()
+            elif len(path) == 1:
+                if self.peek() == "[":
+                    yield from self.elements()
+                return  # Keys are unique; the rest of the document is not needed
+            else:
+                yield from self.array_at(path[1:])
+                return
+
+
+def iter_array(file_path: str, path: List[str]) -> Iterator[Any]:
+    """Stream the array at `path` in a JSON file; nothing if the file or key is missing"""
+    try:
+        f = open(file_path, "r")
+    except FileNotFoundError:
+        return
+    with f:
+        yield from JSONStreamReader(f).array_at(path)
@@ -0,0 +1,244 @@
+"""
+Data Store - In-memory budget document with group-committed writes
+The live document is shared by all requests: writers mutate it in place under an
+exclusive lock, so the next request sees a change at once. Committed writers join
+the open batch; a batch is flushed after COMMIT_MAX_DELAY_MS or as soon as it holds
+COMMIT_MAX_BATCH writers, written and fsynced once, and only then are its writers
+acknowledged. The document is made of tracked containers (app/db/tracked.py), so a
+writer that raises undoes just its own changes, if it made any; other writers are
+unaffected. A failed flush fails every writer not yet durable and reloads the file.
+One process owns the data file (no multi-worker deployments).
+"""
+import asyncio
+import contextvars
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.db import db, tracked
+from app.services.executors import run_io
+from app.services.metrics import DB_COMMIT_BATCH, metrics
+
+COMMIT_MAX_DELAY_MS = float(os.environ.get("COMMIT_MAX_DELAY_MS", 2))
+COMMIT_MAX_BATCH = int(os.environ.get("COMMIT_MAX_BATCH", 64))
+
+
+class ReadWriteLock:
+    """
+    Asyncio reader/writer lock, granted in arrival order: readers queued behind a
+    waiting writer wait for it, so a stream of dashboard reads can't starve writers
+    """
+
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self.waiters: Deque[Tuple[bool, asyncio.Future]] = deque()
+
+    async def acquire(self, write: bool) -> None:
+        if not self.waiters and not self.writer and (not write or self.readers == 0):
+            self._grant(write)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((write, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(write)  # Granted just as the waiter was cancelled
+            raise
+
+    def release(self, write: bool) -> None:
+        if write:
+            self.writer = False
+        else:
+            self.readers -= 1
+        self._wake()
+
+    def _grant(self, write: bool) -> None:
+        if write:
+            self.writer = True
+        else:
+            self.readers += 1
+
+    def _wake(self) -> None:
+        while self.waiters:
+            write, future = self.waiters[0]
+            if future.done():
+                self.waiters.popleft()  # cancelled
+                continue
+            if self.writer or (write and self.readers):
+                return
+            self.waiters.popleft()
+            self._grant(write)
+            future.set_result(None)
+            if write:
+                return
+
+
+class DataStore:
+    def __init__(self, max_delay_ms: float = COMMIT_MAX_DELAY_MS, max_batch: int = COMMIT_MAX_BATCH):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self.data: Optional[Dict] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lock = ReadWriteLock()
+        self.batch: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flusher: Optional[asyncio.Task] = None
+        self.stats = {"commits": 0, "flushes": 0, "largest_batch": 0}
+        self.upgrades: List[Callable[[Dict], None]] = []
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # New event loop (tests, restarts): waiters of the old one can't be resumed
+            self.loop = loop
+            self.lock = ReadWriteLock()
+            self.batch = []
+            self.timer = None
+            self.flusher = None
+        return loop
+
+    def on_load(self, upgrade: Callable[[Dict], None]) -> None:
+        """
+        Run upgrade(document) whenever the file is loaded, before anyone sees it: derived
+        state missing from older files is added once and saved with the next write
+        """
+        self.upgrades.append(upgrade)
+
+    async def _document(self) -> Dict:
+        if self.data is None:
+            data = await run_io(db.load_data)
+            if self.data is None:
+                for upgrade in self.upgrades:
+                    upgrade(data)
+                self.data = tracked.track(data)
+        return self.data
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[Dict]:
+        """Shared access; don't mutate the document"""
+        self._bind()
+        await self.lock.acquire(write=False)
+        try:
+            yield await self._document()
+        finally:
+            self.lock.release(write=False)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[Dict]:
+        """
+        Exclusive access to mutate the document in place. On normal exit the change is
+        committed and the block returns once it is durable; if the block raises, its
+        changes are undone and nothing is committed (a block that changed nothing, like
+        a handler rejecting a request, leaves no trace).
+        """
+        self._bind()
+        await self.lock.acquire(write=True)
+        try:
+            data = await self._document()
+            journal = tracked.begin()
+            try:
+                yield data
+            except BaseException:
+                journal.roll_back()
+                raise
+            finally:
+                tracked.end()
+            journal.adopt()
+            if not journal.changed:
+                return
+            db.bump_version(data)
+            durable = self._join_batch()
+        finally:
+            self.lock.release(write=True)
+        await durable
+
+    def run_from_thread(self, fn: Callable[[Dict], Any]) -> Any:
+        """Apply fn(document) as a write from a worker thread; returns fn's result once durable"""
+        if self.loop is None:
+            raise RuntimeError("The data store has not been used on an event loop yet")
+
+        async def apply():
+            async with self.write() as data:
+                return fn(data)
+
+        return asyncio.run_coroutine_threadsafe(apply(), self.loop).result()
+
+    def _join_batch(self) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.batch.append(future)
+        self.stats["commits"] += 1
+        if len(self.batch) >= self.max_batch:
+            self._flush_soon()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(self.max_delay, self._flush_soon)
+        return future
+
+    def _flush_soon(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        # A running flush picks the batch up as soon as it finishes. It writes for the
+        # whole batch, so it doesn't run in the context of the request that started it
+        # (its serialize/write metrics are labelled "background")
+        if self.flusher is None or self.flusher.done():
+            self.flusher = self.loop.create_task(self._flush(), context=contextvars.Context())
+
+    async def _flush(self) -> None:
+        while self.batch:
+            waiters: List[asyncio.Future] = []
+            try:
+                # Serialize a consistent snapshot (no writer mid-change), then write without the lock
+                await self.lock.acquire(write=False)
+                try:
+                    # Everyone committed so far is in this snapshot, including writers that
+                    # queued ahead of the flusher, so the batch can outgrow max_batch
+                    waiters, self.batch = self.batch, []
+                    if self.timer is not None:
+                        self.timer.cancel()
+                        self.timer = None
+                    payload = await run_io(db.serialize, self.data)
+                finally:
+                    self.lock.release(write=False)
+                await run_io(db.write_payload, payload, True)
+            except Exception as e:
+                # Writers that committed while the payload was written built on the lost
+                # changes: fail them too and go back to what is on disk
+                await self.lock.acquire(write=True)
+                try:
+                    waiters, self.batch = waiters + self.batch, []
+                    if self.timer is not None:
+                        self.timer.cancel()
+                        self.timer = None
+                    self.invalidate()
+                finally:
+                    self.lock.release(write=True)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+            self.stats["flushes"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(waiters))
+            if metrics.enabled:
+                DB_COMMIT_BATCH.observe(len(waiters), ())
+
+    async def flush(self) -> None:
+        """Flush the open batch now and wait for it (shutdown)"""
+        if self.loop is not asyncio.get_running_loop():
+            return
+        if self.batch:
+            self._flush_soon()
+        if self.flusher is not None:
+            await self.flusher
+
+    def invalidate(self) -> None:
+        """Drop the in-memory document so the next access reloads the file (after external edits)"""
+        self.data = None
+
+
+store = DataStore()
@@ -0,0 +1,245 @@
+"""
+Tracked containers - the live document's dicts and lists, journaling their changes
+While a write is open, every mutation through a container's methods records how to
+undo it (the old value of a key, the length before an append, or a shallow copy for
+bulk changes), so a writer that raises can be undone in place without touching what
+other writers committed. Plain dicts and lists a writer puts into the document are
+converted when it commits; until then their own changes need no undo, since undoing
+their insertion removes them. C helpers that bypass the methods (heapq) must call
+will_change() on the list first.
+"""
+from typing import Any, Callable, List, Optional, Tuple
+
+_MISSING = object()
+_journal: Optional["Journal"] = None
+
+
+def _restore_key(d: dict, key: Any, old: Any) -> None:
+    if old is _MISSING:
+        dict.pop(d, key, None)
+    else:
+        dict.__setitem__(d, key, old)
+
+
+def _restore_dict(d: dict, snapshot: dict) -> None:
+    dict.clear(d)
+    dict.update(d, snapshot)
+
+
+def _truncate(lst: list, length: int) -> None:
+    list.__delitem__(lst, slice(length, None))
+
+
+def _restore_list(lst: list, snapshot: list) -> None:
+    list.__setitem__(lst, slice(None), snapshot)
+
+
+class Journal:
+    """Changes of the open write: undo steps, and plain containers to convert on commit"""
+
+    def __init__(self):
+        self.undo: List[Tuple[Callable, tuple]] = []
+        self.added: List[Tuple[Any, Any, Any]] = []  # (parent, key or None for lists, value)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.undo)
+
+    def roll_back(self) -> None:
+        for step, args in reversed(self.undo):
+            step(*args)
+        self.undo.clear()
+        self.added.clear()
+
+    def adopt(self) -> None:
+        """Convert the plain containers still in the document, so later writes are journaled"""
+        for parent, key, value in self.added:
+            if key is not None:
+                if dict.get(parent, key, _MISSING) is value:
+                    dict.__setitem__(parent, key, track(value))
+                continue
+            # Appended, most likely: look from the end
+            for i in range(len(parent) - 1, -1, -1):
+                if parent[i] is value:
+                    list.__setitem__(parent, i, track(value))
+                    break
+        self.added.clear()
+
+
+def begin() -> Journal:
+    """Journal the changes of a write (the store's write lock makes it the only one)"""
+    global _journal
+    _journal = Journal()
+    return _journal
+
+
+def end() -> None:
+    global _journal
+    _journal = None
+
+
+def track(value: Any) -> Any:
+    """value with its plain dicts and lists (at any depth) converted; tracked ones are kept"""
+    if type(value) is dict:
+        return TrackedDict((k, track(v)) for k, v in value.items())
+    if type(value) is list:
+        return TrackedList(track(v) for v in value)
+    return value
+
+
+def will_change(lst: list) -> None:
+    """Call before changing a tracked list in a way its methods don't see"""
+    if _journal is not None and isinstance(lst, TrackedList):
+        _journal.undo.append((_restore_list, (lst, list(lst))))
+
+
+def _added(parent: Any, key: Any, value: Any) -> None:
+    if type(value) is dict or type(value) is list:
+        _journal.added.append((parent, key, value))
+
+
+class TrackedDict(dict):
+    __slots__ = ()
+
+    def __reduce_ex__(self, protocol):
+        # Copies and pickles are plain dicts
+        return dict, (dict(self),)
+
+    def _undo_key(self, key: Any) -> None:
+        _journal.undo.append((_restore_key, (self, key, dict.get(self, key, _MISSING))))
+
+    def _snapshot(self) -> None:
+        _journal.undo.append((_restore_dict, (self, dict(self))))
+
+    def __setitem__(self, key, value):
+        if _journal is not None:
+            self._undo_key(key)
+            _added(self, key, value)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if _journal is not None and key in self:
+            self._undo_key(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        if _journal is not None and key in self:
+            self._undo_key(key)
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        if _journal is not None and key not in self:
+            self._undo_key(key)
+            _added(self, key, default)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        if _journal is None:
+            return dict.update(self, *args, **kwargs)
+        self._snapshot()
+        changes = dict(*args, **kwargs)
+        for key, value in changes.items():
+            _added(self, key, value)
+        dict.update(self, changes)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def popitem(self):
+        if _journal is not None and self:
+            self._snapshot()
+        return dict.popitem(self)
+
+    def clear(self):
+        if _journal is not None and self:
+            self._snapshot()
+        dict.clear(self)
+
+
+class TrackedList(list):
+    __slots__ = ()
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+    def _snapshot(self) -> None:
+        _journal.undo.append((_restore_list, (self, list(self))))
+
+    def append(self, value):
+        if _journal is not None:
+            _journal.undo.append((_truncate, (self, len(self))))
+            _added(self, None, value)
+        list.append(self, value)
+
+    def extend(self, values):
+        if _journal is None:
+            return list.extend(self, values)
+        values = list(values)
+        _journal.undo.append((_truncate, (self, len(self))))
+        for value in values:
+            _added(self, None, value)
+        list.extend(self, values)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def insert(self, index, value):
+        if _journal is not None:
+            self._snapshot()
+            _added(self, None, value)
+        list.insert(self, index, value)
+
+    def pop(self, index=-1):
+        value = list.pop(self, index)
+        if _journal is not None:
+            position = index if index >= 0 else len(self) + 1 + index
+            _journal.undo.append((list.insert, (self, position, value)))
+        return value
+
+    def __setitem__(self, index, value):
+        if _journal is not None:
+            if isinstance(index, slice):
+                self._snapshot()
+                value = list(value)
+                for item in value:
+                    _added(self, None, item)
+            else:
+                _journal.undo.append((list.__setitem__, (self, index, list.__getitem__(self, index))))
+                _added(self, None, value)
+        list.__setitem__(self, index, value)
+
+    def __delitem__(self, index):
+        if _journal is not None:
+            if isinstance(index, slice):
+                self._snapshot()
+            else:
+                position = index if index >= 0 else len(self) + index
+                _journal.undo.append((list.insert, (self, position, list.__getitem__(self, index))))
+        list.__delitem__(self, index)
+
+    def remove(self, value):
+        if _journal is not None:
+            self._snapshot()
+        list.remove(self, value)
+
+    def clear(self):
+        if _journal is not None and self:
+            self._snapshot()
+        list.clear(self)
+
+    def sort(self, *args, **kwargs):
+        if _journal is not None:
+            self._snapshot()
+        list.sort(self, *args, **kwargs)
+
+    def reverse(self):
+        if _journal is not None:
+            self._snapshot()
+        list.reverse(self)
+
+    def __imul__(self, n):
+        if _journal is not None:
+            self._snapshot()
+        return list.__imul__(self, n)
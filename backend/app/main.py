@@ -1,8 +1,50 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import budget, expenses, payment, shopping, wallet
+from fastapi.responses import PlainTextResponse
+from app.db.store import store
+from app.services.admission import AdmissionMiddleware
+from app.routes import admin, budget, expenses, export, ledger, payment, shopping, wallet
+from app.services.vendor_aggregator import aggregator
+from app.services.receipt_batch import ReceiptBatchProcessor
+from app.services.receipt_fingerprint import receipt_index
+from app.services.executors import run_io
+from app.services.job_queue import job_queue
+from app.services.metrics import MetricsMiddleware, metrics
+from app.services.money_requests import expiry_scheduler
+from app.services.profiler import ProfilerMiddleware, profiler
+from app.services.reconciler import reconciler
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bind the store to this loop (recovered jobs write through it) and load the document
+    async with store.read():
+        pass
+    # Duplicate receipt lookups run inside writes; read their log before the first one
+    await run_io(receipt_index.load)
+    # Pooled vendor client, built before the first search rather than inside its deadline
+    await aggregator.start()
+    # Jobs left queued or running by the last process pick up where they were
+    job_queue.start()
+    reconciler.start()
+    expiry_scheduler.start()
+    yield
+    await expiry_scheduler.stop()
+    await reconciler.stop()
+    # Release pooled vendor connections
+    await aggregator.close()
+    ReceiptBatchProcessor.shutdown()
+    await job_queue.stop()
+    # Index changes a failed save left queued
+    await run_io(receipt_index.save)
+    # Acknowledged writes are already durable; this drains a batch still waiting on its timer
+    await store.flush()
+    profiler.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Inside CORS, so browsers can read 429/503 rejections (and their Retry-After)
+app.add_middleware(AdmissionMiddleware)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -11,14 +53,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+app.add_middleware(ProfilerMiddleware)
+
+# Outermost, so request timing covers CORS handling too
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
-def root():
+async def root():
     return {"message": "KYFH-Interac API", "status": "running"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of request and hot-path histograms"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(budget.router)
 app.include_router(expenses.router)
 app.include_router(payment.router)
 app.include_router(shopping.router)
-app.include_router(wallet.router)
\ No newline at end of file
+app.include_router(wallet.router)
+app.include_router(export.router)
+app.include_router(ledger.router)
+app.include_router(admin.router)
\ No newline at end of file
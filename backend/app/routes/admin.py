@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+import hmac
+import os
+from app.services.admission import admission
+from app.services.profiler import RequestProfiler, profiler
+from app.services.reconciler import reconciler
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need ADMIN_TOKEN set on the server and sent as X-Admin-Token"""
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+class ProfileSession(BaseModel):
+    requests: Optional[int] = Field(None, gt=0, description="Profile the next N requests")
+    seconds: Optional[float] = Field(None, gt=0, le=3600, description="Profile every request for this long")
+    path_prefix: Optional[str] = Field(None, description="Only requests whose path starts with this")
+
+class ProfilerSettings(BaseModel):
+    slow_threshold_ms: Optional[float] = Field(None, ge=0, description="Capture requests slower than this (0 = off)")
+    interval_ms: Optional[float] = Field(None, ge=1, le=1000, description="Sampling interval")
+
+@router.get("/profiler")
+async def get_profiler():
+    """Profiler settings, the active session and captured profiles (newest first)"""
+    return {
+        **profiler.settings(),
+        "session": profiler.describe_session(),
+        "profiles": profiler.list_profiles()
+    }
+
+@router.post("/profiler/settings")
+async def update_profiler_settings(payload: ProfilerSettings):
+    if payload.slow_threshold_ms is not None:
+        profiler.slow_ms = payload.slow_threshold_ms
+    if payload.interval_ms is not None:
+        profiler.interval_ms = payload.interval_ms
+    return profiler.settings()
+
+@router.post("/profiler/session")
+async def start_profile_session(payload: ProfileSession):
+    """Attach the sampler to the next N requests and/or a time window"""
+    if payload.requests is None and payload.seconds is None:
+        raise HTTPException(status_code=400, detail="Give a number of requests, a time window in seconds, or both")
+    return profiler.start_session(payload.requests, payload.seconds, payload.path_prefix)
+
+@router.delete("/profiler/session")
+async def stop_profile_session():
+    profiler.stop_session()
+    return {"status": "stopped"}
+
+@router.get("/profiles/collapsed", response_class=PlainTextResponse)
+async def download_all_profiles(reason: Optional[Literal["slow", "session"]] = None):
+    """Every captured profile merged, as collapsed stacks (flamegraph.pl / speedscope input)"""
+    return RequestProfiler.collapsed(profiler.all_profiles(reason))
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    profile = profiler.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {k: v for k, v in profile.items() if k != "samples"}
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def download_profile(profile_id: str):
+    profile = profiler.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return RequestProfiler.collapsed([profile])
+
+@router.delete("/profiles")
+async def clear_profiles():
+    profiler.clear()
+    return {"status": "cleared"}
+
+@router.get("/reconciliation")
+async def get_reconciliation():
+    """Reconciler settings and recent reports (newest first, without their discrepancy lists)"""
+    return {
+        **reconciler.settings(),
+        "reports": reconciler.list_reports()
+    }
+
+@router.post("/reconciliation/run")
+async def run_reconciliation(repair: bool = False):
+    """Reconcile now; with repair=true, derived totals that disagree are reset from the records"""
+    return await reconciler.run(repair=repair)
+
+@router.get("/reconciliation/{report_id}")
+async def get_reconciliation_report(report_id: str):
+    report = reconciler.get(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
+
+@router.get("/admission")
+async def get_admission():
+    """Rate limit policies, concurrency limiter state and admit/reject counters"""
+    return admission.settings()
@@ -1,66 +1,174 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from app.services.budget_splitter import split_budget
-from app.services.ai_logic import generate_feedback, get_ai_recommendations
-from app.db.db import save_data, load_data
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Any, Dict, FrozenSet, List, Optional
+import uuid
+from app.services.budget_splitter import AllocationStats, DEFAULT_SHARES, overspend_risk, split_budget
+from app.services.ai_logic import describe_ai_rules, get_dashboard_insights
+from app.routes.dependencies import ReadData, WriteData, field_selection, select_fields
+from app.services.executors import json_response, run_cpu
+from app.services.ledger import FUNDING, TOLERANCE, UNALLOCATED, Ledger, category_account
+from app.services.money_requests import MoneyRequests
 
 router = APIRouter()
 
+class CategoryLimit(BaseModel):
+    min: float = Field(0, ge=0, description="Minimum allocation for the category")
+    max: Optional[float] = Field(None, gt=0, description="Maximum allocation for the category")
+
 class BudgetCreate(BaseModel):
-    total_budget: float = Field(..., gt=0, description="Total budget must be greater than 0")
+    total_budget: float = Field(..., ge=0.01, description="Total budget must be at least $0.01")
+    categories: Optional[List[str]] = Field(None, description="Category names (default: food, venue, decor, misc)")
+    constraints: Dict[str, CategoryLimit] = Field(default_factory=dict, description="Per-category min/max amounts")
+
+class ExpenseRecord(BaseModel):
+    model_config = ConfigDict(extra="allow")  # receipt and verification details vary per expense
+
+    id: Optional[str] = None
+    amount: float
+    category: str
+    vendor_name: Optional[str] = None
+    status: Optional[str] = None
+    timestamp: Optional[str] = None
+
+class Recommendation(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    type: str
+    action: str
+    reason: Optional[str] = None
+    priority: Optional[str] = None
+
+class CategoryForecast(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    category: str
+    remaining: float
+    daily_rate: float
+    days_left: Optional[float] = None
+    depletion_date: Optional[str] = None
+    confidence: Optional[float] = None
+    risk_level: Optional[str] = None
+
+class Dashboard(BaseModel):
+    model_config = ConfigDict(extra="allow")  # the rest of the budget document
+
+    budget_id: Optional[str] = None
+    total_budget: float = 0
+    categories: Dict[str, float] = {}
+    expenses: List[ExpenseRecord] = []
+    remaining: float = 0
+    wallet: Optional[Dict[str, Any]] = None
+    transactions: List[Dict[str, Any]] = []
+    money_requests: List[Dict[str, Any]] = []
+    feedback: str = ""
+    recommendations: List[Recommendation] = []
+    overspend_forecast: List[CategoryForecast] = []
+
+DashboardFields = Annotated[Optional[FrozenSet[str]], Depends(field_selection(Dashboard))]
+INSIGHT_FIELDS = frozenset(("feedback", "recommendations", "overspend_forecast"))
+# Derived bookkeeping kept in the document for the services that maintain it
+INTERNAL_FIELDS = frozenset(("ledger", "money_request_index", "allocation_stats", "forecast_state", "state_version"))
 
 @router.post("/create-budget")
-def create_budget(payload: BudgetCreate):
+async def create_budget(payload: BudgetCreate, data: WriteData):
     try:
         total = payload.total_budget
+        categories = payload.categories or list(DEFAULT_SHARES)
+        
+        if len(set(categories)) != len(categories) or not all(c.strip() for c in categories):
+            raise HTTPException(status_code=400, detail="Category names must be unique and non-empty")
+        
+        unknown = [c for c in payload.constraints if c not in categories]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Constraints for unknown categories: {', '.join(unknown)}")
+        
+        constraints = {
+            cat: {"min": limit.min, "max": limit.max if limit.max is not None else total}
+            for cat, limit in payload.constraints.items()
+        }
         
-        # Load previous data to learn from historical patterns
-        old_data = load_data()
-        historical_expenses = old_data.get("expenses", []) if old_data else []
+        # Learn from the previous budget: its spending is folded into the club's statistics
+        stats = AllocationStats.carry_over(data)
         
         # AI learns from past spending and adapts allocation
-        categories = split_budget(total, historical_expenses)
+        try:
+            allocation = split_budget(total, stats=stats, categories=categories, constraints=constraints)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        distribution = AllocationStats.distribution(stats, categories)
 
-        data = {
+        new_data = {
+            "budget_id": f"BUD-{uuid.uuid4().hex[:8].upper()}",
             "total_budget": total,
-            "categories": categories,
+            "categories": {cat: 0.0 for cat in allocation},
             "expenses": [],
-            "remaining": total
+            "remaining": 0.0,
+            "allocation_stats": stats,
+            "ledger": {"entries": [], "balances": {}}
         }
+        if "auto_rebalance" in data:
+            new_data["auto_rebalance"] = data["auto_rebalance"]  # opt-in is per club, not per budget
 
-        save_data(data)
+        # Replace the live document in place (receipts of the old expenses stay indexed, under their budget)
+        data.clear()
+        data.update(new_data)
+        
+        # Fund the categories; whatever the split leaves over stays unallocated
+        transfers = [(FUNDING, category_account(cat), amount) for cat, amount in allocation.items() if amount > 0]
+        leftover = total - sum(allocation.values())
+        if leftover >= TOLERANCE:
+            transfers.append((FUNDING, UNALLOCATED, leftover))
+        elif leftover <= -TOLERANCE:
+            transfers.append((UNALLOCATED, FUNDING, -leftover))
+        Ledger.post(data, "budget", transfers, "Budget allocation", data["budget_id"])
         
         learning_msg = ""
-        if len(historical_expenses) > 0:
-            learning_msg = f" (AI adapted based on {len(historical_expenses)} previous expenses)"
+        if stats["budgets"] > 0:
+            learning_msg = f" (AI adapted based on {stats['budgets']} previous budget{'s' if stats['budgets'] != 1 else ''})"
         
         return {
             "status": "ok", 
-            "categories": categories,
+            "categories": allocation,
+            "overspend_risk": overspend_risk(allocation, total, distribution),
             "message": f"Budget created with AI-optimized allocations{learning_msg}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/dashboard")
-def get_dashboard():
-    data = load_data()
+@router.get("/dashboard", response_model=Dashboard)
+async def get_dashboard(data: ReadData, fields: DashboardFields):
     if not data:
-        return {
+        return await json_response(select_fields({
             "total_budget": 0,
             "categories": {},
             "expenses": [],
             "remaining": 0,
             "feedback": "No budget created yet",
-            "recommendations": []
-        }
+            "recommendations": [],
+            "overspend_forecast": []
+        }, fields))
     
-    # Generate intelligent AI feedback and autonomous recommendations
-    feedback = generate_feedback(data)
-    recommendations = get_ai_recommendations(data)
+    # Intelligent AI feedback and autonomous recommendations, cached until the budget changes;
+    # skipped when the client selected none of them
+    insights = {}
+    if fields is None or fields & INSIGHT_FIELDS:
+        insights = await run_cpu(get_dashboard_insights, data)
     
-    return {
-        **data, 
-        "feedback": feedback,
-        "recommendations": recommendations
-    }
\ No newline at end of file
+    # Internal state is left out (the ledger is served by /ledger); settled money
+    # requests stay in the history (/export) and only pending ones are listed.
+    # The rest of the document is encoded as is: json_response bypasses the model, which
+    # only documents it (validating every expense would cost more than encoding it)
+    if fields is None:
+        dashboard = {key: value for key, value in data.items() if key not in INTERNAL_FIELDS}
+    else:
+        dashboard = {key: data[key] for key in fields - INTERNAL_FIELDS if key in data}
+    if fields is None or "money_requests" in fields:
+        dashboard["money_requests"] = MoneyRequests.active(data)
+    return await json_response(select_fields({**dashboard, **insights}, fields))
+
+@router.get("/ai-rules")
+async def get_ai_rules():
+    """Recommendation and feedback rules in evaluation order, with per-rule timing"""
+    return describe_ai_rules()
\ No newline at end of file
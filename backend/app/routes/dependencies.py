@@ -0,0 +1,43 @@
+from fastapi import Depends, HTTPException, Query
+from pydantic import BaseModel
+from typing import Annotated, Any, Dict, FrozenSet, Optional, Type
+from app.db.store import store
+
+async def read_document():
+    async with store.read() as data:
+        yield data
+
+async def write_document():
+    async with store.write() as data:
+        yield data
+
+# scope="function" releases the lock once the response body is built, so it covers
+# serialization; a write's response is sent only after its batch is durable
+ReadData = Annotated[Dict, Depends(read_document, scope="function")]
+WriteData = Annotated[Dict, Depends(write_document, scope="function")]
+
+def field_selection(*models: Type[BaseModel]):
+    """
+    Dependency for ?fields=a,b (comma-separated): the names are checked against the
+    response models' declared fields; None when the parameter is absent (everything)
+    """
+    allowed = [name for model in models for name in model.model_fields]
+    known = frozenset(allowed)
+
+    async def selected_fields(
+        fields: Optional[str] = Query(None, description=f"Only these fields (comma-separated): {', '.join(dict.fromkeys(allowed))}")
+    ) -> Optional[FrozenSet[str]]:
+        if fields is None:
+            return None
+        selected = frozenset(name.strip() for name in fields.split(",") if name.strip())
+        unknown = selected - known
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return selected
+
+    return selected_fields
+
+def select_fields(record: Dict[str, Any], fields: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return record
+    return {key: value for key, value in record.items() if key in fields}
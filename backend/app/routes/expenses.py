@@ -1,40 +1,60 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
-from app.db.db import load_data, save_data
-from app.services.receipt_processor import ReceiptProcessor
+import base64
+import binascii
+import json
+import uuid
+from app.db.store import store
+from app.routes.dependencies import ReadData, WriteData
+from app.services.ocr_pipeline import process_upload
+from app.services.receipt_batch import ReceiptBatchProcessor
+from app.services.receipt_fingerprint import receipt_index
+from app.services.job_queue import job_queue
+from app.services.auto_rebalancer import AutoRebalancer
+from app.services.expense_events import expense_added, expense_removed
+from app.services.executors import run_io
+from app.services.ledger import Ledger, category_account, spent_account, vendor_account
 from app.services.wallet_service import WalletService
 
 router = APIRouter()
 
 class ExpenseCreate(BaseModel):
-    amount: float = Field(..., gt=0, description="Amount must be greater than 0")
+    amount: float = Field(..., ge=0.01, description="Amount must be at least $0.01")
     category: str = Field(..., min_length=1, description="Category is required")
     vendor_name: str = Field(default="", description="Vendor/supplier name")
 
 class ReceiptUpload(BaseModel):
-    receipt_text: str = Field(..., min_length=1, description="Text extracted from receipt/bill")
+    receipt_text: Optional[str] = Field(None, description="Text extracted from receipt/bill")
+    file_base64: Optional[str] = Field(None, description="Receipt image (PNG/JPEG) or PDF, base64-encoded")
     filename: str = Field(..., min_length=1, description="Original filename")
     category: Optional[str] = Field(None, description="Optional: User-specified category")
+    priority: int = Field(5, ge=0, le=9, description="Queue priority (0 = most urgent)")
+
+class BatchReceiptUpload(BaseModel):
+    receipts: List[ReceiptUpload] = Field(..., description="Receipts to process in parallel")
 
 class ExpenseDelete(BaseModel):
     expense_index: int = Field(..., ge=0, description="Expense index must be 0 or greater")
 
+class AutoRebalanceSettings(BaseModel):
+    enabled: bool = Field(..., description="Rebalance categories automatically after each expense")
+    min_days_left: float = Field(3.0, gt=0, description="Keep every category funded for at least this many days")
+
 class FundReallocation(BaseModel):
     from_category: str = Field(..., min_length=1)
     to_category: str = Field(..., min_length=1)
-    amount: float = Field(..., gt=0)
+    amount: float = Field(..., ge=0.01)
 
 @router.post("/add-expense")
-def add_expense(payload: ExpenseCreate):
+async def add_expense(payload: ExpenseCreate, data: WriteData):
     try:
-        data = load_data()
-        
         if not data:
             raise HTTPException(status_code=400, detail="No budget created yet")
         
-        amount = payload.amount
+        amount = round(payload.amount, 2)  # as the ledger records it
         category = payload.category
         
         if category not in data.get("categories", {}):
@@ -51,127 +71,306 @@ def add_expense(payload: ExpenseCreate):
             "timestamp": datetime.now().isoformat()
         }
 
+        Ledger.post(data, "expense", [(category_account(category), spent_account(category), amount)],
+                    expense_entry["vendor_name"])
         data["expenses"].append(expense_entry)
-        data["categories"][category] -= amount
-        data["remaining"] -= amount
+        rebalance = expense_added(data, expense_entry)
 
-        save_data(data)
-        return {"status": "added", "remaining": data["remaining"]}
+        response = {"status": "added", "remaining": data["remaining"]}
+        if rebalance:
+            response["auto_rebalance"] = rebalance
+        return response
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload-receipt")
-def upload_receipt(payload: ReceiptUpload):
+def check_receipt_content(receipt: ReceiptUpload) -> None:
+    """A receipt needs either its text or the uploaded file, decodable the way the pipeline decodes it"""
+    if not (receipt.receipt_text or "").strip() and not receipt.file_base64:
+        raise HTTPException(status_code=400, detail="Provide receipt_text or file_base64")
+    if receipt.file_base64:
+        try:
+            base64.b64decode(receipt.file_base64, validate=True)
+        except binascii.Error:
+            raise HTTPException(status_code=400, detail=f"file_base64 of {receipt.filename} is not valid base64")
+
+def log_receipt_expense(data: Dict, result: Dict, job_id: Optional[str] = None) -> Dict:
+    """
+    Validate a processed receipt against the budget and log it as an expense
+    (recording the receipt job that logged it, if any).
+    Raises HTTPException(400) if the receipt can't be logged.
+    """
+    verification = result["verification"]
+    amount = result["amount"]
+    category = result["category"]
+    
+    # Validation
+    if amount == 0:
+        raise HTTPException(
+            status_code=400, 
+            detail="Could not extract valid amount from receipt. Please enter manually."
+        )
+    
+    if category not in data.get("categories", {}):
+        # Default to misc if AI category not in budget
+        category = "misc"
+        if category not in data.get("categories", {}):
+            category = list(data["categories"].keys())[0]  # Fallback to first category
+    
+    if amount > data["remaining"]:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Expense amount ${amount:.2f} exceeds remaining budget ${data['remaining']:.2f}"
+        )
+    
+    # Same receipt uploaded before, under this budget or an earlier one?
+    duplicate = receipt_index.find_duplicate(result["fingerprint"])
+    if duplicate:
+        earlier = "" if duplicate["budget_id"] == data.get("budget_id") else ", from an earlier budget"
+        verification["flags"] = verification.get("flags", []) + [
+            f"Duplicate of expense {duplicate['expense_id']} ({duplicate['match']} match{earlier})"
+        ]
+        verification["status"] = "suspicious"
+    
+    # Auto-log expense with verification data
+    expense_entry = {
+        "id": f"EXP-{uuid.uuid4().hex[:8].upper()}",
+        "amount": amount,
+        "category": category,
+        "receipt_verified": True,
+        "verification_status": verification["status"],
+        "verification_confidence": verification["confidence"],
+        "verification_flags": verification.get("flags", []),
+        "ai_suggested_category": result["ai_suggested_category"],
+        "filename": result["filename"],
+        "processed_at": result["processed_at"],
+        "duplicate_of": duplicate["expense_id"] if duplicate else None
+    }
+    if job_id:
+        expense_entry["receipt_job_id"] = job_id
+    
+    Ledger.post(data, "expense", [(category_account(category), spent_account(category), amount)],
+                result["filename"], expense_entry["id"])
+    data["expenses"].append(expense_entry)
+    expense_added(data, expense_entry)
+    receipt_index.add(expense_entry["id"], result["fingerprint"], data.get("budget_id"))
+    
+    return expense_entry
+
+def save_receipt_index() -> None:
+    """
+    Write the index changes (blocking). The expense write is already settled, so a
+    failure doesn't fail the request: the changes stay queued for the next save.
+    """
+    try:
+        receipt_index.save()
+    except OSError as e:
+        print(f"Receipt index not saved, retrying with the next save: {e}")
+
+def logged_by_job(data: Dict, job_id: str) -> Optional[Dict]:
+    """The expense a receipt job already logged, newest first"""
+    return next((e for e in reversed(data.get("expenses", [])) if e.get("receipt_job_id") == job_id), None)
+
+def process_receipt_job(payload: Dict, job_id: str, resumed: bool = False) -> Dict:
+    """
+    Background receipt job: OCR, verify and extract in parallel with other jobs,
+    then log the expense as a store write (returns once it is durable).
+    A job resumed after a restart may have logged its expense before the restart;
+    it is then not logged again.
+    """
+    result = process_upload(payload)
+    
+    indexed = []
+    
+    def commit(data: Dict) -> Dict:
+        if not data:
+            raise HTTPException(status_code=400, detail="No budget created yet")
+        expense = logged_by_job(data, job_id) if resumed else None
+        if expense is None:
+            expense = log_receipt_expense(data, result, job_id)
+            indexed.append(expense["id"])
+        return {"expense": expense, "remaining": data["remaining"]}
+    
+    try:
+        committed = store.run_from_thread(commit)
+    except Exception:
+        # The write was rolled back; don't leave its receipt in the duplicate index
+        receipt_index.remove(indexed)
+        raise
+    finally:
+        save_receipt_index()  # jobs run on a worker thread, so blocking is fine here
+    
+    verification = result["verification"]
+    return {
+        "status": "success",
+        "message": "Receipt processed and expense auto-logged",
+        "expense": committed["expense"],
+        "verification": verification,
+        "remaining": committed["remaining"],
+        "warning": "Review flagged issues" if verification["status"] != "verified" else None
+    }
+
+job_queue.register("receipt", process_receipt_job)
+
+@router.post("/upload-receipt", status_code=202)
+async def upload_receipt(payload: ReceiptUpload, data: ReadData):
     """
     AI-powered receipt processing: Verify authenticity, extract amount, auto-log expense
+    Queued as a background job; poll /receipt-jobs/{job_id} for the result
     """
     try:
-        data = load_data()
-        
         if not data:
             raise HTTPException(status_code=400, detail="No budget created yet")
         
-        # Process receipt with AI
-        result = ReceiptProcessor.process_receipt(
-            text=payload.receipt_text,
-            filename=payload.filename,
-            user_category=payload.category
-        )
-        
-        verification = result["verification"]
-        amount = result["amount"]
-        category = result["category"]
-        
-        # Validation
-        if amount == 0:
-            raise HTTPException(
-                status_code=400, 
-                detail="Could not extract valid amount from receipt. Please enter manually."
-            )
-        
-        if category not in data.get("categories", {}):
-            # Default to misc if AI category not in budget
-            category = "misc"
-            if category not in data.get("categories", {}):
-                category = list(data["categories"].keys())[0]  # Fallback to first category
-        
-        if amount > data["remaining"]:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Expense amount ${amount:.2f} exceeds remaining budget ${data['remaining']:.2f}"
-            )
-        
-        # Auto-log expense with verification data
-        expense_entry = {
-            "amount": amount,
-            "category": category,
-            "receipt_verified": True,
-            "verification_status": verification["status"],
-            "verification_confidence": verification["confidence"],
-            "verification_flags": verification.get("flags", []),
-            "ai_suggested_category": result["ai_suggested_category"],
-            "filename": result["filename"],
-            "processed_at": result["processed_at"]
-        }
-        
-        data["expenses"].append(expense_entry)
-        data["categories"][category] -= amount
-        data["remaining"] -= amount
-
-        save_data(data)
+        check_receipt_content(payload)
+        job = await job_queue.submit("receipt", payload.dict(exclude={"priority"}), payload.priority)
         
         return {
-            "status": "success",
-            "message": "Receipt processed and expense auto-logged",
-            "expense": expense_entry,
-            "verification": verification,
-            "remaining": data["remaining"],
-            "warning": "Review flagged issues" if verification["status"] != "verified" else None
+            "status": "queued",
+            "message": "Receipt queued for verification",
+            "job_id": job["id"],
+            "status_url": f"/receipt-jobs/{job['id']}"
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/receipt-jobs/{job_id}")
+async def get_receipt_job(job_id: str):
+    """Status of a queued receipt; result holds the logged expense once completed"""
+    job = await run_io(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+def commit_receipt_results(data: Dict, results: List[Dict]):
+    """Log a batch's expenses in upload order (so budget checks are deterministic) in one write"""
+    logged = []
+    rejected = []
+    try:
+        for index, result in enumerate(results):
+            if "error" in result:
+                rejected.append({"index": index, "detail": result["error"]})
+                continue
+            try:
+                expense = log_receipt_expense(data, result)
+                logged.append({"index": index, "expense": expense})
+            except HTTPException as e:
+                rejected.append({"index": index, "detail": e.detail})
+    except Exception:
+        # The write will be rolled back
+        receipt_index.remove([entry["expense"]["id"] for entry in logged])
+        raise
+    return logged, rejected
+
+@router.post("/upload-receipts")
+async def upload_receipts(payload: BatchReceiptUpload, data: ReadData):
+    """
+    Batch receipt processing: receipts are parsed and verified in parallel worker
+    processes, each result is streamed back (NDJSON) as soon as it finishes, and
+    all resulting expenses are committed together in a single write
+    """
+    if not data:
+        raise HTTPException(status_code=400, detail="No budget created yet")
+    
+    if not payload.receipts:
+        raise HTTPException(status_code=400, detail="No receipts provided")
+    
+    for receipt in payload.receipts:
+        check_receipt_content(receipt)
+    
+    receipts = [r.dict() for r in payload.receipts]
+    
+    async def stream():
+        results = [None] * len(receipts)
+        
+        async for index, result in ReceiptBatchProcessor.process_stream(receipts):
+            results[index] = result
+            if "error" in result:
+                yield json.dumps({"type": "error", "index": index, **result}) + "\n"
+            else:
+                yield json.dumps({
+                    "type": "processed",
+                    "index": index,
+                    "filename": result["filename"],
+                    "amount": result["amount"],
+                    "category": result["category"],
+                    "verification": result["verification"]
+                }) + "\n"
+        
+        logged = []  # set once the batch is logged; a failed commit still has to forget it
+        try:
+            async with store.write() as data:
+                logged, rejected = commit_receipt_results(data, results)
+                remaining = data["remaining"]
+            yield json.dumps({
+                "type": "summary",
+                "status": "success",
+                "logged": logged,
+                "rejected": rejected,
+                "remaining": remaining
+            }) + "\n"
+        except Exception as e:
+            # Rolled back: forget the receipts this write had indexed
+            receipt_index.remove([entry["expense"]["id"] for entry in logged])
+            yield json.dumps({"type": "summary", "status": "error", "detail": str(e)}) + "\n"
+        finally:
+            await run_io(save_receipt_index)
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.post("/delete-expense")
-def delete_expense(payload: ExpenseDelete):
+async def delete_expense(payload: ExpenseDelete):
     try:
-        data = load_data()
-        
-        if not data or not data.get("expenses"):
-            raise HTTPException(status_code=400, detail="No expenses to delete")
-        
-        index = payload.expense_index
-        
-        if index >= len(data["expenses"]):
-            raise HTTPException(status_code=400, detail="Invalid expense index")
-        
-        # Get the expense to delete
-        expense = data["expenses"][index]
-        amount = expense["amount"]
-        category = expense["category"]
-        
-        # Restore the amount to category and remaining
-        data["categories"][category] += amount
-        data["remaining"] += amount
+        async with store.write() as data:
+            if not data or not data.get("expenses"):
+                raise HTTPException(status_code=400, detail="No expenses to delete")
+            
+            index = payload.expense_index
+            
+            if index >= len(data["expenses"]):
+                raise HTTPException(status_code=400, detail="Invalid expense index")
+            
+            # Get the expense to delete
+            expense = data["expenses"][index]
+            amount = expense["amount"]
+            category = expense["category"]
+            
+            # Reverse the spend, restoring the category and remaining
+            Ledger.post(data, "expense_reversal", [(spent_account(category), category_account(category), amount)],
+                        f"Deleted expense #{index}", expense.get("id"))
+            
+            # Remove the expense
+            data["expenses"].pop(index)
+            expense_removed(data, expense)
+            remaining = data["remaining"]
         
-        # Remove the expense
-        data["expenses"].pop(index)
+        # Durable now: later uploads of its receipt aren't duplicates any more
+        if expense.get("receipt_verified") and expense.get("id"):
+            receipt_index.remove([expense["id"]])
+            await run_io(save_receipt_index)
         
-        save_data(data)
-        return {"status": "deleted", "remaining": data["remaining"]}
+        return {"status": "deleted", "remaining": remaining}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/reallocate-funds")
-def reallocate_funds(payload: FundReallocation):
+async def reallocate_funds(payload: FundReallocation, data: WriteData):
     try:
-        data = load_data()
-        
         if not data:
             raise HTTPException(status_code=400, detail="No budget created yet")
         
@@ -189,10 +388,8 @@ def reallocate_funds(payload: FundReallocation):
             raise HTTPException(status_code=400, detail=f"Insufficient funds in {from_cat}")
         
         # Move funds
-        data["categories"][from_cat] -= amount
-        data["categories"][to_cat] += amount
+        Ledger.post(data, "reallocation", [(category_account(from_cat), category_account(to_cat), amount)])
         
-        save_data(data)
         return {
             "status": "reallocated",
             "message": f"Moved ${amount:.2f} from {from_cat} to {to_cat}",
@@ -200,17 +397,76 @@ def reallocate_funds(payload: FundReallocation):
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/auto-rebalance")
+async def get_auto_rebalance(data: ReadData):
+    """Auto-rebalancing settings, the plan it would apply now, and its audit trail"""
+    if not data:
+        raise HTTPException(status_code=400, detail="No budget created yet")
+    
+    settings = AutoRebalancer.settings(data)
+    return {
+        **settings,
+        "pending_plan": AutoRebalancer.plan(data, settings["min_days_left"]),
+        "log": data.get("rebalance_log", [])
+    }
+
+@router.post("/auto-rebalance")
+async def set_auto_rebalance(payload: AutoRebalanceSettings, data: WriteData):
+    """Opt in/out of automatic reallocation after each expense"""
+    try:
+        if not data:
+            raise HTTPException(status_code=400, detail="No budget created yet")
+        
+        data["auto_rebalance"] = {"enabled": payload.enabled, "min_days_left": payload.min_days_left}
+        return {"status": "updated", **data["auto_rebalance"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def pay_pending_expenses(data: Dict, pending_expenses: List[Dict]) -> List[Dict]:
+    """Pay each pending expense from the wallet and mark it paid"""
+    payments = []
+    for expense in pending_expenses:
+        vendor_name = expense.get("vendor_name", "Unknown Vendor")
+        amount = expense["amount"]
+        category = expense["category"]
+
+        # Deduct from wallet
+        wallet_transaction = WalletService.deduct_funds(
+            data,
+            amount,
+            f"Vendor Payment: {vendor_name} ({category})",
+            vendor_account(vendor_name),
+            "vendor_payment"
+        )
+
+        # Mark expense as paid
+        expense["status"] = "paid"
+        expense["payment_date"] = datetime.now().isoformat()
+        expense["payment_method"] = "wallet_interac"
+        expense["wallet_transaction_id"] = wallet_transaction["id"]
+
+        payments.append({
+            "vendor": vendor_name,
+            "amount": amount,
+            "category": category,
+            "transaction_id": wallet_transaction["id"],
+            "status": "completed"
+        })
+    return payments
+
 @router.post("/bulk-pay-vendors")
-def bulk_pay_vendors():
+async def bulk_pay_vendors(data: WriteData):
     """
     Bulk vendor payment for clubs - AI checks budget, confirms amounts, sends payments
     """
     try:
-        data = load_data()
-        
         if not data:
             raise HTTPException(status_code=400, detail="No budget created yet")
         
@@ -225,8 +481,7 @@ def bulk_pay_vendors():
             }
         
         # Initialize wallet if doesn't exist
-        if "wallet" not in data:
-            data["wallet"] = {"balance": 0.0, "transactions": []}
+        WalletService.wallet_of(data)
         
         # AI checks budget and prepares payments
         total_amount = sum(exp["amount"] for exp in pending_expenses)
@@ -238,37 +493,7 @@ def bulk_pay_vendors():
                 detail=f"Insufficient wallet balance. Required: ${total_amount:.2f}, Available: ${wallet_balance:.2f}"
             )
         
-        # Process each payment
-        payments = []
-        for expense in pending_expenses:
-            vendor_name = expense.get("vendor_name", "Unknown Vendor")
-            amount = expense["amount"]
-            category = expense["category"]
-            
-            # Deduct from wallet
-            wallet_transaction = WalletService.deduct_funds(
-                data["wallet"],
-                amount,
-                f"Vendor Payment: {vendor_name} ({category})",
-                "vendor_payment"
-            )
-            
-            # Mark expense as paid
-            expense["status"] = "paid"
-            expense["payment_date"] = datetime.now().isoformat()
-            expense["payment_method"] = "wallet_interac"
-            expense["wallet_transaction_id"] = wallet_transaction["id"]
-            
-            payments.append({
-                "vendor": vendor_name,
-                "amount": amount,
-                "category": category,
-                "transaction_id": wallet_transaction["id"],
-                "status": "completed"
-            })
-        
-        save_data(data)
-        
+        payments = pay_pending_expenses(data, pending_expenses)
         return {
             "status": "success",
             "message": f"AI successfully processed {len(payments)} vendor payments totaling ${total_amount:.2f}",
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from datetime import datetime
+from app.services.exporter import (
+    DATASETS, iter_records, parquet_available, stream_csv, stream_file, stream_ndjson, write_parquet
+)
+from app.services.executors import run_io
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+def check_date(value: Optional[str], name: str) -> None:
+    if value:
+        try:
+            datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {name} date: {value}")
+
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: Literal["expenses", "wallet-transactions", "interac-transactions", "money-requests"],
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """
+    Stream a dataset for accounting, filtered by date range (ISO, inclusive),
+    category and status. Memory use doesn't grow with the history length.
+    """
+    check_date(start, "start")
+    check_date(end, "end")
+    
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow; use csv or ndjson")
+    
+    records = iter_records(dataset, start=start, end=end, category=category, status=status)
+    columns = DATASETS[dataset]["columns"]
+    
+    if format == "ndjson":
+        body = stream_ndjson(records)
+    elif format == "csv":
+        body = stream_csv(records, columns)
+    else:
+        body = stream_file(await run_io(write_parquet, records, columns))
+    
+    filename = f"{dataset}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
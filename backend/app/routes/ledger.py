@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Query
+from typing import Optional
+from app.routes.dependencies import ReadData
+from app.services.executors import json_response, run_cpu
+from app.services.ledger import Ledger
+
+router = APIRouter(prefix="/ledger")
+
+@router.get("/balances")
+async def get_balances(data: ReadData):
+    """Cached balance of every account (sources of funds are negative)"""
+    ledger = Ledger.view(data)
+    return {
+        "balances": ledger["balances"],
+        "entry_count": len(ledger["entries"])
+    }
+
+@router.get("/entries")
+async def get_entries(data: ReadData, account: Optional[str] = None, limit: int = Query(100, ge=1, le=10000)):
+    """Most recent ledger entries, optionally only those posting to one account"""
+    return await json_response({"entries": Ledger.entries(data, account, limit)})
+
+@router.get("/audit")
+async def audit_ledger(data: ReadData):
+    """Check that every entry balances and that cached balances and budget fields agree with the entries"""
+    return await run_cpu(Ledger.audit, data)
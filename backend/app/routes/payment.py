@@ -1,42 +1,93 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field, EmailStr
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, Dict, FrozenSet, List, Optional
 import uuid
-from app.db.db import load_data, save_data
+from app.routes.dependencies import ReadData, WriteData, field_selection, select_fields
+from app.services.executors import json_response
+from app.services.ledger import UNALLOCATED, Ledger, category_account, interac_account, settled_account
+from app.services.money_requests import DEFAULT_TTL_HOURS, MoneyRequests, expiry_scheduler
 from app.services.wallet_service import WalletService
 
 router = APIRouter()
 
 class InteracTransfer(BaseModel):
     recipient_email: EmailStr
-    amount: float = Field(..., gt=0)
+    amount: float = Field(..., ge=0.01)
     message: Optional[str] = None
     security_question: Optional[str] = None
     security_answer: Optional[str] = None
     use_wallet: bool = Field(False, description="Pay with wallet balance")
+    category: Optional[str] = Field(None, description="Budget category to pay from when not using the wallet (default: misc)")
 
 class MoneyRequest(BaseModel):
     requester_email: EmailStr
-    amount: float = Field(..., gt=0)
+    amount: float = Field(..., ge=0.01)
     reason: Optional[str] = None
+    expires_in_hours: float = Field(DEFAULT_TTL_HOURS, gt=0, description="Hours before an unpaid request expires")
 
 class SettleExpense(BaseModel):
     expense_id: str
     recipient_email: EmailStr
 
+class InteracTransaction(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    type: str  # send, receive or settlement
+    amount: float
+    status: str
+    timestamp: str
+    recipient: Optional[str] = None
+    sender: Optional[str] = None
+    message: Optional[str] = None
+    payment_method: Optional[str] = None
+    wallet_transaction_id: Optional[str] = None
+    expense_category: Optional[str] = None
+    money_request_id: Optional[str] = None
+
+class MoneyRequestRecord(BaseModel):
+    id: str
+    type: str = "request"
+    requester: str
+    amount: float
+    reason: str
+    status: str  # pending, paid, declined or expired
+    timestamp: str
+    expires_at: Optional[str] = None
+    settled_at: Optional[str] = None
+    wallet_transaction_id: Optional[str] = None
+
+class MoneyRequestList(BaseModel):
+    money_requests: List[MoneyRequestRecord]
+
+class TransactionList(BaseModel):
+    transactions: List[InteracTransaction]
+    money_requests: List[MoneyRequestRecord]
+
+RequestFields = Annotated[Optional[FrozenSet[str]], Depends(field_selection(MoneyRequestRecord))]
+TransactionFields = Annotated[Optional[FrozenSet[str]], Depends(field_selection(InteracTransaction, MoneyRequestRecord))]
+# The lists are encoded by json_response, which bypasses the models: money requests are
+# cut down to the declared fields here (transactions allow extra fields anyway)
+MONEY_REQUEST_FIELDS = frozenset(MoneyRequestRecord.model_fields)
+
+def active_money_requests(data: Dict, fields: Optional[FrozenSet[str]]) -> List[Dict]:
+    declared = MONEY_REQUEST_FIELDS if fields is None else fields & MONEY_REQUEST_FIELDS
+    return [select_fields(r, declared) for r in MoneyRequests.active(data)]
+
 @router.post("/send-interac")
-def send_interac(transfer: InteracTransfer):
+async def send_interac(transfer: InteracTransfer, data: WriteData):
     """Mock Interac e-Transfer send"""
     try:
-        data = load_data()
-        
         if not data:
             raise HTTPException(status_code=400, detail="No budget created yet")
         
+        categories = data.get("categories", {})
+        if transfer.category and transfer.category not in categories:
+            raise HTTPException(status_code=400, detail=f"Invalid category: {transfer.category}")
+        
         # Initialize wallet if doesn't exist
-        if "wallet" not in data:
-            data["wallet"] = {"balance": 0.0, "transactions": []}
+        WalletService.wallet_of(data)
         
         # Check wallet balance if using wallet
         if transfer.use_wallet:
@@ -61,27 +112,32 @@ def send_interac(transfer: InteracTransfer):
             "has_security": bool(transfer.security_question)
         }
         
-        # Initialize transactions list if needed
-        if "transactions" not in data:
-            data["transactions"] = []
-        
-        data["transactions"].append(transaction)
-        
         # Deduct from wallet or budget
         if transfer.use_wallet:
             wallet_transaction = WalletService.deduct_funds(
-                data["wallet"],
+                data,
                 transfer.amount,
                 f"Interac e-Transfer to {transfer.recipient_email}",
+                interac_account(transfer.recipient_email),
                 "interac_transfer"
             )
             transaction["payment_method"] = "wallet"
             transaction["wallet_transaction_id"] = wallet_transaction["id"]
         else:
-            data["remaining"] -= transfer.amount
+            # Paid from a budget category, so the categories keep adding up to remaining;
+            # like an expense it may overdraw the category (remaining was checked above)
+            category = transfer.category or ("misc" if "misc" in categories else next(iter(categories), None))
+            source = category_account(category) if category else UNALLOCATED
+            Ledger.post(data, "interac_transfer", [(source, interac_account(transfer.recipient_email), transfer.amount)],
+                        transaction["message"], transaction["id"])
             transaction["payment_method"] = "interac"
+            transaction["category"] = category
         
-        save_data(data)
+        # Initialize transactions list if needed
+        if "transactions" not in data:
+            data["transactions"] = []
+        
+        data["transactions"].append(transaction)
         
         return {
             "status": "success",
@@ -90,33 +146,19 @@ def send_interac(transfer: InteracTransfer):
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/request-money")
-def request_money(request: MoneyRequest):
-    """Mock Interac money request"""
+async def request_money(request: MoneyRequest, data: WriteData):
+    """Mock Interac money request (pending until paid, declined or expired)"""
     try:
-        data = load_data()
-        
-        # Create mock request
-        money_request = {
-            "id": str(uuid.uuid4())[:8],
-            "type": "request",
-            "requester": request.requester_email,
-            "amount": request.amount,
-            "reason": request.reason or "Budget contribution request",
-            "status": "pending",
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Initialize requests list if needed
-        if "money_requests" not in data:
-            data["money_requests"] = []
-        
-        data["money_requests"].append(money_request)
-        
-        save_data(data)
+        money_request = MoneyRequests.create(
+            data, request.requester_email, request.amount, request.reason, request.expires_in_hours
+        )
+        expiry_scheduler.wake()
         
         return {
             "status": "success",
@@ -126,12 +168,51 @@ def request_money(request: MoneyRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/money-requests", response_model=MoneyRequestList)
+async def list_money_requests(data: ReadData, fields: RequestFields):
+    """Pending money requests (settled ones stay in the history only)"""
+    return await json_response({
+        "money_requests": active_money_requests(data, fields)
+    })
+
+@router.get("/money-requests/{request_id}", response_model=MoneyRequestRecord, response_model_exclude_none=True)
+async def get_money_request(request_id: str, data: ReadData):
+    """Any money request by id, whatever its status"""
+    money_request = MoneyRequests.get(data, request_id)
+    if money_request is None:
+        raise HTTPException(status_code=404, detail=f"Money request {request_id} not found")
+    return money_request
+
+async def settle_money_request(request_id: str, status: str, data: Dict) -> Dict:
+    try:
+        money_request = MoneyRequests.transition(data, request_id, status)
+        return {
+            "status": "success",
+            "message": f"Money request {request_id} {status}",
+            "request": money_request,
+            "wallet_balance": data.get("wallet", {}).get("balance")
+        }
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/money-requests/{request_id}/pay")
+async def pay_money_request(request_id: str, data: WriteData):
+    """Mark a request paid: the requested amount arrives in the wallet"""
+    return await settle_money_request(request_id, "paid", data)
+
+@router.post("/money-requests/{request_id}/decline")
+async def decline_money_request(request_id: str, data: WriteData):
+    """Mark a request declined"""
+    return await settle_money_request(request_id, "declined", data)
+
 @router.post("/settle-expense")
-def settle_expense(settle: SettleExpense):
+async def settle_expense(settle: SettleExpense, data: WriteData):
     """Settle a specific expense via Interac"""
     try:
-        data = load_data()
-        
         if not data or not data.get("expenses"):
             raise HTTPException(status_code=400, detail="No expenses to settle")
         
@@ -142,29 +223,38 @@ def settle_expense(settle: SettleExpense):
             raise HTTPException(status_code=400, detail="Invalid expense ID")
         
         expense = data["expenses"][expense_index]
+        if expense.get("status") == "paid":
+            raise HTTPException(status_code=400, detail="Expense already paid")
         
         # Create settlement transaction
+        amount = round(expense["amount"], 2)
         transaction = {
             "id": str(uuid.uuid4())[:8],
             "type": "settlement",
             "recipient": settle.recipient_email,
-            "amount": expense["amount"],
+            "amount": amount,
             "message": f"Settlement for {expense['category']} expense",
             "status": "completed",
             "timestamp": datetime.now().isoformat(),
             "expense_category": expense["category"]
         }
         
+        # The expense already came out of its category; the payout doesn't spend it again
+        Ledger.post(data, "settlement", [(settled_account(expense["category"]), interac_account(settle.recipient_email), amount)],
+                    transaction["message"], transaction["id"])
+        expense["status"] = "paid"
+        expense["payment_date"] = transaction["timestamp"]
+        expense["payment_method"] = "interac_settlement"
+        expense["settlement_id"] = transaction["id"]
+        
         if "transactions" not in data:
             data["transactions"] = []
         
         data["transactions"].append(transaction)
         
-        save_data(data)
-        
         return {
             "status": "success",
-            "message": f"Settlement of ${expense['amount']:.2f} sent to {settle.recipient_email}",
+            "message": f"Settlement of ${amount:.2f} sent to {settle.recipient_email}",
             "transaction": transaction
         }
     except HTTPException:
@@ -172,30 +262,27 @@ def settle_expense(settle: SettleExpense):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/transactions")
-def get_transactions():
-    """Get all Interac transactions"""
-    data = load_data()
-    return {
-        "transactions": data.get("transactions", []),
-        "money_requests": data.get("money_requests", [])
-    }
+@router.get("/transactions", response_model=TransactionList)
+async def get_transactions(data: ReadData, fields: TransactionFields):
+    """Get all Interac transactions and the pending money requests"""
+    transactions = data.get("transactions", [])
+    if fields is not None:
+        transactions = [select_fields(t, fields) for t in transactions]
+    return await json_response({
+        "transactions": transactions,
+        "money_requests": active_money_requests(data, fields)
+    })
 
-@router.get("/settlement-suggestions")
-def get_settlement_suggestions():
-    """AI-powered settlement suggestions based on expenses"""
-    data = load_data()
-    
-    if not data or not data.get("expenses"):
-        return {"suggestions": []}
-    
-    # Mock AI suggestions based on category spending
+def suggest_settlements(expenses: List[Dict]) -> List[Dict]:
+    """Mock AI suggestions based on category spending"""
     suggestions = []
     category_totals = {}
+    category_counts = {}
     
-    for exp in data["expenses"]:
+    for exp in expenses:
         cat = exp["category"]
         category_totals[cat] = category_totals.get(cat, 0) + exp["amount"]
+        category_counts[cat] = category_counts.get(cat, 0) + 1
     
     # Suggest splitting high-spending categories
     for cat, total in category_totals.items():
@@ -204,8 +291,17 @@ def get_settlement_suggestions():
                 "category": cat,
                 "total": total,
                 "suggested_split": round(total / 2, 2),
-                "reason": f"Split {cat} expenses ({len([e for e in data['expenses'] if e['category'] == cat])} transactions)"
+                "reason": f"Split {cat} expenses ({category_counts[cat]} transactions)"
             })
+    return suggestions
+
+@router.get("/settlement-suggestions")
+async def get_settlement_suggestions(data: ReadData):
+    """AI-powered settlement suggestions based on expenses"""
+    if not data or not data.get("expenses"):
+        return {"suggestions": []}
+    
+    suggestions = suggest_settlements(data["expenses"])
     
     return {
         "suggestions": suggestions,
@@ -1,12 +1,28 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, conint
+from typing import Dict, List, Optional, Literal
+import asyncio
+from datetime import datetime
 from app.services.personal_shopper import PersonalShopperAI
+from app.services.search_quotes import SearchQuotes, search_quotes
+from app.services.basket_optimizer import BasketOptimizer
+from app.services.vendor_aggregator import aggregator
 from app.services.wallet_service import WalletService
-from app.db.db import load_data, save_data
+from app.services.expense_events import expense_added
+from app.services.ledger import Ledger, category_account, spent_account, vendor_account
+from app.db.store import store
+from app.services.executors import run_cpu
 
 router = APIRouter()
 
+# Scoring weights for each optimization goal
+OPTIMIZATION_WEIGHTS = {
+    "cheapest": {"price_weight": 0.7, "distance_weight": 0.1, "rating_weight": 0.1, "filters_weight": 0.1},
+    "closest": {"price_weight": 0.1, "distance_weight": 0.7, "rating_weight": 0.1, "filters_weight": 0.1},
+    "best_rated": {"price_weight": 0.1, "distance_weight": 0.1, "rating_weight": 0.7, "filters_weight": 0.1},
+    "balanced": {"price_weight": 0.4, "distance_weight": 0.3, "rating_weight": 0.2, "filters_weight": 0.1},
+}
+
 class ShoppingPreferences(BaseModel):
     category: str = Field(..., description="Product category to search")
     optimize_for: Literal["cheapest", "closest", "best_rated", "balanced"] = Field("balanced", description="What to optimize for")
@@ -16,15 +32,35 @@ class ShoppingPreferences(BaseModel):
     ethical: bool = Field(False, description="Require ethical brands")
     max_price: Optional[float] = Field(None, description="Maximum price")
     max_distance: Optional[float] = Field(None, description="Maximum distance in km")
+    user_lat: Optional[float] = Field(None, ge=-90, le=90, description="User latitude for real vendor distances")
+    user_lon: Optional[float] = Field(None, ge=-180, le=180, description="User longitude for real vendor distances")
+    nearest_k: Optional[int] = Field(None, gt=0, description="Only consider the k nearest vendors")
 
 class PurchaseRequest(BaseModel):
-    product_index: int = Field(..., ge=0, description="Index of product to purchase")
+    quote_id: Optional[str] = Field(None, description="quote_id of the search the product was picked from")
+    product_id: Optional[str] = Field(None, description="product_id of the product in that search")
+    product_index: Optional[int] = Field(None, ge=0, description="Index of product to purchase (without product_id)")
     category: str = Field(..., description="Product category")
     auto_add_expense: bool = Field(True, description="Automatically add to expenses")
     use_wallet: bool = Field(False, description="Pay with wallet balance")
+    user_lat: Optional[float] = Field(None, ge=-90, le=90, description="User latitude for delivery estimate")
+    user_lon: Optional[float] = Field(None, ge=-180, le=180, description="User longitude for delivery estimate")
+
+class BasketRequest(BaseModel):
+    categories: Optional[List[str]] = Field(None, description="Categories to fill (default: all budget categories)")
+    max_items_per_category: int = Field(1, ge=1, le=5, description="Most products to pick in one category")
+    quantities: Dict[str, conint(ge=1)] = Field(default_factory=dict, description="Units per picked product, by category")
+    optimize_for: Literal["cheapest", "closest", "best_rated", "balanced"] = Field("balanced", description="What to optimize for")
+    student_discount: bool = Field(False, description="Require student discount")
+    halal: bool = Field(False, description="Require halal certification")
+    vegan: bool = Field(False, description="Require vegan options")
+    ethical: bool = Field(False, description="Require ethical brands")
+    max_distance: Optional[float] = Field(None, description="Maximum distance in km")
+    user_lat: Optional[float] = Field(None, ge=-90, le=90, description="User latitude for real vendor distances")
+    user_lon: Optional[float] = Field(None, ge=-180, le=180, description="User longitude for real vendor distances")
 
 @router.post("/shop/search")
-def search_products(preferences: ShoppingPreferences):
+async def search_products(preferences: ShoppingPreferences):
     """
     AI Personal Shopper searches and ranks products based on preferences
     """
@@ -32,29 +68,22 @@ def search_products(preferences: ShoppingPreferences):
         # Set optimization weights based on preference
         pref_dict = preferences.dict()
         
-        if preferences.optimize_for == "cheapest":
-            pref_dict["price_weight"] = 0.7
-            pref_dict["distance_weight"] = 0.1
-            pref_dict["rating_weight"] = 0.1
-            pref_dict["filters_weight"] = 0.1
-        elif preferences.optimize_for == "closest":
-            pref_dict["price_weight"] = 0.1
-            pref_dict["distance_weight"] = 0.7
-            pref_dict["rating_weight"] = 0.1
-            pref_dict["filters_weight"] = 0.1
-        elif preferences.optimize_for == "best_rated":
-            pref_dict["price_weight"] = 0.1
-            pref_dict["distance_weight"] = 0.1
-            pref_dict["rating_weight"] = 0.7
-            pref_dict["filters_weight"] = 0.1
-        else:  # balanced
-            pref_dict["price_weight"] = 0.4
-            pref_dict["distance_weight"] = 0.3
-            pref_dict["rating_weight"] = 0.2
-            pref_dict["filters_weight"] = 0.1
+        pref_dict.update(OPTIMIZATION_WEIGHTS[preferences.optimize_for])
+        
+        # With a known location, only the nearest vendors need to be ranked
+        if preferences.optimize_for == "closest" and pref_dict["nearest_k"] is None and pref_dict["max_distance"] is None:
+            pref_dict["nearest_k"] = 10
+        
+        # Live prices from all configured vendors, queried concurrently
+        quotes = None
+        vendor_status = None
+        if aggregator.enabled:
+            live = await aggregator.aggregate(preferences.category)
+            quotes = live["quotes"]
+            vendor_status = live["vendors"]
         
         # AI searches and ranks products
-        products = PersonalShopperAI.search_products(preferences.category, pref_dict)
+        products = await run_cpu(PersonalShopperAI.search_products, preferences.category, pref_dict, quotes)
         
         if not products:
             return {
@@ -67,136 +96,223 @@ def search_products(preferences: ShoppingPreferences):
         # AI generates comparison report
         comparison = PersonalShopperAI.compare_options(products)
         
+        # Remember what was shown (and at which prices) for the purchase
+        quote = search_quotes.save(preferences.category, products[:10])
+        
         return {
             "status": "success",
             "message": f"AI found {len(products)} options. Showing best matches first.",
-            "products": products[:10],  # Top 10 results
+            "products": quote["products"],  # Top 10 results
+            "quote_id": quote["quote_id"],
+            "quote_expires_at": datetime.fromtimestamp(quote["expires_at"]).isoformat(),
             "comparison": comparison,
-            "ai_recommendation": products[0] if products else None
+            "ai_recommendation": products[0] if products else None,
+            "vendor_status": vendor_status
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/shop/purchase")
-def make_purchase(request: PurchaseRequest):
+async def make_purchase(request: PurchaseRequest):
     """
     AI Personal Shopper autonomously makes the purchase
     """
     try:
-        # Get the search results (in production, store in session/cache)
-        # For demo, re-run search with default preferences
         preferences = {
             "optimize_for": "balanced",
-            "price_weight": 0.4,
-            "distance_weight": 0.3,
-            "rating_weight": 0.2,
-            "filters_weight": 0.1
+            **OPTIMIZATION_WEIGHTS["balanced"],
+            "user_lat": request.user_lat,
+            "user_lon": request.user_lon
         }
         
-        products = PersonalShopperAI.search_products(request.category, preferences)
+        if request.quote_id:
+            # The product exactly as the search showed it, at the price it was quoted
+            quote = search_quotes.get(request.quote_id)
+            if quote is None:
+                raise HTTPException(status_code=400, detail="Search quote expired or unknown; search again")
+            if quote["category"] != request.category:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Quote {request.quote_id} is for {quote['category']}, not {request.category}"
+                )
+            products = quote["products"]
+            if request.product_id is not None:
+                selected_product = SearchQuotes.product(quote, request.product_id)
+            elif request.product_index is not None and request.product_index < len(products):
+                selected_product = products[request.product_index]
+            else:
+                selected_product = None
+        else:
+            # No search to refer to: rank again with default preferences and the same live prices
+            if request.product_index is None:
+                raise HTTPException(status_code=400, detail="Provide quote_id and product_id, or product_index")
+            quotes = (await aggregator.aggregate(request.category))["quotes"] if aggregator.enabled else None
+            products = await run_cpu(PersonalShopperAI.search_products, request.category, preferences, quotes)
+            selected_product = products[request.product_index] if request.product_index < len(products) else None
         
-        if not products or request.product_index >= len(products):
+        if selected_product is None:
             raise HTTPException(status_code=400, detail="Invalid product selection")
+        if not PersonalShopperAI.valid_price(selected_product.get("discounted_price", selected_product.get("price"))):
+            raise HTTPException(status_code=400, detail="Selected product has no valid price")
         
-        selected_product = products[request.product_index]
+        if not (request.use_wallet or request.auto_add_expense):
+            purchase_result = PersonalShopperAI.make_autonomous_purchase(selected_product, preferences)
+            purchase_result["payment_method"] = "interac"
+            return purchase_result
         
-        # Check wallet balance if using wallet
-        if request.use_wallet:
-            data = load_data()
-            if not data:
-                raise HTTPException(status_code=400, detail="No budget created yet")
+        # Take the budget only after the search, so scoring doesn't hold up other writers
+        async with store.write() as data:
+            # Check wallet balance if using wallet
+            if request.use_wallet:
+                if not data:
+                    raise HTTPException(status_code=400, detail="No budget created yet")
             
-            # Initialize wallet if doesn't exist
-            if "wallet" not in data:
-                data["wallet"] = {"balance": 0.0, "transactions": []}
+                # Initialize wallet if doesn't exist
+                WalletService.wallet_of(data)
             
-            wallet_balance = WalletService.get_balance(data["wallet"])
-            if wallet_balance < selected_product["price"]:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Insufficient wallet balance. Balance: ${wallet_balance:.2f}, Required: ${selected_product['price']:.2f}"
-                )
+                wallet_balance = WalletService.get_balance(data["wallet"])
+                if wallet_balance < selected_product["price"]:
+                    raise HTTPException(
+                        status_code=400, 
+                        detail=f"Insufficient wallet balance. Balance: ${wallet_balance:.2f}, Required: ${selected_product['price']:.2f}"
+                    )
         
-        # AI makes autonomous purchase
-        purchase_result = PersonalShopperAI.make_autonomous_purchase(selected_product, preferences)
-        
-        # Deduct from wallet if using wallet payment
-        if request.use_wallet:
-            try:
-                wallet_transaction = WalletService.deduct_funds(
-                    data["wallet"],
-                    purchase_result["final_price"],
-                    f"AI Purchase: {purchase_result['product_name']} from {purchase_result['vendor']}",
-                    "ai_purchase"
-                )
-                purchase_result["payment_method"] = "wallet"
-                purchase_result["wallet_transaction_id"] = wallet_transaction["id"]
-                purchase_result["wallet_balance_after"] = wallet_transaction["balance_after"]
-            except ValueError as e:
-                raise HTTPException(status_code=400, detail=str(e))
-        else:
-            purchase_result["payment_method"] = "interac"
+            # AI makes autonomous purchase
+            purchase_result = PersonalShopperAI.make_autonomous_purchase(selected_product, preferences)
         
-        # Auto-add to expenses if requested
-        if request.auto_add_expense:
-            data = load_data()
+            # Deduct from wallet if using wallet payment
+            if request.use_wallet:
+                try:
+                    wallet_transaction = WalletService.deduct_funds(
+                        data,
+                        purchase_result["final_price"],
+                        f"AI Purchase: {purchase_result['product_name']} from {purchase_result['vendor']}",
+                        vendor_account(purchase_result["vendor"]),
+                        "ai_purchase"
+                    )
+                    purchase_result["payment_method"] = "wallet"
+                    purchase_result["wallet_transaction_id"] = wallet_transaction["id"]
+                    purchase_result["wallet_balance_after"] = wallet_transaction["balance_after"]
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            else:
+                purchase_result["payment_method"] = "interac"
+        
+            # Auto-add to expenses if requested
+            if request.auto_add_expense:
+                if not data.get("categories"):
+                    raise HTTPException(status_code=400, detail="No budget created yet")
             
-            if not data:
-                raise HTTPException(status_code=400, detail="No budget created yet")
+                amount = round(purchase_result["final_price"], 2)
+                category = request.category
             
-            amount = purchase_result["final_price"]
-            category = request.category
+                if category not in data.get("categories", {}):
+                    # Try to map to existing category
+                    category_map = {
+                        "food": "food",
+                        "venue": "venue",
+                        "decor": "decor"
+                    }
+                    category = category_map.get(category, "misc")
+                    if category not in data.get("categories", {}):
+                        category = list(data["categories"].keys())[0]  # Fallback to first category
             
-            if category not in data.get("categories", {}):
-                # Try to map to existing category
-                category_map = {
-                    "food": "food",
-                    "venue": "venue",
-                    "decor": "decor"
-                }
-                category = category_map.get(category, "misc")
+                if amount > data["remaining"]:
+                    return {
+                        **purchase_result,
+                        "expense_added": False,
+                        "warning": f"Purchase successful but not added to expenses: exceeds remaining budget (${data['remaining']:.2f})"
+                    }
             
-            if amount > data["remaining"]:
-                return {
-                    **purchase_result,
-                    "expense_added": False,
-                    "warning": f"Purchase successful but not added to expenses: exceeds remaining budget (${data['remaining']:.2f})"
+                # Add expense
+                expense_entry = {
+                    "amount": amount,
+                    "category": category,
+                    "ai_purchased": True,
+                    "purchase_id": purchase_result["purchase_id"],
+                    "vendor": purchase_result["vendor"],
+                    "product_name": purchase_result["product_name"],
+                    "original_price": purchase_result["original_price"],
+                    "savings": purchase_result["savings"],
+                    "ai_reasoning": purchase_result["ai_reasoning"],
+                    "timestamp": datetime.now().isoformat()
                 }
             
-            # Add expense
-            expense_entry = {
-                "amount": amount,
-                "category": category,
-                "ai_purchased": True,
-                "purchase_id": purchase_result["purchase_id"],
-                "vendor": purchase_result["vendor"],
-                "product_name": purchase_result["product_name"],
-                "original_price": purchase_result["original_price"],
-                "savings": purchase_result["savings"],
-                "ai_reasoning": purchase_result["ai_reasoning"]
-            }
-            
-            data["expenses"].append(expense_entry)
-            data["categories"][category] -= amount
-            data["remaining"] -= amount
-            
-            # Save wallet changes if used
-            if request.use_wallet:
-                save_data(data)
-            else:
-                save_data(data)
+                Ledger.post(data, "expense", [(category_account(category), spent_account(category), amount)],
+                            purchase_result["product_name"], purchase_result["purchase_id"])
+                data["expenses"].append(expense_entry)
+                expense_added(data, expense_entry)
             
-            purchase_result["expense_added"] = True
-            purchase_result["remaining_budget"] = data["remaining"]
+                purchase_result["expense_added"] = True
+                purchase_result["remaining_budget"] = data["remaining"]
         
         return purchase_result
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def rank_candidates(categories: List[str], preferences: Dict, quotes: Optional[Dict]) -> Dict[str, List[Dict]]:
+    return {
+        category: PersonalShopperAI.search_products(category, preferences, quotes)
+        for category in categories
+    }
+
+@router.post("/shop/basket")
+async def optimize_basket(request: BasketRequest):
+    """
+    AI plans a multi-category purchase: the highest-scoring set of products
+    that fits every category's remaining funds and the overall remaining budget
+    """
+    try:
+        # Snapshot the funds; live quotes and the optimizer run without holding the store
+        async with store.read() as data:
+            if not data:
+                raise HTTPException(status_code=400, detail="No budget created yet")
+            funds = dict(data.get("categories", {}))
+            remaining = data["remaining"]
+        
+        categories = request.categories or list(funds.keys())
+        invalid = [c for c in categories if c not in funds]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid categories: {', '.join(invalid)}")
+        
+        pref_dict = request.dict()
+        pref_dict.update(OPTIMIZATION_WEIGHTS[request.optimize_for])
+        
+        # Live prices for every category at once
+        quotes = {}
+        if aggregator.enabled:
+            results = await asyncio.gather(*(aggregator.aggregate(c) for c in categories))
+            for live in results:
+                quotes.update(live["quotes"])
+        
+        candidates = await run_cpu(rank_candidates, categories, pref_dict, quotes or None)
+        
+        plan = await run_cpu(
+            BasketOptimizer.optimize,
+            candidates,
+            funds,
+            remaining,
+            request.max_items_per_category,
+            request.quantities
+        )
+        
+        return {
+            "status": "success" if plan["items"] else "no_results",
+            "message": f"AI planned {len(plan['items'])} purchases totaling ${plan['total_cost']:.2f}",
+            **plan,
+            "remaining_after": round(remaining - plan["total_cost"], 2)
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/shop/categories")
-def get_shopping_categories():
+async def get_shopping_categories():
     """
     Get available shopping categories
     """
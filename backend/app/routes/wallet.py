@@ -1,20 +1,45 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, FrozenSet, List, Optional
 from app.services.wallet_service import WalletService
-from app.db.db import save_data, load_data
+from app.routes.dependencies import ReadData, WriteData, field_selection, select_fields
+from app.services.executors import json_response, run_cpu
 
 router = APIRouter()
 
 class AddFundsRequest(BaseModel):
-    amount: float = Field(..., gt=0, description="Amount to add to wallet")
+    amount: float = Field(..., ge=0.01, description="Amount to add to wallet")
     payment_method: str = Field(default="interac_debit", description="Payment method (interac_debit, interac_online, interac_transfer)")
 
+class WalletTransaction(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    type: str  # add_funds, purchase, vendor_payment, interac_transfer, ...
+    amount: float  # negative for money leaving the wallet
+    balance_after: float
+    timestamp: str
+    status: str
+    description: Optional[str] = None
+    payment_method: Optional[str] = None
+
+class WalletTransactionList(BaseModel):
+    transactions: List[WalletTransaction]
+    count: int
+    message: Optional[str] = None
+
+class WalletStats(BaseModel):
+    current_balance: float
+    total_added: float
+    total_spent: float
+    transaction_count: int
+
+WalletTransactionFields = Annotated[Optional[FrozenSet[str]], Depends(field_selection(WalletTransaction))]
+
 @router.get("/wallet/balance")
-def get_wallet_balance():
+async def get_wallet_balance(data: ReadData):
     """Get current wallet balance"""
     try:
-        data = load_data()
         if not data:
             return {"balance": 0.0, "message": "No wallet found. Create a budget first."}
         
@@ -29,34 +54,26 @@ def get_wallet_balance():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/wallet/add-funds")
-def add_funds(request: AddFundsRequest):
+async def add_funds(request: AddFundsRequest, data: WriteData):
     """Add funds to wallet"""
     try:
-        data = load_data()
         if not data:
             # Initialize data if doesn't exist
-            data = {
+            data.update({
                 "total_budget": 0,
                 "categories": {},
                 "expenses": [],
                 "remaining": 0,
                 "wallet": {"balance": 0.0, "transactions": []}
-            }
-        
-        # Initialize wallet if doesn't exist
-        if "wallet" not in data:
-            data["wallet"] = {"balance": 0.0, "transactions": []}
+            })
         
         # Add funds
         transaction = WalletService.add_funds(
-            data["wallet"],
+            data,
             request.amount,
             request.payment_method
         )
         
-        # Save updated data
-        save_data(data)
-        
         return {
             "status": "success",
             "transaction": transaction,
@@ -68,28 +85,28 @@ def add_funds(request: AddFundsRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/wallet/transactions")
-def get_wallet_transactions(limit: Optional[int] = None):
+@router.get("/wallet/transactions", response_model=WalletTransactionList)
+async def get_wallet_transactions(data: ReadData, fields: WalletTransactionFields, limit: Optional[int] = None):
     """Get wallet transaction history"""
     try:
-        data = load_data()
         if not data or "wallet" not in data:
-            return {"transactions": [], "message": "No transactions found"}
+            return {"transactions": [], "count": 0, "message": "No transactions found"}
         
         transactions = WalletService.get_transactions(data["wallet"], limit)
+        if fields is not None:
+            transactions = [select_fields(t, fields) for t in transactions]
         
-        return {
+        return await json_response({
             "transactions": transactions,
             "count": len(transactions)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/wallet/stats")
-def get_wallet_stats():
+@router.get("/wallet/stats", response_model=WalletStats)
+async def get_wallet_stats(data: ReadData):
     """Get wallet statistics"""
     try:
-        data = load_data()
         if not data or "wallet" not in data:
             return {
                 "current_balance": 0.0,
@@ -98,7 +115,7 @@ def get_wallet_stats():
                 "transaction_count": 0
             }
         
-        stats = WalletService.get_wallet_stats(data["wallet"])
+        stats = await run_cpu(WalletService.get_wallet_stats, data["wallet"])
         
         return stats
     except Exception as e:
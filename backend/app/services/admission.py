@@ -0,0 +1,326 @@
+"""
+Admission Control - Token-bucket rate limits and a global concurrency limiter
+Money-moving and search endpoints are limited per client and per budget with token
+buckets (429 + Retry-After once a bucket is empty), checked before the request touches
+the document. Every other request except health, metrics and admin then waits for one
+of a bounded number of slots; when the wait queue is full, or a request waits too long,
+it is shed with 503 + Retry-After. Buckets live in memory by default; with
+RATE_LIMIT_DB set they live in a SQLite file shared by every worker on the host.
+"""
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from app.db.store import store
+from app.services.executors import run_io
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens added per second
+    burst: int  # bucket size
+
+
+def parse_limit(raw: str) -> Optional[Limit]:
+    """"rate:burst" (requests per second, bucket size); "0" or "" turns the limit off"""
+    raw = raw.strip()
+    if not raw or raw == "0":
+        return None
+    rate, _, burst = raw.partition(":")
+    rate = float(rate)
+    if rate <= 0:
+        return None
+    return Limit(rate, int(burst) if burst else max(1, math.ceil(rate)))
+
+
+class Policy(NamedTuple):
+    name: str
+    routes: "re.Pattern"  # matched against "METHOD /path"
+    client: Optional[Limit]
+    budget: Optional[Limit]
+
+
+def _policy(name: str, routes: List[str], client: str, budget: str) -> Policy:
+    env = name.upper()
+    return Policy(
+        name,
+        re.compile("|".join(f"(?:{route})" for route in routes)),
+        parse_limit(os.environ.get(f"RATE_LIMIT_{env}_CLIENT", client)),
+        parse_limit(os.environ.get(f"RATE_LIMIT_{env}_BUDGET", budget))
+    )
+
+
+POLICIES = [] if os.environ.get("RATE_LIMITS_ENABLED", "1") == "0" else [
+    _policy("search", [r"POST /shop/search", r"POST /shop/basket"], "5:20", "20:60"),
+    _policy("money", [
+        r"POST /send-interac", r"POST /request-money", r"POST /money-requests/[^/]+/(?:pay|decline)",
+        r"POST /settle-expense", r"POST /wallet/add-funds", r"POST /shop/purchase", r"POST /bulk-pay-vendors"
+    ], "2:10", "10:30"),
+]
+
+MAX_CONCURRENT = int(os.environ.get("MAX_CONCURRENT_REQUESTS", 64))  # 0 turns the limiter off
+MAX_QUEUED = int(os.environ.get("MAX_QUEUED_REQUESTS", 128))
+QUEUE_TIMEOUT_MS = float(os.environ.get("QUEUE_TIMEOUT_MS", 2000))
+EXEMPT_PREFIXES = ("/metrics", "/admin")
+TRUST_PROXY = os.environ.get("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+Bucket = Tuple[str, Limit]
+
+
+def _refill(tokens: float, updated: float, limit: Limit, now: float) -> float:
+    return min(float(limit.burst), tokens + (now - updated) * limit.rate)
+
+
+def _wait(levels: List[float], buckets: List[Bucket]) -> float:
+    """Seconds until every bucket holds a whole token (0: admit now)"""
+    return max(((1 - tokens) / limit.rate for tokens, (_, limit) in zip(levels, buckets) if tokens < 1),
+               default=0.0)
+
+
+class InMemoryBucketStore:
+    """Buckets of this process; the least recently used ones are dropped past max_keys"""
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, buckets: List[Bucket], now: float) -> float:
+        """
+        Take a token from every bucket, or from none of them: returns 0 when admitted,
+        otherwise the seconds until all of them have a token again
+        """
+        with self.lock:
+            levels = []
+            for key, limit in buckets:
+                tokens, updated = self.buckets.get(key, (float(limit.burst), now))
+                levels.append(_refill(tokens, updated, limit, now))
+            wait = _wait(levels, buckets)
+            if wait:
+                return wait
+            for tokens, (key, _) in zip(levels, buckets):
+                self.buckets[key] = (tokens - 1, now)
+                self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)  # idle long enough to have refilled, most likely
+            return 0.0
+
+
+class SQLiteBucketStore:
+    """Buckets shared by the workers on one host; each take is one IMMEDIATE transaction"""
+    blocking = True
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def take(self, buckets: List[Bucket], now: float) -> float:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = []
+                for key, limit in buckets:
+                    row = self.conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                    tokens, updated = row if row else (float(limit.burst), now)
+                    levels.append(_refill(tokens, updated, limit, now))
+                wait = _wait(levels, buckets)
+                if not wait:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                        [(key, tokens - 1, now) for tokens, (key, _) in zip(levels, buckets)]
+                    )
+                self.conn.execute("COMMIT")
+                return wait
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+
+def create_bucket_store():
+    """SQLite-backed store when RATE_LIMIT_DB is set, otherwise in memory"""
+    path = os.environ.get("RATE_LIMIT_DB")
+    return SQLiteBucketStore(path) if path else InMemoryBucketStore()
+
+
+class Shed(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` requests run at once; others wait in arrival order. A request is
+    shed when max_queued are already waiting or it has waited longer than the timeout.
+    Retry-After estimates the queue's drain time from the average request duration.
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENT, max_queued: int = MAX_QUEUED,
+                 timeout_ms: float = QUEUE_TIMEOUT_MS):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout_ms / 1000
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.average = 0.05  # moving average of request duration (seconds)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.active = 0
+            self.waiters = deque()
+
+    def retry_after(self) -> float:
+        return (len(self.waiters) + 1) * self.average / max(1, self.limit)
+
+    async def acquire(self) -> None:
+        self._bind()
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+        if len(self.waiters) >= self.max_queued:
+            raise Shed(self.retry_after())
+        future = self.loop.create_future()
+        self.waiters.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                self.release(None)  # granted just as the wait ended: pass the slot on
+            else:
+                future.cancel()
+                self.waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Shed(self.retry_after())
+            raise
+
+    def release(self, elapsed: Optional[float]) -> None:
+        if elapsed is not None:
+            self.average += 0.1 * (elapsed - self.average)
+        # Hand the slot straight to the next live waiter
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    def __init__(self, policies: List[Policy], bucket_store, limiter: Optional[ConcurrencyLimiter]):
+        self.policies = policies
+        self.buckets = bucket_store
+        self.limiter = limiter
+        self.stats = {"admitted": 0, "rate_limited": 0, "shed": 0}
+
+    def policy_for(self, method: str, path: str) -> Optional[Policy]:
+        route = f"{method} {path}"
+        for policy in self.policies:
+            if policy.routes.fullmatch(route):
+                return policy
+        return None
+
+    @staticmethod
+    def client_of(scope) -> str:
+        if TRUST_PROXY:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def budget_of() -> str:
+        # Read without the store lock: budget_id is a plain string swapped in by create-budget
+        data = store.data
+        return (data or {}).get("budget_id") or "default"
+
+    async def check_rate(self, policy: Policy, scope) -> float:
+        buckets: List[Bucket] = []
+        if policy.client:
+            buckets.append((f"{policy.name}:client:{self.client_of(scope)}", policy.client))
+        if policy.budget:
+            buckets.append((f"{policy.name}:budget:{self.budget_of()}", policy.budget))
+        if not buckets:
+            return 0.0
+        if self.buckets.blocking:
+            return await run_io(self.buckets.take, buckets, time.time())
+        return self.buckets.take(buckets, time.time())
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "policies": {
+                p.name: {"client": p.client and p.client._asdict(), "budget": p.budget and p.budget._asdict()}
+                for p in self.policies
+            },
+            "bucket_store": type(self.buckets).__name__,
+            "max_concurrent": self.limiter.limit if self.limiter else None,
+            "max_queued": self.limiter.max_queued if self.limiter else None,
+            "active": self.limiter.active if self.limiter else None,
+            "queued": len(self.limiter.waiters) if self.limiter else None,
+            **self.stats
+        }
+
+
+admission = AdmissionController(
+    POLICIES, create_bucket_store(), ConcurrencyLimiter() if MAX_CONCURRENT > 0 else None
+)
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail}, status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware: rate limits, then a concurrency slot for the whole response"""
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path == "/" or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+
+        policy = controller.policy_for(scope["method"], path)
+        if policy is not None:
+            wait = await controller.check_rate(policy, scope)
+            if wait:
+                controller.stats["rate_limited"] += 1
+                await _reject(429, f"Rate limit exceeded for {policy.name} requests", wait)(scope, receive, send)
+                return
+
+        limiter = controller.limiter
+        if limiter is None:
+            controller.stats["admitted"] += 1
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limiter.acquire()
+        except Shed as e:
+            controller.stats["shed"] += 1
+            await _reject(503, "Server is busy, try again shortly", e.retry_after)(scope, receive, send)
+            return
+        controller.stats["admitted"] += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
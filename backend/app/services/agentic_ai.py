@@ -2,7 +2,11 @@
 Agentic AI Engine - Autonomous decision-making and recommendations
 """
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from app.services.overspend_predictor import predict_overspend
+from app.services.recommendation_rules import RuleContext, RuleEngine, feature
+from app.services.spending_analytics import SpendingAnalytics
 
 class AgenticAI:
     """
@@ -12,30 +16,15 @@ class AgenticAI:
     
     @staticmethod
     def analyze_spending_patterns(expenses: List[Dict]) -> Dict[str, Any]:
-        """Analyze spending patterns and velocity"""
-        if not expenses:
-            return {"avg_daily_spend": 0, "category_velocity": {}}
-        
-        category_totals = {}
-        for exp in expenses:
-            cat = exp["category"]
-            category_totals[cat] = category_totals.get(cat, 0) + exp["amount"]
-        
-        total_spent = sum(category_totals.values())
-        avg_daily = total_spent / max(len(expenses), 1)
-        
-        return {
-            "total_spent": total_spent,
-            "avg_daily_spend": avg_daily,
-            "category_totals": category_totals,
-            "expense_count": len(expenses)
-        }
+        """Analyze spending patterns and velocity (per calendar day, see SpendingAnalytics)"""
+        return SpendingAnalytics.analyze(expenses)
     
     @staticmethod
     def predict_category_depletion(categories: Dict[str, float], patterns: Dict) -> List[Dict]:
         """Predict which categories will run out first"""
         predictions = []
         category_totals = patterns.get("category_totals", {})
+        category_velocity = patterns.get("category_velocity", {})
         expense_count = patterns.get("expense_count", 1)
         
         for cat, remaining in categories.items():
@@ -48,159 +37,254 @@ class AgenticAI:
                         "remaining": remaining,
                         "avg_transaction": avg_per_transaction,
                         "transactions_left": transactions_left,
+                        "daily_velocity": category_velocity.get(cat, 0),
+                        **SpendingAnalytics.depletion_eta(remaining, category_velocity.get(cat, 0)),
                         "risk_level": "high" if transactions_left < 3 else "medium" if transactions_left < 5 else "low"
                     })
         
         return sorted(predictions, key=lambda x: x["transactions_left"])
     
     @staticmethod
-    def generate_autonomous_recommendations(data: Dict) -> List[Dict[str, str]]:
+    def context(data: Dict) -> RuleContext:
+        """Shared feature context so feedback and recommendations analyze the data once"""
+        return RuleContext(data)
+    
+    @staticmethod
+    def generate_autonomous_recommendations(data: Dict, context: Optional[RuleContext] = None) -> List[Dict[str, str]]:
         """
         AI autonomously generates actionable recommendations
-        based on current state and predictions
+        based on current state and predictions (see recommendation_engine rules)
         """
-        recommendations = []
-        
         if not data or data.get("total_budget", 0) == 0:
             return []
         
-        total = data["total_budget"]
-        remaining = data["remaining"]
-        categories = data.get("categories", {})
-        expenses = data.get("expenses", [])
-        
-        # Always provide initial guidance for new budgets
-        if len(expenses) == 0:
-            recommendations.append({
-                "type": "learning",
-                "action": "🎯 Welcome! Your AI assistant is ready to learn",
-                "reason": "Start adding expenses and I'll analyze patterns, predict issues, and provide personalized recommendations",
-                "priority": "info"
-            })
-            recommendations.append({
-                "type": "optimization",
-                "action": "💡 AI has optimized your budget allocation",
-                "reason": "Based on typical event spending: Food (40%), Venue (30%), Decor (20%), Misc (10%)",
-                "priority": "info"
-            })
-            return recommendations
-        
-        # Analyze patterns
-        patterns = AgenticAI.analyze_spending_patterns(expenses)
-        predictions = AgenticAI.predict_category_depletion(categories, patterns)
-        
-        # Show that AI is actively learning (after first expense)
-        if len(expenses) == 1:
-            recommendations.append({
-                "type": "learning",
-                "action": "🧠 AI is now learning your spending patterns",
-                "reason": "I've recorded your first expense. Keep adding more for better predictions and recommendations",
-                "priority": "info"
-            })
-        
-        # Critical budget level
-        if remaining < total * 0.1:
-            recommendations.append({
-                "type": "critical",
-                "action": "URGENT: Freeze non-essential spending",
-                "reason": f"Only ${remaining:.2f} remaining ({(remaining/total*100):.1f}% of budget)",
-                "priority": "high"
-            })
-        
-        # Category-specific predictions
-        for pred in predictions:
-            if pred["risk_level"] == "high":
-                # Find category with surplus to suggest reallocation
-                surplus_cats = [c for c, amt in categories.items() 
-                               if c != pred["category"] and amt > total * 0.15]
-                if surplus_cats:
-                    amount_needed = pred["avg_transaction"] * 2
-                    recommendations.append({
-                        "type": "reallocation",
-                        "action": f"Reallocate ${amount_needed:.2f} from {surplus_cats[0]} to {pred['category']}",
-                        "reason": f"{pred['category']} will deplete in ~{pred['transactions_left']:.1f} transactions",
-                        "priority": "high"
-                    })
-        
-        # Overspending in specific categories
-        for cat, amount in categories.items():
-            if amount < 0:
-                recommendations.append({
-                    "type": "overspend",
-                    "action": f"Stop spending in {cat}",
-                    "reason": f"{cat} is ${abs(amount):.2f} over budget",
-                    "priority": "high"
-                })
-        
-        # Show active analysis after a few expenses
-        if len(expenses) >= 3 and len(expenses) < 10:
-            avg_spent = patterns["avg_daily_spend"]
-            recommendations.append({
-                "type": "learning",
-                "action": f"📊 AI is actively analyzing your spending",
-                "reason": f"Processed {len(expenses)} expenses (avg ${avg_spent:.2f} per transaction). More data = smarter insights!",
-                "priority": "info"
-            })
-        
-        # Adaptive learning milestone
-        if len(expenses) >= 10:
-            recommendations.append({
-                "type": "learning",
-                "action": "✅ AI has mastered your spending patterns",
-                "reason": "Next budget will be automatically optimized based on your behavior. I can now provide highly accurate predictions!",
-                "priority": "info"
-            })
-        
-        # Smart savings suggestion
-        if remaining > total * 0.5 and len(expenses) > 5:
-            avg_spent = patterns["avg_daily_spend"]
-            recommendations.append({
-                "type": "optimization",
-                "action": f"Great job! Consider setting aside ${remaining * 0.1:.2f} as buffer",
-                "reason": f"Budget is healthy. Average spend: ${avg_spent:.2f} per transaction",
-                "priority": "low"
-            })
-        
-        # If no critical recommendations yet, provide proactive insights
-        if len(recommendations) == 0 and remaining > total * 0.3:
-            recommendations.append({
-                "type": "optimization",
-                "action": f"✨ Budget is healthy - ${remaining:.2f} remaining",
-                "reason": f"You've spent {((total-remaining)/total*100):.0f}% of your budget efficiently. AI is monitoring for any concerning patterns.",
-                "priority": "low"
-            })
-        
-        return recommendations
+        return list(recommendation_engine.evaluate(context or RuleContext(data)))
     
     @staticmethod
-    def get_intelligent_feedback(data: Dict) -> str:
-        """Generate intelligent, context-aware feedback"""
+    def get_intelligent_feedback(data: Dict, context: Optional[RuleContext] = None) -> str:
+        """Generate intelligent, context-aware feedback (first matching feedback_engine rule)"""
         if not data or data.get("total_budget", 0) == 0:
             return "Create a budget to start tracking expenses with AI insights"
         
-        total = data["total_budget"]
-        remaining = data["remaining"]
-        expenses = data.get("expenses", [])
-        
-        spent_pct = ((total - remaining) / total) * 100 if total > 0 else 0
-        
-        # Analyze patterns
-        patterns = AgenticAI.analyze_spending_patterns(expenses)
-        
-        # Context-aware intelligent feedback
-        if remaining <= 0:
-            return "🚨 Budget depleted! AI suggests: Review spending and create new budget with adjusted allocations."
-        elif remaining < total * 0.1:
-            days_left = remaining / patterns["avg_daily_spend"] if patterns["avg_daily_spend"] > 0 else 0
-            return f"⚠️ CRITICAL: ${remaining:.2f} left (~{days_left:.1f} transactions at current pace). Immediate action required!"
-        elif remaining < total * 0.2:
-            return f"⚠️ WARNING: {spent_pct:.0f}% spent. AI predicts depletion soon. Reduce spending or reallocate funds."
-        elif spent_pct < 25:
-            return f"✅ Excellent start! {spent_pct:.0f}% used. AI is learning your patterns for future optimization."
-        elif spent_pct < 50:
-            return f"👍 Good progress ({spent_pct:.0f}% spent). Spending pace is healthy. Keep monitoring!"
-        elif spent_pct < 75:
-            return f"📊 {spent_pct:.0f}% spent. AI recommends: Watch high-velocity categories closely."
-        else:
-            avg_per = patterns["avg_daily_spend"]
-            return f"⚡ {spent_pct:.0f}% spent (avg ${avg_per:.2f}/transaction). Plan remaining expenses carefully!"
+        feedback = feedback_engine.evaluate(context or RuleContext(data))
+        return feedback[0] if feedback else ""
+
+
+# Derived features (computed at most once per evaluation)
+
+@feature("total")
+def _total(ctx):
+    return ctx.data["total_budget"]
+
+@feature("remaining")
+def _remaining(ctx):
+    return ctx.data["remaining"]
+
+@feature("categories")
+def _categories(ctx):
+    return ctx.data.get("categories", {})
+
+@feature("expense_count")
+def _expense_count(ctx):
+    return len(ctx.data.get("expenses", []))
+
+@feature("remaining_ratio")
+def _remaining_ratio(ctx):
+    return ctx["remaining"] / ctx["total"] if ctx["total"] > 0 else 0
+
+@feature("spent_pct")
+def _spent_pct(ctx):
+    return (1 - ctx["remaining_ratio"]) * 100 if ctx["total"] > 0 else 0
+
+@feature("patterns")
+def _patterns(ctx):
+    return AgenticAI.analyze_spending_patterns(ctx.data.get("expenses", []))
+
+@feature("predictions")
+def _predictions(ctx):
+    return AgenticAI.predict_category_depletion(ctx["categories"], ctx["patterns"])
+
+@feature("surplus_categories")
+def _surplus_categories(ctx):
+    """Categories holding more than 15% of the budget, in budget order"""
+    return [c for c, amt in ctx["categories"].items() if amt > ctx["total"] * 0.15]
+
+@feature("forecast")
+def _forecast(ctx):
+    return predict_overspend(ctx.data)
+
+
+# Recommendation rules (lower priority number = evaluated first)
+
+recommendation_engine = RuleEngine("recommendations")
+
+@recommendation_engine.rule("welcome", 10, requires=["expense_count"], stop=True,
+                            when=lambda ctx: ctx["expense_count"] == 0)
+def _welcome(ctx):
+    """Always provide initial guidance for new budgets"""
+    return [
+        {
+            "type": "learning",
+            "action": "🎯 Welcome! Your AI assistant is ready to learn",
+            "reason": "Start adding expenses and I'll analyze patterns, predict issues, and provide personalized recommendations",
+            "priority": "info"
+        },
+        {
+            "type": "optimization",
+            "action": "💡 AI has optimized your budget allocation",
+            "reason": "Based on typical event spending: Food (40%), Venue (30%), Decor (20%), Misc (10%)",
+            "priority": "info"
+        }
+    ]
+
+@recommendation_engine.rule("first_expense", 20, requires=["expense_count"],
+                            when=lambda ctx: ctx["expense_count"] == 1)
+def _first_expense(ctx):
+    """Show that AI is actively learning (after first expense)"""
+    return {
+        "type": "learning",
+        "action": "🧠 AI is now learning your spending patterns",
+        "reason": "I've recorded your first expense. Keep adding more for better predictions and recommendations",
+        "priority": "info"
+    }
+
+@recommendation_engine.rule("critical_budget", 30, requires=["remaining", "total"],
+                            when=lambda ctx: ctx["remaining"] < ctx["total"] * 0.1)
+def _critical_budget(ctx):
+    return {
+        "type": "critical",
+        "action": "URGENT: Freeze non-essential spending",
+        "reason": f"Only ${ctx['remaining']:.2f} remaining ({(ctx['remaining']/ctx['total']*100):.1f}% of budget)",
+        "priority": "high"
+    }
+
+@recommendation_engine.rule("reallocation", 40, requires=["predictions", "surplus_categories"])
+def _reallocation(ctx):
+    """High-risk categories get funds from the first surplus category other than themselves"""
+    recommendations = []
+    surplus = ctx["surplus_categories"]
+    for pred in ctx["predictions"]:
+        if pred["risk_level"] != "high":
+            continue
+        # At most two candidates to look at: the first one may be this category itself
+        source = next((c for c in surplus[:2] if c != pred["category"]), None)
+        if source:
+            amount_needed = pred["avg_transaction"] * 2
+            recommendations.append({
+                "type": "reallocation",
+                "action": f"Reallocate ${amount_needed:.2f} from {source} to {pred['category']}",
+                "reason": f"{pred['category']} will deplete in ~{pred['transactions_left']:.1f} transactions",
+                "priority": "high"
+            })
+    return recommendations
+
+@recommendation_engine.rule("forecast", 50, requires=["forecast"])
+def _forecast_rule(ctx):
+    """Time-based forecast: categories likely to run out within days"""
+    return [
+        {
+            "type": "forecast",
+            "action": f"Slow down {f['category']} spending",
+            "reason": f"At ${f['daily_rate']:.2f}/day, {f['category']} runs out around {f['depletion_date']} (as early as {f['depletion_date_earliest']})",
+            "priority": "high"
+        }
+        for f in ctx["forecast"] if f["risk_level"] == "high" and f["remaining"] > 0
+    ]
+
+@recommendation_engine.rule("overspend", 60, requires=["categories"])
+def _overspend(ctx):
+    """Overspending in specific categories"""
+    return [
+        {
+            "type": "overspend",
+            "action": f"Stop spending in {cat}",
+            "reason": f"{cat} is ${abs(amount):.2f} over budget",
+            "priority": "high"
+        }
+        for cat, amount in ctx["categories"].items() if amount < 0
+    ]
+
+@recommendation_engine.rule("active_analysis", 70, requires=["expense_count", "patterns"],
+                            when=lambda ctx: 3 <= ctx["expense_count"] < 10)
+def _active_analysis(ctx):
+    """Show active analysis after a few expenses"""
+    return {
+        "type": "learning",
+        "action": f"📊 AI is actively analyzing your spending",
+        "reason": f"Processed {ctx['expense_count']} expenses (avg ${ctx['patterns']['avg_per_transaction']:.2f} per transaction). More data = smarter insights!",
+        "priority": "info"
+    }
+
+@recommendation_engine.rule("learning_milestone", 80, requires=["expense_count"],
+                            when=lambda ctx: ctx["expense_count"] >= 10)
+def _learning_milestone(ctx):
+    """Adaptive learning milestone"""
+    return {
+        "type": "learning",
+        "action": "✅ AI has mastered your spending patterns",
+        "reason": "Next budget will be automatically optimized based on your behavior. I can now provide highly accurate predictions!",
+        "priority": "info"
+    }
+
+@recommendation_engine.rule("savings_buffer", 90, requires=["remaining", "total", "expense_count", "patterns"],
+                            when=lambda ctx: ctx["remaining"] > ctx["total"] * 0.5 and ctx["expense_count"] > 5)
+def _savings_buffer(ctx):
+    """Smart savings suggestion"""
+    return {
+        "type": "optimization",
+        "action": f"Great job! Consider setting aside ${ctx['remaining'] * 0.1:.2f} as buffer",
+        "reason": f"Budget is healthy. Average spend: ${ctx['patterns']['avg_per_transaction']:.2f} per transaction",
+        "priority": "low"
+    }
+
+@recommendation_engine.rule("healthy_budget", 1000, requires=["remaining", "total"],
+                            when=lambda ctx: not ctx.emitted and ctx["remaining"] > ctx["total"] * 0.3)
+def _healthy_budget(ctx):
+    """If no critical recommendations yet, provide proactive insights"""
+    return {
+        "type": "optimization",
+        "action": f"✨ Budget is healthy - ${ctx['remaining']:.2f} remaining",
+        "reason": f"You've spent {((ctx['total']-ctx['remaining'])/ctx['total']*100):.0f}% of your budget efficiently. AI is monitoring for any concerning patterns.",
+        "priority": "low"
+    }
+
+
+# Feedback rules: the first one that fires is the feedback
+
+feedback_engine = RuleEngine("feedback")
+
+@feedback_engine.rule("depleted", 10, requires=["remaining"], stop=True,
+                      when=lambda ctx: ctx["remaining"] <= 0)
+def _depleted(ctx):
+    return "🚨 Budget depleted! AI suggests: Review spending and create new budget with adjusted allocations."
+
+@feedback_engine.rule("critical", 20, requires=["remaining", "total", "patterns"], stop=True,
+                      when=lambda ctx: ctx["remaining"] < ctx["total"] * 0.1)
+def _critical(ctx):
+    avg = ctx["patterns"]["avg_per_transaction"]
+    days_left = ctx["remaining"] / avg if avg > 0 else 0
+    return f"⚠️ CRITICAL: ${ctx['remaining']:.2f} left (~{days_left:.1f} transactions at current pace). Immediate action required!"
+
+@feedback_engine.rule("warning", 30, requires=["remaining", "total", "spent_pct"], stop=True,
+                      when=lambda ctx: ctx["remaining"] < ctx["total"] * 0.2)
+def _warning(ctx):
+    return f"⚠️ WARNING: {ctx['spent_pct']:.0f}% spent. AI predicts depletion soon. Reduce spending or reallocate funds."
+
+@feedback_engine.rule("excellent_start", 40, requires=["spent_pct"], stop=True,
+                      when=lambda ctx: ctx["spent_pct"] < 25)
+def _excellent_start(ctx):
+    return f"✅ Excellent start! {ctx['spent_pct']:.0f}% used. AI is learning your patterns for future optimization."
+
+@feedback_engine.rule("good_progress", 50, requires=["spent_pct"], stop=True,
+                      when=lambda ctx: ctx["spent_pct"] < 50)
+def _good_progress(ctx):
+    return f"👍 Good progress ({ctx['spent_pct']:.0f}% spent). Spending pace is healthy. Keep monitoring!"
+
+@feedback_engine.rule("watch_velocity", 60, requires=["spent_pct"], stop=True,
+                      when=lambda ctx: ctx["spent_pct"] < 75)
+def _watch_velocity(ctx):
+    return f"📊 {ctx['spent_pct']:.0f}% spent. AI recommends: Watch high-velocity categories closely."
+
+@feedback_engine.rule("plan_carefully", 70, requires=["spent_pct", "patterns"], stop=True)
+def _plan_carefully(ctx):
+    return f"⚡ {ctx['spent_pct']:.0f}% spent (avg ${ctx['patterns']['avg_per_transaction']:.2f}/transaction). Plan remaining expenses carefully!"
@@ -1,9 +1,40 @@
-from app.services.agentic_ai import AgenticAI
+from app.services.agentic_ai import AgenticAI, feedback_engine, recommendation_engine
+from app.services.insight_cache import insight_cache
+from app.services.overspend_predictor import predict_overspend
 
-def generate_feedback(data):
+def create_context(data):
+    """Feature context shared by feedback, recommendations and forecast for one request"""
+    return AgenticAI.context(data)
+
+def generate_feedback(data, context=None):
     """Generate AI feedback using the agentic AI engine"""
-    return AgenticAI.get_intelligent_feedback(data)
+    return AgenticAI.get_intelligent_feedback(data, context)
 
-def get_ai_recommendations(data):
+def get_ai_recommendations(data, context=None):
     """Get autonomous AI recommendations"""
-    return AgenticAI.generate_autonomous_recommendations(data)
\ No newline at end of file
+    return AgenticAI.generate_autonomous_recommendations(data, context)
+
+def get_overspend_forecast(data, context=None):
+    """Per-category depletion dates with confidence bands"""
+    return context["forecast"] if context is not None else predict_overspend(data)
+
+def compute_dashboard_insights(data):
+    """Feedback, recommendations and forecast from one shared context"""
+    context = create_context(data)
+    return {
+        "feedback": generate_feedback(data, context),
+        "recommendations": get_ai_recommendations(data, context),
+        "overspend_forecast": get_overspend_forecast(data, context)
+    }
+
+def get_dashboard_insights(data):
+    """Dashboard insights, reused until the budget's state_version changes"""
+    return insight_cache.get_or_compute(data, compute_dashboard_insights)
+
+def describe_ai_rules():
+    """Registered recommendation/feedback rules with per-rule timing"""
+    return {
+        "recommendations": recommendation_engine.describe(),
+        "feedback": feedback_engine.describe(),
+        "cache": insight_cache.stats()
+    }
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Auto Rebalancer - Opt-in automatic reallocation after each expense
+Moves funds from categories with runway to spare into categories predicted to run
+out within the threshold, using the forecaster's per-category daily rates
+"""
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.services.ledger import Ledger, category_account
+from app.services.overspend_predictor import OverspendForecaster
+from app.services.spending_analytics import wall_seconds
+
+DEFAULT_MIN_DAYS = 3.0
+SOURCE_BUFFER = 2.0  # sources keep twice the threshold's worth of runway
+SOURCE_MAX_SHARE = 0.5  # and give at most half their balance per pass (untouched categories too)
+MAX_LOG_ENTRIES = 500
+
+
+class AutoRebalancer:
+    """
+    Settings live in data["auto_rebalance"] = {"enabled", "min_days_left"}; every
+    applied plan is appended to data["rebalance_log"]. Plans are applied to the
+    in-memory data, so they are saved in the same commit as the triggering expense.
+    """
+
+    @staticmethod
+    def settings(data: Dict) -> Dict[str, Any]:
+        return data.get("auto_rebalance") or {"enabled": False, "min_days_left": DEFAULT_MIN_DAYS}
+
+    @staticmethod
+    def plan(data: Dict, min_days_left: float, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Greedy pass: the largest shortfall is filled from the largest surplus first,
+        which keeps the number of transfers small (each transfer empties a surplus
+        or closes a shortfall). Read-only: the document is not changed.
+        """
+        now_ts = wall_seconds(now or datetime.now())
+        state = OverspendForecaster.read_state(data)
+        categories = data.get("categories", {})
+
+        rates = {
+            cat: OverspendForecaster.rate(state[cat], now_ts)["daily_rate"] if cat in state else 0.0
+            for cat in categories
+        }
+        shortfalls = {}
+        surpluses = {}
+        for cat, remaining in categories.items():
+            needed = rates[cat] * min_days_left
+            if rates[cat] > 0 and remaining < needed:
+                shortfalls[cat] = round(needed - remaining, 2)
+            else:
+                spare = min(remaining - rates[cat] * min_days_left * SOURCE_BUFFER, remaining * SOURCE_MAX_SHARE)
+                if spare >= 0.01:
+                    surpluses[cat] = round(spare, 2)
+
+        transfers: List[Dict[str, Any]] = []
+        needs = sorted(shortfalls.items(), key=lambda x: -x[1])
+        sources = sorted(surpluses.items(), key=lambda x: -x[1])
+        i = 0
+        for to_cat, need in needs:
+            while need >= 0.01 and i < len(sources):
+                from_cat, spare = sources[i]
+                amount = round(min(need, spare), 2)
+                transfers.append({"from": from_cat, "to": to_cat, "amount": amount})
+                need = round(need - amount, 2)
+                spare = round(spare - amount, 2)
+                if spare < 0.01:
+                    i += 1
+                else:
+                    sources[i] = (from_cat, spare)
+            shortfalls[to_cat] = need
+
+        return {
+            "transfers": transfers,
+            "unresolved": {cat: need for cat, need in shortfalls.items() if need >= 0.01}
+        }
+
+    @staticmethod
+    def apply(data: Dict, plan: Dict[str, Any], trigger: str) -> Dict[str, Any]:
+        """Apply all transfers as one ledger entry and record them in the audit log"""
+        entry_id = f"RBL-{uuid.uuid4().hex[:8].upper()}"
+        Ledger.post(data, "rebalance", [
+            (category_account(t["from"]), category_account(t["to"]), t["amount"]) for t in plan["transfers"]
+        ], trigger, entry_id)
+
+        entry = {
+            "id": entry_id,
+            "timestamp": datetime.now().isoformat(),
+            "trigger": trigger,
+            "transfers": plan["transfers"],
+            "unresolved": plan["unresolved"]
+        }
+        log = data.setdefault("rebalance_log", [])
+        log.append(entry)
+        del log[:-MAX_LOG_ENTRIES]
+        return entry
+
+    @staticmethod
+    def after_expense(data: Dict, expense: Dict) -> Optional[Dict[str, Any]]:
+        """Rebalance if the club opted in and something needs funds; returns the audit entry"""
+        settings = AutoRebalancer.settings(data)
+        if not settings["enabled"]:
+            return None
+
+        plan = AutoRebalancer.plan(data, settings["min_days_left"])
+        if not plan["transfers"]:
+            return None
+
+        trigger = f"expense {expense.get('id') or expense['category']} ${expense['amount']:.2f}"
+        return AutoRebalancer.apply(data, plan, trigger)
@@ -0,0 +1,123 @@
+"""
+Basket Optimizer - Multi-category purchase planning
+Picks the best set of products across categories within category and total budgets
+"""
+import heapq
+from typing import Any, Dict, List, Tuple
+
+# (cost in cents, total ai_score, picks)
+Option = Tuple[int, float, Tuple]
+
+
+class BasketOptimizer:
+    """
+    Multiple-choice knapsack over integer cents.
+    Each category is a group; only Pareto-optimal (cost, score) options are kept at every step,
+    so the search stays small even for thousands of candidates.
+    """
+
+    @staticmethod
+    def to_cents(amount: float) -> int:
+        return int(round(amount * 100))
+
+    @staticmethod
+    def pareto(options: List[Option]) -> List[Option]:
+        """Drop options that cost as much or more than another option for no higher score"""
+        options.sort(key=lambda o: (o[0], -o[1]))
+        frontier = []
+        best_score = float("-inf")
+        for option in options:
+            if option[1] > best_score:
+                frontier.append(option)
+                best_score = option[1]
+        return frontier
+
+    @staticmethod
+    def prune_dominated(items: List[Tuple[int, float]], max_items: int) -> List[int]:
+        """
+        Indices of items that can appear in an optimal pick of up to max_items.
+        An item beaten on both cost and score by max_items others is never needed.
+        """
+        order = sorted(range(len(items)), key=lambda i: (items[i][0], -items[i][1]))
+        best_scores: List[float] = []  # min-heap of the top max_items scores seen so far
+        keep = []
+        for i in order:
+            score = items[i][1]
+            if len(best_scores) < max_items or score > best_scores[0]:
+                keep.append(i)
+            if len(best_scores) < max_items:
+                heapq.heappush(best_scores, score)
+            elif score > best_scores[0]:
+                heapq.heapreplace(best_scores, score)
+        return keep
+
+    @staticmethod
+    def category_frontier(items: List[Tuple[int, float]], cap: int, max_items: int) -> List[Option]:
+        """Pareto frontier of picking 0..max_items distinct items within cap cents"""
+        levels: List[List[Option]] = [[(0, 0.0, ())]] + [[] for _ in range(max_items)]
+
+        for i in BasketOptimizer.prune_dominated(items, max_items):
+            cost, score = items[i]
+            if cost > cap:
+                continue
+            for k in range(max_items - 1, -1, -1):
+                extended = [(c + cost, s + score, picks + (i,))
+                            for c, s, picks in levels[k] if c + cost <= cap]
+                if extended:
+                    levels[k + 1] = BasketOptimizer.pareto(levels[k + 1] + extended)
+
+        return BasketOptimizer.pareto([o for level in levels for o in level])
+
+    @staticmethod
+    def optimize(candidates: Dict[str, List[Dict]], category_limits: Dict[str, float],
+                 total_limit: float, max_items: int = 1, quantities: Dict[str, int] = None) -> Dict[str, Any]:
+        """
+        candidates: category -> scored products (from PersonalShopperAI.search_products)
+        category_limits: category -> money left in that category
+        total_limit: money left in the whole budget (negative when overspent: nothing fits)
+        """
+        quantities = quantities or {}
+        total_cap = max(BasketOptimizer.to_cents(total_limit), 0)
+
+        frontier: List[Option] = [(0, 0.0, ())]
+        for category, products in candidates.items():
+            quantity = quantities.get(category, 1)
+            cap = min(BasketOptimizer.to_cents(category_limits.get(category, 0)), total_cap)
+            items = [
+                (BasketOptimizer.to_cents(p.get("discounted_price", p["price"]) * quantity), p["ai_score"])
+                for p in products
+            ]
+            group = BasketOptimizer.category_frontier(items, max(cap, 0), max_items)
+
+            combined = [(fc + gc, fs + gs, fp + ((category, gp),))
+                        for fc, fs, fp in frontier
+                        for gc, gs, gp in group if fc + gc <= total_cap]
+            frontier = BasketOptimizer.pareto(combined)
+
+        cost, score, picks = frontier[-1]  # Highest score on the frontier
+
+        basket = []
+        category_totals = {}
+        for category, indices in picks:
+            quantity = quantities.get(category, 1)
+            for i in indices:
+                product = candidates[category][i]
+                unit_price = product.get("discounted_price", product["price"])
+                basket.append({
+                    "category": category,
+                    "name": product["name"],
+                    "vendor": product["vendor"],
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "line_total": round(unit_price * quantity, 2),
+                    "ai_score": product["ai_score"]
+                })
+                category_totals[category] = round(category_totals.get(category, 0) + unit_price * quantity, 2)
+
+        return {
+            "items": basket,
+            "total_cost": cost / 100,
+            "total_score": round(score, 2),
+            "category_totals": category_totals,
+            "unfilled_categories": [c for c in candidates if c not in category_totals]
+        }
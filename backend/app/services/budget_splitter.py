@@ -1,37 +1,194 @@
-def split_budget(total, historical_data=None):
+"""
+Budget Splitter - Allocation from learned spending distributions
+Each category's spend (as a fraction of its budget) is modelled from sufficient
+statistics kept incrementally, and the split minimizes the worst-case chance of
+any category overspending, within per-category min/max constraints
+"""
+import math
+from typing import Dict, List, Optional
+
+# Default allocations, used as the prior before a club has history
+DEFAULT_SHARES = {
+    "food": 0.4,
+    "venue": 0.3,
+    "decor": 0.2,
+    "misc": 0.1
+}
+PRIOR_WEIGHT = 2.0  # prior counts as this many past budgets
+PRIOR_UTILIZATION = 0.8  # fraction of a share a typical budget actually spends
+PRIOR_SPREAD = 0.5  # prior std as a fraction of the prior mean
+MIN_STD = 0.01
+
+
+def _normal_cdf(z: float) -> float:
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+class AllocationStats:
     """
-    Adaptive budget allocation using historical spending patterns.
-    If historical data exists, AI learns and adjusts allocations.
+    data["allocation_stats"] = {
+        "history": {category: {"sum", "sumsq", "count"}},  # over past budgets' spent fractions
+        "budgets": number of past budgets folded in,
+        "current": {category: amount spent in the current budget}
+    }
+    Expenses update "current" in O(1); creating a budget folds it into "history".
+    """
+
+    @staticmethod
+    def empty() -> Dict:
+        return {"history": {}, "budgets": 0, "current": {}}
+
+    @staticmethod
+    def state_of(data: Dict) -> Dict:
+        if "allocation_stats" not in data:
+            stats = AllocationStats.empty()
+            for exp in data.get("expenses", []):
+                stats["current"][exp["category"]] = stats["current"].get(exp["category"], 0) + exp["amount"]
+            data["allocation_stats"] = stats
+        return data["allocation_stats"]
+
+    @staticmethod
+    def observe_expense(data: Dict, expense: Dict) -> None:
+        """Call after appending an expense to data["expenses"]"""
+        if "allocation_stats" not in data:
+            AllocationStats.state_of(data)  # built from expenses, already includes it
+            return
+        current = data["allocation_stats"]["current"]
+        current[expense["category"]] = current.get(expense["category"], 0) + expense["amount"]
+
+    @staticmethod
+    def forget_expense(data: Dict, expense: Dict) -> None:
+        """Call after removing an expense from data["expenses"]"""
+        if "allocation_stats" not in data:
+            AllocationStats.state_of(data)
+            return
+        current = data["allocation_stats"]["current"]
+        current[expense["category"]] = current.get(expense["category"], 0) - expense["amount"]
+
+    @staticmethod
+    def carry_over(old_data: Optional[Dict]) -> Dict:
+        """Stats for a new budget: the old budget's spending folded into the history"""
+        if not old_data:
+            return AllocationStats.empty()
+
+        stats = AllocationStats.state_of(old_data)
+        history = {cat: dict(s) for cat, s in stats["history"].items()}
+        budgets = stats["budgets"]
+        total = old_data.get("total_budget", 0)
+        spent = stats["current"]
+
+        if total > 0 and any(amount > 0 for amount in spent.values()):
+            for cat in set(old_data.get("categories", {})) | set(spent):
+                fraction = max(0.0, spent.get(cat, 0)) / total
+                s = history.setdefault(cat, {"sum": 0.0, "sumsq": 0.0, "count": 0})
+                s["sum"] += fraction
+                s["sumsq"] += fraction * fraction
+                s["count"] += 1
+            budgets += 1
+
+        return {"history": history, "budgets": budgets, "current": {}}
+
+    @staticmethod
+    def from_expenses(expenses: List[Dict], total: float) -> Dict:
+        """Stats from a single past budget's expenses (callers without stored stats)"""
+        return AllocationStats.carry_over({"total_budget": total, "expenses": expenses})
+
+    @staticmethod
+    def distribution(stats: Dict, categories: List[str]) -> Dict[str, Dict[str, float]]:
+        """Mean/std of each category's spent fraction: history blended with the prior"""
+        defaults = {cat: DEFAULT_SHARES.get(cat, 0) for cat in categories}
+        unknown = [cat for cat in categories if cat not in DEFAULT_SHARES]
+        if unknown:
+            # Categories without a default share split evenly what the defaults leave over
+            spare = max(0.0, 1 - sum(defaults.values())) or 1 / len(categories)
+            for cat in unknown:
+                defaults[cat] = spare / len(unknown)
+        scale = sum(defaults.values())
+
+        result = {}
+        for cat in categories:
+            prior_mean = PRIOR_UTILIZATION * defaults[cat] / scale
+            prior_var = (PRIOR_SPREAD * prior_mean) ** 2
+            s = stats["history"].get(cat, {"sum": 0.0, "sumsq": 0.0, "count": 0})
+
+            # The prior enters as PRIOR_WEIGHT pseudo-budgets in the same sufficient statistics
+            count = s["count"] + PRIOR_WEIGHT
+            total = s["sum"] + PRIOR_WEIGHT * prior_mean
+            total_sq = s["sumsq"] + PRIOR_WEIGHT * (prior_var + prior_mean ** 2)
+            mean = total / count
+            var = max(0.0, total_sq / count - mean * mean)
+            result[cat] = {"mean": mean, "std": max(MIN_STD, math.sqrt(var))}
+        return result
+
+
+def optimize_allocation(total: float, distribution: Dict[str, Dict[str, float]],
+                        constraints: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, float]:
+    """
+    Allocate `total` as mean + z*std of each category's predicted spend, with one z
+    shared by all categories (found by bisection) so every category gets the same,
+    largest possible safety margin; min/max constraints clamp individual categories.
+    Raises ValueError if the constraints can't add up to the total.
     """
-    # Default allocations
-    default = {
-        "food": 0.4,
-        "venue": 0.3,
-        "decor": 0.2,
-        "misc": 0.1
+    constraints = constraints or {}
+    bounds = {
+        cat: (constraints.get(cat, {}).get("min", 0.0), constraints.get(cat, {}).get("max", total))
+        for cat in distribution
     }
-    
-    # If we have historical spending data, adapt allocations
-    if historical_data and len(historical_data) > 0:
-        total_spent = sum(exp["amount"] for exp in historical_data)
-        if total_spent > 0:
-            # Calculate actual spending patterns
-            category_spending = {}
-            for exp in historical_data:
-                cat = exp["category"]
-                category_spending[cat] = category_spending.get(cat, 0) + exp["amount"]
-            
-            # Adaptive learning: blend historical patterns with defaults (70% history, 30% default)
-            adapted = {}
-            for cat in default.keys():
-                historical_ratio = category_spending.get(cat, 0) / total_spent if total_spent > 0 else 0
-                adapted[cat] = (0.7 * historical_ratio + 0.3 * default[cat])
-            
-            # Normalize to ensure sum is 1.0
-            total_ratio = sum(adapted.values())
-            if total_ratio > 0:
-                adapted = {k: v/total_ratio for k, v in adapted.items()}
-                return {k: total * v for k, v in adapted.items()}
-    
-    # Return default allocation
-    return {k: total * v for k, v in default.items()}
\ No newline at end of file
+    if sum(low for low, _ in bounds.values()) > total + 1e-9:
+        raise ValueError("Category minimums exceed the total budget")
+    for cat, (low, high) in bounds.items():
+        if low > high:
+            raise ValueError(f"Minimum for {cat} exceeds its maximum")
+    if sum(high for _, high in bounds.values()) < total - 1e-9:
+        raise ValueError("Category maximums don't cover the total budget")
+
+    def allocate(z: float) -> Dict[str, float]:
+        return {
+            cat: min(max(total * (d["mean"] + z * d["std"]), bounds[cat][0]), bounds[cat][1])
+            for cat, d in distribution.items()
+        }
+
+    low_z, high_z = -1.0, 1.0
+    while sum(allocate(low_z).values()) > total and low_z > -1e6:
+        low_z *= 2
+    while sum(allocate(high_z).values()) < total and high_z < 1e6:
+        high_z *= 2
+    for _ in range(100):
+        mid = (low_z + high_z) / 2
+        if sum(allocate(mid).values()) < total:
+            low_z = mid
+        else:
+            high_z = mid
+
+    allocation = allocate(high_z)
+    # Round to cents and put the rounding remainder where there is room for it
+    allocation = {cat: round(amount, 2) for cat, amount in allocation.items()}
+    diff = round(total - sum(allocation.values()), 2)
+    if diff:
+        for cat in sorted(allocation, key=lambda c: -allocation[c]):
+            if bounds[cat][0] <= allocation[cat] + diff <= bounds[cat][1]:
+                allocation[cat] = round(allocation[cat] + diff, 2)
+                break
+    return allocation
+
+
+def overspend_risk(allocation: Dict[str, float], total: float,
+                   distribution: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """Predicted probability that each category's spending exceeds its allocation"""
+    return {
+        cat: round(1 - _normal_cdf((amount - total * distribution[cat]["mean"]) / (total * distribution[cat]["std"])), 4)
+        for cat, amount in allocation.items()
+    }
+
+
+def split_budget(total, historical_data=None, stats=None, categories=None, constraints=None):
+    """
+    Adaptive budget allocation using historical spending patterns.
+    stats: AllocationStats for the club (preferred); historical_data: a past budget's
+    expenses, used only when no stats are available.
+    """
+    if stats is None:
+        stats = AllocationStats.from_expenses(historical_data or [], total)
+    categories = list(categories or DEFAULT_SHARES)
+    distribution = AllocationStats.distribution(stats, categories)
+    return optimize_allocation(total, distribution, constraints)
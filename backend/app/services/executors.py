@@ -0,0 +1,81 @@
+"""
+Executors - Bounded pools for blocking work called from async handlers
+Handlers await run_io()/run_cpu() instead of blocking the event loop. The caller's
+context variables (such as the request route used by metrics) carry over into the
+worker thread. CPU work still shares the GIL; the pool keeps the loop responsive and
+caps how many heavy computations run at once. Large JSON responses are encoded here
+too, with orjson or msgspec when installed.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+IO_WORKERS = int(os.environ.get("STORAGE_WORKERS", 4))
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto")
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="storage")
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+
+async def run_in(executor: Executor, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def run_io(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Blocking file/database work"""
+    return await run_in(io_executor, fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Analytics, scoring, parsing and other CPU-bound work"""
+    return await run_in(cpu_executor, fn, *args, **kwargs)
+
+
+def _stdlib_encode(content: Any) -> bytes:
+    return JSONResponse(content).body
+
+
+def _orjson_encode(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def default_encoder():
+    """JSON_ENCODER=orjson|msgspec|json; by default the fastest one installed"""
+    if JSON_ENCODER in ("auto", "orjson") and orjson is not None:
+        return "orjson", _orjson_encode
+    if JSON_ENCODER in ("auto", "msgspec") and msgspec is not None:
+        return "msgspec", msgspec.json.encode
+    return "json", _stdlib_encode
+
+
+encoder_name, encode_json = default_encoder()
+
+
+def _encoded_response(content: Any, status_code: int) -> Response:
+    return Response(encode_json(content), status_code=status_code, media_type="application/json")
+
+
+async def json_response(content: Any, status_code: int = 200) -> Response:
+    """
+    Encode a large, JSON-ready payload (plain dicts/lists from the data file) off the
+    event loop. Skips FastAPI's per-value jsonable_encoder pass as well.
+    """
+    return await run_cpu(_encoded_response, content, status_code)
@@ -0,0 +1,30 @@
+"""
+Expense Events - Incremental bookkeeping when the expense list changes
+Every route that adds or removes an expense calls these, so derived state
+(forecast rates, allocation statistics) stays current without rescanning history,
+and opted-in budgets are rebalanced before the same save
+"""
+from typing import Dict, Optional
+
+from app.services.auto_rebalancer import AutoRebalancer
+from app.services.budget_splitter import AllocationStats
+from app.services.overspend_predictor import OverspendForecaster
+
+
+def expense_added(data: Dict, expense: Dict) -> Optional[Dict]:
+    """
+    Call after appending an expense to data["expenses"] (before saving).
+    Returns the auto-rebalance audit entry if funds were moved.
+    """
+    OverspendForecaster.observe_expense(data, expense)
+    AllocationStats.observe_expense(data, expense)
+    return AutoRebalancer.after_expense(data, expense)
+
+
+def expense_removed(data: Dict, expense: Dict) -> None:
+    """
+    Call after removing an expense from data["expenses"]. Its receipt fingerprint
+    is the caller's to drop once the write is durable (see delete_expense).
+    """
+    OverspendForecaster.forget_expense(data, expense)
+    AllocationStats.forget_expense(data, expense)
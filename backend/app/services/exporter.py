@@ -0,0 +1,186 @@
+"""
+Data Exporter - Streaming export of expenses and transactions
+Records are read from the data file one at a time, filtered, and encoded as
+CSV/NDJSON chunks (or Parquet row groups when pyarrow is installed)
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.db import db
+from app.db.json_stream import iter_array
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CHUNK_RECORDS = 500  # records per yielded chunk / Parquet row group
+
+DATASETS: Dict[str, Dict[str, Any]] = {
+    "expenses": {
+        "path": ["expenses"],
+        "columns": [
+            "id", "timestamp", "processed_at", "payment_date", "amount", "category", "vendor_name",
+            "vendor", "product_name", "status", "payment_method", "wallet_transaction_id",
+            "receipt_verified", "verification_status", "verification_confidence", "verification_flags",
+            "filename", "duplicate_of", "ai_purchased", "purchase_id", "original_price", "savings"
+        ]
+    },
+    "wallet-transactions": {
+        "path": ["wallet", "transactions"],
+        "columns": ["id", "timestamp", "type", "amount", "balance_after", "payment_method", "status", "description"]
+    },
+    "interac-transactions": {
+        "path": ["transactions"],
+        "columns": [
+            "id", "timestamp", "type", "recipient", "amount", "message", "status", "payment_method",
+            "wallet_transaction_id", "expense_id", "has_security"
+        ]
+    },
+    "money-requests": {
+        "path": ["money_requests"],
+        "columns": ["id", "timestamp", "type", "requester", "amount", "reason", "status"]
+    }
+}
+
+NUMERIC_COLUMNS = {"amount", "balance_after", "original_price", "savings", "verification_confidence"}
+
+
+def record_time(record: Dict) -> str:
+    return record.get("timestamp") or record.get("processed_at") or record.get("payment_date") or ""
+
+
+def local_time(value: str) -> Optional[datetime]:
+    """
+    Naive local datetime for an ISO string (records are stamped with naive local
+    time; an offset is converted to it), None if unparseable
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _is_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def iter_records(dataset: str, start: Optional[str] = None, end: Optional[str] = None,
+                 category: Optional[str] = None, status: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Records of a dataset matching the filters, streamed from the data file.
+    start/end are ISO dates or datetimes, with or without an offset (end is inclusive:
+    "2024-05-31" covers that whole day); records without a readable timestamp are
+    excluded when a date filter is given.
+    """
+    since = local_time(start) if start else None
+    # A date-only end runs to the next midnight; a datetime end is the last instant included
+    before = local_time(end) + timedelta(days=1) if end and _is_date(end) else None
+    until = local_time(end) if end and before is None else None
+    for record in iter_array(db.FILE, DATASETS[dataset]["path"]):
+        if not isinstance(record, dict):
+            continue
+        if start or end:
+            when = local_time(record_time(record))
+            if (when is None or (since and when < since) or (before and when >= before)
+                    or (until and when > until)):
+                continue
+        if category and record.get("category") != category:
+            continue
+        if status and record.get("status", record.get("verification_status")) != status:
+            continue
+        yield record
+
+
+def _chunks(records: Iterator[Dict]) -> Iterator[List[Dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= CHUNK_RECORDS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _cell(value: Any) -> Any:
+    """Flat value for CSV/Parquet; lists and dicts become JSON text"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def stream_ndjson(records: Iterator[Dict]) -> Iterator[str]:
+    for chunk in _chunks(records):
+        yield "".join(json.dumps(record) + "\n" for record in chunk)
+
+
+def stream_csv(records: Iterator[Dict], columns: List[str]) -> Iterator[str]:
+    """Fixed columns per dataset (unknown keys are left out; NDJSON keeps everything)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(records):
+        for record in chunk:
+            writer.writerow(["" if record.get(c) is None else _cell(record.get(c)) for c in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def write_parquet(records: Iterator[Dict], columns: List[str]) -> str:
+    """
+    Write records to a temporary Parquet file one row group at a time and return its path
+    (the caller streams it and deletes it). Requires pyarrow.
+    """
+    schema = pa.schema([
+        (c, pa.float64() if c in NUMERIC_COLUMNS else pa.string()) for c in columns
+    ])
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in _chunks(records):
+                rows = {
+                    c: [
+                        (float(r[c]) if r.get(c) is not None else None) if c in NUMERIC_COLUMNS
+                        else (None if r.get(c) is None else str(_cell(r[c])))
+                        for r in chunk
+                    ]
+                    for c in columns
+                }
+                writer.write_table(pa.Table.from_pydict(rows, schema=schema))
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+def stream_file(path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Stream a temporary file and remove it afterwards"""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(chunk_size)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.unlink(path)
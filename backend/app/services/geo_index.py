@@ -0,0 +1,131 @@
+"""
+Geo Index - Spatial lookup for vendor locations
+Grid-bucketed index so radius filters and nearest-k queries only touch nearby vendors
+"""
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+
+
+def haversine_batch(lat: float, lon: float, points: Sequence[Tuple[float, float]]) -> List[float]:
+    """
+    Great-circle distance (km) from one origin to many points in a single pass.
+    Origin trig terms are computed once and reused for every point.
+    """
+    lat1 = math.radians(lat)
+    lon1 = math.radians(lon)
+    cos_lat1 = math.cos(lat1)
+
+    distances = []
+    for p_lat, p_lon in points:
+        lat2 = math.radians(p_lat)
+        dlat = lat2 - lat1
+        dlon = math.radians(p_lon) - lon1
+        a = math.sin(dlat / 2) ** 2 + cos_lat1 * math.cos(lat2) * math.sin(dlon / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a))))
+    return distances
+
+
+class GridIndex:
+    """
+    Buckets items into fixed-size lat/lon cells.
+    Queries only visit the cells that can contain a match.
+    """
+
+    def __init__(self, cell_km: float = 2.0):
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float, Any]]] = {}
+        self.size = 0
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def insert(self, lat: float, lon: float, item: Any) -> None:
+        self.cells.setdefault(self._cell(lat, lon), []).append((lat, lon, item))
+        self.size += 1
+
+    def _lon_cells_for(self, lat: float, lat_cells: int) -> int:
+        """Longitude cells needed to cover the same ground distance as lat_cells at this latitude"""
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        return math.ceil(lat_cells / cos_lat)
+
+    @staticmethod
+    def _measure(lat: float, lon: float, entries: List[Tuple[float, float, Any]]) -> List[Tuple[float, Any]]:
+        distances = haversine_batch(lat, lon, [(e[0], e[1]) for e in entries])
+        return [(d, e[2]) for d, e in zip(distances, entries)]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float,
+                      predicate: Optional[Callable[[Any], bool]] = None) -> List[Tuple[float, Any]]:
+        """Items within radius_km, nearest first, as (distance_km, item) pairs"""
+        row, col = self._cell(lat, lon)
+        lat_span = math.ceil(radius_km / KM_PER_DEGREE_LAT / self.cell_deg)
+        lon_span = self._lon_cells_for(lat, lat_span)
+
+        if (2 * lat_span + 1) * (2 * lon_span + 1) > len(self.cells):
+            keys = [key for key in self.cells
+                    if abs(key[0] - row) <= lat_span and abs(key[1] - col) <= lon_span]
+        else:
+            keys = [(r, c)
+                    for r in range(row - lat_span, row + lat_span + 1)
+                    for c in range(col - lon_span, col + lon_span + 1)]
+
+        candidates = []
+        for key in keys:
+            for entry in self.cells.get(key, ()):
+                if predicate is None or predicate(entry[2]):
+                    candidates.append(entry)
+
+        matches = [m for m in self._measure(lat, lon, candidates) if m[0] <= radius_km]
+        matches.sort(key=lambda m: m[0])
+        return matches
+
+    def nearest(self, lat: float, lon: float, k: int,
+                predicate: Optional[Callable[[Any], bool]] = None) -> List[Tuple[float, Any]]:
+        """
+        k nearest items as (distance_km, item) pairs.
+        Expands ring by ring and stops once no unvisited cell can beat the current k-th best.
+        """
+        if k <= 0 or self.size == 0:
+            return []
+
+        row, col = self._cell(lat, lon)
+        cell_km = self.cell_deg * KM_PER_DEGREE_LAT
+        found: List[Tuple[float, Any]] = []
+        visited = 0
+        ring = 0
+
+        def inside(key: Tuple[int, int], radius: int) -> bool:
+            return (radius >= 0 and abs(key[0] - row) <= radius
+                    and abs(key[1] - col) <= self._lon_cells_for(lat, radius))
+
+        while visited < self.size:
+            lon_ring = self._lon_cells_for(lat, ring)
+            sweep_rest = (2 * ring + 1) * (2 * lon_ring + 1) > len(self.cells)
+            if sweep_rest:
+                # Sparse remainder: cheaper to sweep the occupied cells than the empty ring
+                keys = [key for key in self.cells if not inside(key, ring - 1)]
+            else:
+                keys = [(r, c)
+                        for r in range(row - ring, row + ring + 1)
+                        for c in range(col - lon_ring, col + lon_ring + 1)
+                        if not inside((r, c), ring - 1)]
+
+            entries = []
+            for key in keys:
+                bucket = self.cells.get(key)
+                if bucket:
+                    visited += len(bucket)
+                    entries.extend(e for e in bucket if predicate is None or predicate(e[2]))
+
+            found.extend(self._measure(lat, lon, entries))
+            found.sort(key=lambda m: m[0])
+            del found[k:]
+
+            # Anything outside this ring is at least `ring` whole cells away
+            if sweep_rest or (len(found) == k and found[-1][0] <= ring * cell_km):
+                break
+            ring += 1
+
+        return found
@@ -0,0 +1,71 @@
+"""
+Insight Cache - Memoized dashboard AI output per budget
+Entries are keyed by the budget's state_version (bumped by every save), so a
+dashboard poll after no change is a dictionary lookup instead of a re-analysis
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+
+class InsightCache:
+    """
+    Latest insights per budget in a bounded LRU across budgets.
+    max_age bounds staleness of time-dependent output (forecast dates) between changes.
+    """
+
+    def __init__(self, max_entries: int = 256, max_age: float = 300.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def budget_key(data: Dict) -> str:
+        return data.get("budget_id", "default")
+
+    def get_or_compute(self, data: Dict, compute: Callable[[Dict], Any]) -> Any:
+        budget = self.budget_key(data)
+        version = data.get("state_version", 0)
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(budget)
+            if entry and entry["version"] == version and now - entry["computed_at"] < self.max_age:
+                self.entries.move_to_end(budget)
+                self.hits += 1
+                return entry["value"]
+            self.misses += 1
+
+        value = compute(data)
+
+        with self.lock:
+            current = self.entries.get(budget)
+            # Don't let a slow request overwrite insights for a newer state
+            if current is None or current["version"] <= version:
+                self.entries[budget] = {"version": version, "computed_at": now, "value": value}
+                self.entries.move_to_end(budget)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, data: Dict) -> None:
+        with self.lock:
+            self.entries.pop(self.budget_key(data), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+insight_cache = InsightCache()
@@ -0,0 +1,213 @@
+"""
+Job Queue - In-process background jobs with priorities and status polling
+Keeps slow work (receipt OCR/verification) out of the request path. A finished job
+keeps only its status and result; the payload (uploads can be megabytes) is dropped.
+"""
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.executors import run_in, run_io
+
+# handler(payload, job_id, resumed): resumed is True for jobs picked up again after a restart
+Handler = Callable[[Dict[str, Any], str, bool], Dict[str, Any]]
+
+
+class InMemoryJobStore:
+    """Job records in memory; only the most recent finished jobs are kept"""
+    blocking = False
+
+    def __init__(self, max_finished: int = 10000):
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_finished = max_finished
+        self.lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self.lock:
+            self.jobs[job["id"]] = job
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self.lock:
+            self.jobs[job_id].update(fields)
+            if fields.get("status") in ("completed", "failed"):
+                self._prune()
+
+    def _prune(self) -> None:
+        finished = [j for j, job in self.jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        return []  # Nothing survives a restart
+
+
+class SQLiteJobStore:
+    """Persistent job records; queued or interrupted jobs are picked up again after a restart"""
+    blocking = True  # called through the I/O executor
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT, priority INTEGER, status TEXT,
+                payload TEXT, result TEXT, error TEXT, created_at TEXT, updated_at TEXT
+            )"""
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        return {
+            "id": row[0], "kind": row[1], "priority": row[2], "status": row[3],
+            "payload": json.loads(row[4]) if row[4] else None,
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": json.loads(row[6]) if row[6] else None,
+            "created_at": row[7], "updated_at": row[8]
+        }
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+                (job["id"], job["kind"], job["priority"], job["status"], json.dumps(job["payload"]),
+                 job["created_at"], job["updated_at"])
+            )
+            self.conn.commit()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        columns = []
+        values = []
+        for key, value in fields.items():
+            columns.append(f"{key} = ?")
+            values.append(json.dumps(value) if key in ("payload", "result", "error") and value is not None else value)
+        with self.lock:
+            self.conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", (*values, job_id))
+            self.conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+
+class JobQueue:
+    """
+    Priority queue drained by a bounded pool of asyncio workers.
+    Handlers are sync functions run off the event loop, on a pool of their own: they
+    block on store writes, so they mustn't hold threads the storage work needs. Lower
+    priority numbers run first.
+    """
+
+    def __init__(self, store, concurrency: int = 4):
+        self.store = store
+        self.concurrency = concurrency
+        self.handlers: Dict[str, Handler] = {}
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.workers: List[asyncio.Task] = []
+        self.sequence = itertools.count()  # FIFO order within a priority
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="jobs")
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self.handlers[kind] = handler
+
+    async def _call(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """A store method, off the event loop when the store blocks on disk"""
+        if self.store.blocking:
+            return await run_io(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    def start(self) -> None:
+        """Start workers on the running loop (startup, or the first submit) and re-queue unfinished jobs"""
+        if self.queue is not None:
+            return
+        self.queue = asyncio.PriorityQueue()
+        # Not in the context of a request that happened to start them (metrics say "background")
+        self.workers = [asyncio.create_task(self._recover(), context=contextvars.Context())]
+        self.workers += [asyncio.create_task(self._worker(), context=contextvars.Context()) for _ in range(self.concurrency)]
+
+    async def _recover(self) -> None:
+        for job in await self._call(self.store.unfinished):
+            await self.queue.put((job["priority"], next(self.sequence), job["id"], job["kind"], job["payload"], True))
+
+    async def stop(self) -> None:
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queue = None
+
+    async def submit(self, kind: str, payload: Dict[str, Any], priority: int = 5) -> Dict[str, Any]:
+        self.start()
+        now = datetime.now().isoformat()
+        job = {
+            "id": f"JOB-{uuid.uuid4().hex[:12].upper()}",
+            "kind": kind,
+            "priority": priority,
+            "status": "queued",
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await self._call(self.store.create, job)
+        await self.queue.put((priority, next(self.sequence), job["id"], kind, payload, False))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, job_id, kind, payload, resumed = await self.queue.get()
+            try:
+                await self._call(self.store.update, job_id, status="running", updated_at=datetime.now().isoformat())
+                result = await run_in(self.executor, self.handlers[kind], payload, job_id, resumed)
+                await self._call(self.store.update, job_id, status="completed", result=result, payload=None,
+                                 updated_at=datetime.now().isoformat())
+            except Exception as e:
+                error = {
+                    "status_code": getattr(e, "status_code", 500),
+                    "detail": getattr(e, "detail", str(e))
+                }
+                try:
+                    await self._call(self.store.update, job_id, status="failed", error=error, payload=None,
+                                     updated_at=datetime.now().isoformat())
+                except Exception as store_error:
+                    print(f"Error recording failed job {job_id}: {store_error}")
+            finally:
+                payload = None  # don't hold the upload while waiting for the next job
+                self.queue.task_done()
+
+
+def create_job_store():
+    """SQLite-backed store when RECEIPT_JOB_DB is set, otherwise in memory"""
+    path = os.environ.get("RECEIPT_JOB_DB")
+    return SQLiteJobStore(path) if path else InMemoryJobStore()
+
+
+job_queue = JobQueue(create_job_store(), concurrency=int(os.environ.get("RECEIPT_JOB_WORKERS", 4)))
@@ -0,0 +1,232 @@
+"""
+Ledger - Append-only double-entry record of every money movement
+Each entry is a batch of postings that sums to zero; per-account running balances
+are cached next to the entries, so a balance read is a dictionary lookup and an
+audit is one scan. Amounts are dollars, rounded to the cent on every posting and
+balance. Only the wallet is kept non-negative here; spending (expenses, Interac
+sends from the budget) may overdraw a category as long as the route's check on
+remaining passes. Paying an expense (bulk vendor payment, Interac settlement) moves
+money out without touching spent:<category>, which always matches the expense list.
+The legacy fields (data["categories"], data["remaining"],
+wallet["balance"]) are projections of those balances, kept in line by the ledger only.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+WALLET = "wallet"
+FUNDING = "budget:funding"  # source of the budget's allocations
+UNALLOCATED = "budget:unallocated"  # part of remaining not held by any category
+TOP_UPS = "external:top_ups"  # money added to the wallet from outside
+OPENING = "external:opening"  # balances that predate the ledger
+
+NON_NEGATIVE = (WALLET,)
+TOLERANCE = 0.005  # half a cent
+
+
+def category_account(name: str) -> str:
+    return f"category:{name}"
+
+
+def spent_account(name: str) -> str:
+    return f"spent:{name}"
+
+
+def settled_account(name: str) -> str:
+    """Pays out expenses already spent from the category: spent + settled is what is still owed"""
+    return f"settled:{name}"
+
+
+def vendor_account(name: str) -> str:
+    return f"vendor:{name}"
+
+
+def interac_account(email: str) -> str:
+    return f"interac:{email}"
+
+
+def _envelope(account: str) -> bool:
+    """Accounts whose balances add up to data["remaining"]"""
+    return account.startswith("category:") or account == UNALLOCATED
+
+
+Transfer = Tuple[str, str, float]  # (from account, to account, amount)
+
+
+class Ledger:
+    """
+    data["ledger"] = {
+        "entries": [{"id", "kind", "memo", "ref", "timestamp", "postings": [{"account", "amount"}]}],
+        "balances": {account: running sum of its postings}
+    }
+    """
+
+    @staticmethod
+    def of(data: Dict) -> Dict:
+        """The budget's ledger, opened from the legacy balances for budgets that predate it"""
+        if "ledger" not in data:
+            data["ledger"] = Ledger.view(data)
+            # The opening balances are rounded to the cent; bring the projections in line
+            balances = data["ledger"]["balances"]
+            for name in data.get("categories", {}):
+                data["categories"][name] = balances.get(category_account(name), 0.0)
+            if "remaining" in data:
+                data["remaining"] = round(sum(v for a, v in balances.items() if _envelope(a)), 2)
+            if "wallet" in data:
+                data["wallet"]["balance"] = balances.get(WALLET, 0.0)
+        return data["ledger"]
+
+    @staticmethod
+    def view(data: Dict) -> Dict:
+        """Read-only access: the ledger, or the one of() would open (not added to data)"""
+        ledger = data.get("ledger")
+        if ledger is None:
+            ledger = {"entries": [], "balances": {}}
+            opening = Ledger._opening(data)
+            if opening:
+                Ledger._append(ledger, "opening", opening, "Balances carried over", None)
+        return ledger
+
+    @staticmethod
+    def _opening(data: Dict) -> Dict[str, float]:
+        deltas: Dict[str, float] = {}
+        categories = data.get("categories", {})
+        for name, amount in categories.items():
+            if round(amount, 2):
+                deltas[category_account(name)] = round(amount, 2)
+        # Spending so far, so spent:<category> always matches the expense list
+        spent: Dict[str, float] = {}
+        for expense in data.get("expenses", []):
+            spent[expense["category"]] = spent.get(expense["category"], 0.0) + expense["amount"]
+        for name, amount in spent.items():
+            if round(amount, 2):
+                deltas[spent_account(name)] = round(amount, 2)
+        # Drift between remaining and the categories (older routes patched them separately)
+        drift = data.get("remaining", 0) - sum(categories.values())
+        if abs(drift) >= TOLERANCE:
+            deltas[UNALLOCATED] = round(drift, 2)
+        balance = round(data.get("wallet", {}).get("balance", 0.0), 2)
+        if balance:
+            deltas[WALLET] = balance
+        if deltas:
+            deltas[OPENING] = round(-sum(deltas.values()), 2)
+        return deltas
+
+    @staticmethod
+    def _append(ledger: Dict, kind: str, deltas: Dict[str, float], memo: str, ref: Optional[str]) -> Dict:
+        entry = {
+            "id": f"LED-{len(ledger['entries']) + 1:06d}",
+            "kind": kind,
+            "memo": memo,
+            "ref": ref,
+            "timestamp": datetime.now().isoformat(),
+            "postings": [{"account": account, "amount": amount} for account, amount in deltas.items()]
+        }
+        balances = ledger["balances"]
+        for account, amount in deltas.items():
+            balances[account] = round(balances.get(account, 0.0) + amount, 2)
+        ledger["entries"].append(entry)
+        return entry
+
+    @staticmethod
+    def post(data: Dict, kind: str, transfers: Iterable[Transfer], memo: str = "",
+             ref: Optional[str] = None) -> Dict:
+        """
+        Record transfers as one entry and update the cached balances and projections.
+        Raises ValueError (before changing anything) for a non-positive amount or if
+        the wallet would go negative.
+        """
+        ledger = Ledger.of(data)
+        deltas: Dict[str, float] = {}
+        for source, destination, amount in transfers:
+            if not amount > 0:
+                raise ValueError("Amount must be greater than 0")
+            amount = round(amount, 2)
+            if not amount:
+                raise ValueError("Amount must be at least $0.01")
+            deltas[source] = deltas.get(source, 0.0) - amount
+            deltas[destination] = deltas.get(destination, 0.0) + amount
+        deltas = {account: round(amount, 2) for account, amount in deltas.items() if round(amount, 2)}
+        if not deltas:
+            raise ValueError("Nothing to post")
+
+        balances = ledger["balances"]
+        for account in NON_NEGATIVE:
+            if account in deltas and balances.get(account, 0.0) + deltas[account] < -TOLERANCE:
+                current = balances.get(account, 0.0)
+                raise ValueError(f"Insufficient funds. Balance: ${current:.2f}, Required: ${-deltas[account]:.2f}")
+
+        entry = Ledger._append(ledger, kind, deltas, memo, ref)
+        Ledger._project(data, balances, deltas)
+        return entry
+
+    @staticmethod
+    def _project(data: Dict, balances: Dict[str, float], deltas: Dict[str, float]) -> None:
+        for account, amount in deltas.items():
+            if _envelope(account):
+                data["remaining"] = round(data.get("remaining", 0) + amount, 2)
+                if account != UNALLOCATED:
+                    data.setdefault("categories", {})[account.split(":", 1)[1]] = balances[account]
+            elif account == WALLET:
+                data.setdefault("wallet", {"balance": 0.0, "transactions": []})["balance"] = balances[account]
+
+    @staticmethod
+    def balance(data: Dict, account: str) -> float:
+        return Ledger.view(data)["balances"].get(account, 0.0)
+
+    @staticmethod
+    def entries(data: Dict, account: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Newest first, optionally only those touching one account"""
+        entries = Ledger.view(data)["entries"]
+        matching = []
+        for entry in reversed(entries):
+            if account is None or any(p["account"] == account for p in entry["postings"]):
+                matching.append(entry)
+                if limit and len(matching) >= limit:
+                    break
+        return matching
+
+    @staticmethod
+    def audit(data: Dict) -> Dict[str, Any]:
+        """
+        One pass over the entries: every entry must balance, the recomputed balances
+        must match the cached ones, and the projections must match the balances
+        """
+        ledger = Ledger.view(data)
+        recomputed: Dict[str, float] = {}
+        unbalanced = []
+        for entry in ledger["entries"]:
+            total = 0.0
+            for posting in entry["postings"]:
+                account = posting["account"]
+                recomputed[account] = round(recomputed.get(account, 0.0) + posting["amount"], 2)
+                total += posting["amount"]
+            if abs(total) >= TOLERANCE:
+                unbalanced.append({"id": entry["id"], "imbalance": round(total, 2)})
+
+        cached = ledger["balances"]
+        balance_mismatches = [
+            {"account": account, "cached": cached.get(account, 0.0), "recomputed": recomputed.get(account, 0.0)}
+            for account in sorted(set(cached) | set(recomputed))
+            if abs(cached.get(account, 0.0) - recomputed.get(account, 0.0)) >= TOLERANCE
+        ]
+
+        expected = {f"categories.{name}": recomputed.get(category_account(name), 0.0)
+                    for name in data.get("categories", {})}
+        expected["remaining"] = sum(amount for account, amount in recomputed.items() if _envelope(account))
+        expected["wallet.balance"] = recomputed.get(WALLET, 0.0)
+        actual = {f"categories.{name}": amount for name, amount in data.get("categories", {}).items()}
+        actual["remaining"] = data.get("remaining", 0)
+        actual["wallet.balance"] = data.get("wallet", {}).get("balance", 0.0)
+        projection_mismatches = [
+            {"field": field, "value": actual[field], "ledger": round(expected[field], 2)}
+            for field in expected if abs(actual[field] - expected[field]) >= TOLERANCE
+        ]
+
+        return {
+            "ok": not (unbalanced or balance_mismatches or projection_mismatches),
+            "entries": len(ledger["entries"]),
+            "accounts": len(recomputed),
+            "unbalanced_entries": unbalanced,
+            "balance_mismatches": balance_mismatches,
+            "projection_mismatches": projection_mismatches
+        }
@@ -0,0 +1,166 @@
+"""
+Metrics - Low-overhead histograms exposed in Prometheus text format
+MetricsMiddleware times every request per route; hot paths (JSON load/save, rule
+evaluation, search scoring, receipt parsing) report through timed()/observe(),
+labelled with the route of the request they run in. With METRICS_ENABLED=0 the
+middleware is not installed and every hook is a no-op.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(float(256 * 4 ** i) for i in range(10))  # 256 B .. 64 MiB
+
+# ASGI scope of the request being served; the router fills in scope["route"] once it
+# matches, so hooks see the route template even though the middleware runs first
+_request_scope: contextvars.ContextVar = contextvars.ContextVar("request_scope", default=None)
+
+
+def current_route() -> str:
+    """Route template of the current request ("background" outside of one)"""
+    scope = _request_scope.get()
+    if scope is None:
+        return "background"
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Per label set: one count per bucket (the last one is +Inf), then sum"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...]) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = [(labels, list(series)) for labels, series in sorted(self.series.items())]
+        for labels, series in snapshot:
+            pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, labels))
+            prefix = pairs + "," if pairs else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{pairs}}}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("registry", "histogram", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", histogram: Histogram, labels: Tuple[str, ...]):
+        self.registry = registry
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.registry.observe(self.histogram, time.perf_counter() - self.start, *self.labels)
+
+
+_DISABLED = nullcontext()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = ("route",),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, help, labelnames, buckets)
+        return self.histograms[name]
+
+    def observe(self, histogram: Histogram, value: float, *labels: str) -> None:
+        """Record a value; the current route is prepended to the labels"""
+        if self.enabled:
+            histogram.observe(value, (current_route(),) + labels)
+
+    def timed(self, histogram: Histogram, *labels: str):
+        """Context manager timing its block into the histogram"""
+        return _Timer(self, histogram, labels) if self.enabled else _DISABLED
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self.histograms.values():
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Request latency including the streamed body",
+    ("method", "route", "status"))
+JSON_PARSE_SECONDS = metrics.histogram("db_json_parse_seconds", "Time to parse the data file")
+JSON_SERIALIZE_SECONDS = metrics.histogram("db_json_serialize_seconds", "Time to serialize the data file")
+DB_WRITE_SECONDS = metrics.histogram("db_write_seconds", "Time to write and swap in the data file")
+DB_BYTES_WRITTEN = metrics.histogram("db_bytes_written", "Size of each data file write", buckets=SIZE_BUCKETS)
+DB_COMMIT_BATCH = metrics.histogram(
+    "db_commit_batch_size", "Writers acknowledged per group commit", (), buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+RULE_EVAL_SECONDS = metrics.histogram(
+    "ai_rule_evaluation_seconds", "AgenticAI rule engine evaluation time", ("route", "engine"))
+SEARCH_SCORING_SECONDS = metrics.histogram("search_scoring_seconds", "Product scoring and ranking time")
+RECEIPT_PARSE_SECONDS = metrics.histogram(
+    "receipt_parse_seconds", "Receipt pipeline time per stage", ("route", "stage"))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (streamed responses pass through untouched)"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _request_scope.set(scope)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_scope.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, (scope["method"], route, str(status)))
@@ -0,0 +1,230 @@
+"""
+Money Requests - Interac request lifecycle: pending -> paid / declined / expired
+data["money_requests"] stays the append-only history (exports read it); a derived
+index next to it maps ids to list positions for O(1) updates, keeps the pending set
+for listings, and holds a min-heap of expiry times so expiring stale requests pops
+only the due ones. A background task sleeps until the earliest expiry.
+"""
+import asyncio
+import contextvars
+import heapq
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.db import tracked
+from app.db.store import store
+from app.services.ledger import interac_account
+from app.services.wallet_service import WalletService
+
+DEFAULT_TTL_HOURS = float(os.environ.get("MONEY_REQUEST_TTL_HOURS", 72))
+
+
+def _timestamp(iso: str) -> float:
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class MoneyRequests:
+    """
+    data["money_request_index"] = {
+        "positions": {id: index in data["money_requests"]},
+        "pending": {id: expires_at},  # insertion ordered
+        "expiry_heap": [[expires_at, id], ...]  # entries of settled requests are dropped when popped
+    }
+    """
+
+    @staticmethod
+    def _build(requests: List[Dict]) -> Dict:
+        index = {"positions": {}, "pending": {}, "expiry_heap": []}
+        for position, request in enumerate(requests):
+            index["positions"][request["id"]] = position
+            if request.get("status") == "pending":
+                # Requests from before expiry existed get the default lifetime
+                if "expires_at" in request:
+                    expires_at = _timestamp(request["expires_at"])
+                else:
+                    expires_at = _timestamp(request.get("timestamp")) + DEFAULT_TTL_HOURS * 3600
+                index["pending"][request["id"]] = expires_at
+                index["expiry_heap"].append([expires_at, request["id"]])
+        heapq.heapify(index["expiry_heap"])
+        return index
+
+    @staticmethod
+    def state_of(data: Dict) -> Dict:
+        """The index, built once from the history for documents that predate it"""
+        if "money_request_index" not in data:
+            index = MoneyRequests._build(data.get("money_requests", []))
+            for request_id, expires_at in index["pending"].items():
+                request = data["money_requests"][index["positions"][request_id]]
+                request.setdefault("expires_at", datetime.fromtimestamp(expires_at).isoformat())
+            data["money_request_index"] = index
+        return data["money_request_index"]
+
+    @staticmethod
+    def create(data: Dict, requester: str, amount: float, reason: Optional[str],
+               ttl_hours: float = DEFAULT_TTL_HOURS) -> Dict:
+        index = MoneyRequests.state_of(data)
+        now = time.time()
+        expires_at = now + ttl_hours * 3600
+        request = {
+            "id": str(uuid.uuid4())[:8],
+            "type": "request",
+            "requester": requester,
+            "amount": amount,
+            "reason": reason or "Budget contribution request",
+            "status": "pending",
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "expires_at": datetime.fromtimestamp(expires_at).isoformat()
+        }
+        requests = data.setdefault("money_requests", [])
+        index["positions"][request["id"]] = len(requests)
+        requests.append(request)
+        index["pending"][request["id"]] = expires_at
+        tracked.will_change(index["expiry_heap"])
+        heapq.heappush(index["expiry_heap"], [expires_at, request["id"]])
+        return request
+
+    @staticmethod
+    def get(data: Dict, request_id: str) -> Optional[Dict]:
+        """Any request by id (read-only: scans the history only if the index isn't built yet)"""
+        index = data.get("money_request_index")
+        if index is None:
+            return next((r for r in data.get("money_requests", []) if r["id"] == request_id), None)
+        position = index["positions"].get(request_id)
+        return data["money_requests"][position] if position is not None else None
+
+    @staticmethod
+    def _settle(data: Dict, request: Dict, status: str) -> None:
+        request["status"] = status
+        request["settled_at"] = datetime.now().isoformat()
+        MoneyRequests.state_of(data)["pending"].pop(request["id"], None)
+
+    @staticmethod
+    def transition(data: Dict, request_id: str, status: str) -> Dict:
+        """
+        Settle a pending request. Raises LookupError for an unknown id and ValueError
+        if it is no longer pending (an overdue request counts as expired).
+        """
+        MoneyRequests.state_of(data)
+        request = MoneyRequests.get(data, request_id)
+        if request is None:
+            raise LookupError(f"Money request {request_id} not found")
+        if request["status"] == "pending" and MoneyRequests._overdue(data, request_id, time.time()):
+            MoneyRequests._settle(data, request, "expired")
+        if request["status"] != "pending":
+            raise ValueError(f"Money request {request_id} is already {request['status']}")
+
+        if status == "paid":
+            # The requester's Interac payment lands in the club's wallet
+            wallet_transaction = WalletService.add_funds(
+                data, request["amount"], "interac_request", source=interac_account(request["requester"])
+            )
+            request["wallet_transaction_id"] = wallet_transaction["id"]
+            data.setdefault("transactions", []).append({
+                "id": str(uuid.uuid4())[:8],
+                "type": "receive",
+                "sender": request["requester"],
+                "amount": request["amount"],
+                "message": request["reason"],
+                "status": "completed",
+                "timestamp": datetime.now().isoformat(),
+                "money_request_id": request_id,
+                "payment_method": "wallet",
+                "wallet_transaction_id": wallet_transaction["id"]
+            })
+        MoneyRequests._settle(data, request, status)
+        return request
+
+    @staticmethod
+    def _overdue(data: Dict, request_id: str, now: float) -> bool:
+        expires_at = MoneyRequests.state_of(data)["pending"].get(request_id)
+        return expires_at is not None and expires_at <= now
+
+    @staticmethod
+    def active(data: Dict, now: Optional[float] = None) -> List[Dict]:
+        """Pending requests that haven't run out, oldest first (the history is not scanned)"""
+        now = now or time.time()
+        index = data.get("money_request_index")
+        if index is None:
+            index = MoneyRequests._build(data.get("money_requests", []))  # read-only callers: not stored
+        requests = data.get("money_requests", [])
+        return [requests[index["positions"][rid]] for rid, expires_at in index["pending"].items() if expires_at > now]
+
+    @staticmethod
+    def next_expiry(data: Dict) -> Optional[float]:
+        index = data.get("money_request_index")
+        if index is None:
+            return time.time() if data.get("money_requests") else None  # index it on the next pass
+        heap = index["expiry_heap"]
+        return heap[0][0] if heap else None
+
+    @staticmethod
+    def expire_due(data: Dict, now: Optional[float] = None) -> List[str]:
+        """Expire every pending request past its time; pops only due heap entries"""
+        now = now or time.time()
+        index = MoneyRequests.state_of(data)
+        heap = index["expiry_heap"]
+        expired = []
+        if heap and heap[0][0] <= now:
+            tracked.will_change(heap)
+        while heap and heap[0][0] <= now:
+            _, request_id = heapq.heappop(heap)
+            if request_id in index["pending"]:
+                MoneyRequests._settle(data, MoneyRequests.get(data, request_id), "expired")
+                expired.append(request_id)
+        return expired
+
+
+class ExpiryScheduler:
+    """Sleeps until the earliest expiry (or a wake-up after a new request), then expires what is due"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.expired = 0
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.wakeup = asyncio.Event()
+            self.task = loop.create_task(self._run(), context=contextvars.Context())  # may start from a request
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def wake(self) -> None:
+        """Re-arm the timer after requests change (starts the scheduler on first use)"""
+        self.start()
+        self.wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            async with store.read() as data:
+                due_at = MoneyRequests.next_expiry(data)
+            delay = None if due_at is None else due_at - time.time()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                    continue  # something changed; look again
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                # Committed even when only entries of settled requests were due: a write
+                # that raises is rolled back, and they would be popped again forever
+                async with store.write() as data:
+                    self.expired += len(MoneyRequests.expire_due(data))
+            except Exception as e:
+                print(f"Expiring money requests failed: {e}")
+                await asyncio.sleep(1)
+
+
+expiry_scheduler = ExpiryScheduler()
@@ -0,0 +1,307 @@
+"""
+Receipt OCR Pipeline - decode -> preprocess -> OCR -> parse
+Pluggable stages and engines (Tesseract when installed, deterministic stub otherwise),
+with a content-addressed cache so re-uploads and retries skip OCR entirely
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.services.metrics import RECEIPT_PARSE_SECONDS, metrics
+from app.services.receipt_processor import ReceiptProcessor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+CACHE_DIR = "app/db/ocr_cache"
+CACHE_MAX_FILES = int(os.environ.get("OCR_CACHE_MAX_FILES", 10000))
+
+
+def detect_kind(buffer: memoryview) -> str:
+    """File type from magic bytes (slicing a memoryview does not copy)"""
+    head = bytes(buffer[:8])
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"\x89PNG"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    return "text"
+
+
+class StubOCREngine:
+    """
+    Deterministic engine for tests and machines without Tesseract:
+    text-like uploads are decoded as UTF-8, anything else yields no text
+    """
+    name = "stub"
+    version = "1"
+
+    def extract(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if doc["kind"] == "text":
+            return {"text": str(doc["buffer"], "utf-8", errors="replace"), "quality_score": 100}
+        return {"text": "", "quality_score": 0}
+
+
+class TesseractEngine:
+    """Local Tesseract OCR; text-based PDFs are read directly when pypdf is installed"""
+    name = "tesseract"
+
+    def __init__(self):
+        self._version: Optional[str] = None
+
+    @staticmethod
+    def available() -> bool:
+        return Image is not None and pytesseract is not None and shutil.which("tesseract") is not None
+
+    @property
+    def version(self) -> str:
+        """Installed Tesseract version (asked once; it runs the binary)"""
+        if self._version is None:
+            try:
+                self._version = str(pytesseract.get_tesseract_version())
+            except Exception:
+                self._version = "unknown"
+        return self._version
+
+    def extract(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if doc["kind"] == "text":
+            return StubOCREngine().extract(doc)
+
+        if doc["kind"] == "pdf":
+            if PdfReader is None:
+                return {"text": "", "quality_score": 0}
+            reader = PdfReader(io.BytesIO(doc["buffer"].obj))
+            text = "\n".join(page.extract_text() or "" for page in reader.pages)
+            return {"text": text, "quality_score": 100 if text.strip() else 0}
+
+        # One OCR pass gives both the words (regrouped into lines) and their confidences
+        ocr = pytesseract.image_to_data(doc["image"], output_type=pytesseract.Output.DICT)
+        lines: Dict[tuple, List[str]] = {}
+        confidences = []
+        for i, word in enumerate(ocr["text"]):
+            if not word.strip():
+                continue
+            key = (ocr["block_num"][i], ocr["par_num"][i], ocr["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            if float(ocr["conf"][i]) >= 0:
+                confidences.append(float(ocr["conf"][i]))
+        text = "\n".join(" ".join(words) for words in lines.values())
+        quality = round(sum(confidences) / len(confidences)) if confidences else 0
+        return {"text": text, "quality_score": quality}
+
+
+def default_engine():
+    """OCR_ENGINE=tesseract|stub; by default Tesseract when it is installed"""
+    choice = os.environ.get("OCR_ENGINE", "auto")
+    if choice == "stub" or (choice == "auto" and not TesseractEngine.available()):
+        return StubOCREngine()
+    return TesseractEngine()
+
+
+class OCRCache:
+    """
+    Cache key (engine, version, SHA-256 of the uploaded bytes) -> extraction result,
+    in a bounded LRU backed by disk. The directory is capped at max_files; past that
+    the oldest files are deleted (down to 90%, so eviction doesn't run on every put).
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_entries: int = 1024, max_files: int = CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self.files: Optional[int] = None  # counted on the first put
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(engine, digest: str) -> str:
+        version = "".join(c if c.isalnum() or c in ".-" else "_" for c in engine.version)
+        return f"{engine.name}-{version}-{digest}"
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if cache_key in self.entries:
+                self.entries.move_to_end(cache_key)
+                return self.entries[cache_key]
+        path = Path(self.directory) / f"{cache_key}.json"
+        if path.exists():
+            try:
+                entry = json.loads(path.read_text())
+            except Exception:
+                return None
+            self._remember(cache_key, entry)
+            return entry
+        return None
+
+    def put(self, cache_key: str, entry: Dict[str, Any]) -> None:
+        self._remember(cache_key, entry)
+        try:
+            directory = Path(self.directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{cache_key}.json"
+            new = not path.exists()
+            path.write_text(json.dumps(entry))
+            if new:
+                self._count_file()
+        except Exception as e:
+            print(f"Error saving OCR cache entry: {e}")
+
+    def _count_file(self) -> None:
+        with self.lock:
+            if self.files is None:
+                self.files = sum(1 for _ in Path(self.directory).glob("*.json"))
+            else:
+                self.files += 1
+            if self.files <= self.max_files:
+                return
+            # Other processes share the directory, so evict from what is actually there
+            paths = []
+            for path in Path(self.directory).glob("*.json"):
+                try:
+                    paths.append((path.stat().st_mtime, path))
+                except FileNotFoundError:
+                    pass
+            paths.sort()
+            excess = len(paths) - int(self.max_files * 0.9)
+            for _, path in paths[:max(0, excess)]:
+                path.unlink(missing_ok=True)
+            self.files = len(paths) - max(0, excess)
+
+    def _remember(self, cache_key: str, entry: Dict[str, Any]) -> None:
+        with self.lock:
+            self.entries[cache_key] = entry
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class DecodeStage:
+    """base64 payload -> raw bytes exposed as a memoryview for later stages"""
+    name = "decode"
+
+    def run(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        raw = base64.b64decode(doc["file_base64"], validate=True)
+        doc["buffer"] = memoryview(raw)
+        doc["kind"] = detect_kind(doc["buffer"])
+        doc["digest"] = hashlib.sha256(doc["buffer"]).hexdigest()
+        return doc
+
+
+class PreprocessStage:
+    """Grayscale + autocontrast for images (needs Pillow); other kinds pass through"""
+    name = "preprocess"
+
+    def run(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if doc["kind"] in ("png", "jpeg") and Image is not None:
+            image = Image.open(io.BytesIO(doc["buffer"].obj))
+            doc["image"] = ImageOps.autocontrast(ImageOps.grayscale(image))
+        return doc
+
+
+class OCRStage:
+    name = "ocr"
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def run(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        extraction = self.engine.extract(doc)
+        doc["text"] = extraction["text"]
+        doc["quality_score"] = extraction["quality_score"]
+        doc["ocr_engine"] = self.engine.name
+        return doc
+
+
+class ParseStage:
+    name = "parse"
+
+    def run(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        doc["result"] = ReceiptProcessor.process_receipt(
+            text=doc["text"],
+            filename=doc["filename"],
+            user_category=doc.get("category"),
+            quality_score=doc.get("quality_score")
+        )
+        return doc
+
+
+class ReceiptPipeline:
+    """
+    Runs an upload through its stages. Text uploads go straight to parsing;
+    file uploads whose bytes the same engine and version read before reuse the
+    cached extraction.
+    """
+
+    def __init__(self, engine=None, cache: Optional[OCRCache] = None):
+        self.engine = engine or default_engine()
+        self.cache = cache or OCRCache()
+        self.decode = DecodeStage()
+        self.extract_stages: List[Any] = [PreprocessStage(), OCRStage(self.engine)]
+        self.parse = ParseStage()
+
+    @staticmethod
+    def _stage(stage, doc: Dict[str, Any]) -> Dict[str, Any]:
+        with metrics.timed(RECEIPT_PARSE_SECONDS, stage.name):
+            return stage.run(doc)
+
+    def run(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        doc = dict(payload)
+
+        if not doc.get("file_base64"):
+            doc["text"] = doc["receipt_text"]
+            return self._stage(self.parse, doc)["result"]
+
+        doc = self._stage(self.decode, doc)
+        key = OCRCache.key(self.engine, doc["digest"])
+        cached = self.cache.get(key)
+        if cached:
+            doc.update(cached)
+            doc["ocr_cached"] = True
+        else:
+            for stage in self.extract_stages:
+                doc = self._stage(stage, doc)
+            # An empty or zero-confidence read is retried next time (perhaps by a better engine)
+            if doc["text"].strip() and doc["quality_score"] > 0:
+                self.cache.put(key, {
+                    "text": doc["text"],
+                    "quality_score": doc["quality_score"],
+                    "ocr_engine": doc["ocr_engine"]
+                })
+            doc["ocr_cached"] = False
+
+        result = self._stage(self.parse, doc)["result"]
+        result["ocr"] = {
+            "engine": doc["ocr_engine"],
+            "cached": doc["ocr_cached"],
+            "content_sha256": doc["digest"],
+            "kind": doc["kind"]
+        }
+        return result
+
+
+receipt_pipeline = ReceiptPipeline()
+
+
+def process_upload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Module-level entry point so worker processes can run the pipeline"""
+    return receipt_pipeline.run(payload)
@@ -1,4 +1,167 @@
-def predict_overspend(remaining, avg_rate):
-    if remaining < avg_rate * 2:
-        return "Warning: You may overspend soon."
-    return "Budget looks stable."
\ No newline at end of file
+"""
+Overspend Predictor - Per-category spending rate forecasting
+Each category keeps an exponentially weighted spending rate that is updated in O(1)
+per expense (no refitting), from which depletion dates and confidence bands follow
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.db.store import store
+from app.services.spending_analytics import MAX_HORIZON_DAYS, expense_time, wall_seconds
+
+HALF_LIFE_DAYS = 7.0
+TAU = HALF_LIFE_DAYS * 86400 / math.log(2)  # decay time constant in seconds
+MIN_WINDOW_SECONDS = 86400.0  # a single day of history still counts as one day
+CONFIDENCE = 0.8
+Z_SCORE = 1.2816  # two-sided 80% normal band
+
+
+def _when(expense: Dict) -> float:
+    """Wall-clock seconds, as in spending_analytics; NaN for an undated expense (not forecast)"""
+    return wall_seconds(expense_time(expense))
+
+
+class OverspendForecaster:
+    """
+    Per category state: decayed amount sum `s` and squared-weight sum `q` as of time `t`,
+    plus the first expense time `t0`. The rate is s / effective window, and its
+    spread comes from q (compound Poisson variance), so both update in O(1).
+    """
+
+    @staticmethod
+    def observe(state: Dict[str, Dict[str, float]], category: str, amount: float, when: float) -> None:
+        """Fold one expense into the category state (late/out-of-order expenses are discounted)"""
+        cat = state.get(category)
+        if cat is None:
+            state[category] = {"s": amount, "q": amount * amount, "t": when, "t0": when}
+            return
+        if when >= cat["t"]:
+            decay = math.exp(-(when - cat["t"]) / TAU)
+            cat["s"] = cat["s"] * decay + amount
+            cat["q"] = cat["q"] * decay * decay + amount * amount
+            cat["t"] = when
+        else:
+            weight = math.exp(-(cat["t"] - when) / TAU)
+            cat["s"] += amount * weight
+            cat["q"] += (amount * weight) ** 2
+            cat["t0"] = min(cat["t0"], when)
+
+    @staticmethod
+    def forget(state: Dict[str, Dict[str, float]], category: str, amount: float, when: float) -> None:
+        """
+        Remove a deleted expense's contribution to s and q (what observe added, decayed
+        to t). t and t0 are not wound back: the window keeps its start and latest time.
+        """
+        cat = state.get(category)
+        if cat is None:
+            return
+        weight = math.exp(-max(0.0, cat["t"] - when) / TAU)
+        cat["s"] = max(0.0, cat["s"] - amount * weight)
+        cat["q"] = max(0.0, cat["q"] - (amount * weight) ** 2)
+
+    @staticmethod
+    def rebuild(expenses: List[Dict]) -> Dict[str, Dict[str, float]]:
+        """Full fit from history, only needed for budgets created before forecasting existed"""
+        state: Dict[str, Dict[str, float]] = {}
+        dated = [(_when(exp), exp) for exp in expenses]
+        for when, exp in sorted((d for d in dated if not math.isnan(d[0])), key=lambda d: d[0]):
+            OverspendForecaster.observe(state, exp["category"], exp["amount"], when)
+        return state
+
+    @staticmethod
+    def state_of(data: Dict) -> Dict[str, Dict[str, float]]:
+        """The stored state, fitted from history once for budgets created before forecasting existed"""
+        if "forecast_state" not in data:
+            data["forecast_state"] = OverspendForecaster.rebuild(data.get("expenses", []))
+        return data["forecast_state"]
+
+    @staticmethod
+    def read_state(data: Dict) -> Dict[str, Dict[str, float]]:
+        """Like state_of for read-only callers: a missing state is rebuilt but not stored"""
+        # Documents are given their state when loaded (see below); only hand-built ones lack it
+        return data["forecast_state"] if "forecast_state" in data else OverspendForecaster.rebuild(data.get("expenses", []))
+
+    @staticmethod
+    def observe_expense(data: Dict, expense: Dict) -> None:
+        """Call after appending an expense to data["expenses"]"""
+        if "forecast_state" not in data:
+            OverspendForecaster.state_of(data)  # rebuilt from history, already includes it
+            return
+        when = _when(expense)
+        if not math.isnan(when):
+            OverspendForecaster.observe(data["forecast_state"], expense["category"], expense["amount"], when)
+
+    @staticmethod
+    def forget_expense(data: Dict, expense: Dict) -> None:
+        """Call after removing an expense from data["expenses"]"""
+        if "forecast_state" not in data:
+            OverspendForecaster.state_of(data)
+            return
+        when = _when(expense)
+        if not math.isnan(when):
+            OverspendForecaster.forget(data["forecast_state"], expense["category"], expense["amount"], when)
+
+    @staticmethod
+    def rate(cat: Dict[str, float], now: float) -> Dict[str, float]:
+        """Daily spending rate and its standard error as of `now`"""
+        elapsed = max(0.0, now - cat["t"])
+        s = cat["s"] * math.exp(-elapsed / TAU)
+        q = cat["q"] * math.exp(-2 * elapsed / TAU)
+        history = max(MIN_WINDOW_SECONDS, now - cat["t0"])
+        window_days = TAU * (1 - math.exp(-history / TAU)) / 86400
+        return {"daily_rate": s / window_days, "daily_rate_std": math.sqrt(q) / window_days}
+
+    @staticmethod
+    def forecast(data: Dict, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Depletion forecast per spent-in category, soonest first"""
+        now = now or datetime.now()
+        state = OverspendForecaster.read_state(data)
+        now_ts = wall_seconds(now)
+
+        def date_in(days: Optional[float]) -> Optional[str]:
+            if days is None or days > MAX_HORIZON_DAYS:
+                return None
+            return (now + timedelta(days=days)).date().isoformat()
+
+        forecasts = []
+        for category, remaining in data.get("categories", {}).items():
+            if category not in state:
+                continue
+            rate = OverspendForecaster.rate(state[category], now_ts)
+            if rate["daily_rate"] <= 0:
+                continue
+
+            fast = rate["daily_rate"] + Z_SCORE * rate["daily_rate_std"]
+            slow = rate["daily_rate"] - Z_SCORE * rate["daily_rate_std"]
+            left = max(0.0, remaining)
+            days_left = left / rate["daily_rate"]
+            earliest = left / fast
+            latest = left / slow if slow > 0 else None
+
+            forecasts.append({
+                "category": category,
+                "remaining": remaining,
+                "daily_rate": round(rate["daily_rate"], 2),
+                "days_left": round(days_left, 1),
+                "depletion_date": date_in(days_left),
+                "depletion_date_earliest": date_in(earliest),
+                "depletion_date_latest": date_in(latest),
+                "confidence": CONFIDENCE,
+                "risk_level": "high" if earliest < 3 else "medium" if earliest < 7 else "low"
+            })
+
+        return sorted(forecasts, key=lambda f: f["days_left"])
+
+
+def _add_forecast_state(data: Dict) -> None:
+    if data.get("expenses") and "forecast_state" not in data:
+        OverspendForecaster.state_of(data)
+
+
+store.on_load(_add_forecast_state)
+
+
+def predict_overspend(data: Dict) -> List[Dict[str, Any]]:
+    """Depletion forecasts for the current budget"""
+    return OverspendForecaster.forecast(data)
@@ -2,9 +2,12 @@
 Personal Shopper AI - Agentic Shopping Assistant
 Finds best options, compares prices, and makes autonomous purchasing decisions
 """
+import math
 import random
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from app.services.geo_index import GridIndex
+from app.services.metrics import SEARCH_SCORING_SECONDS, metrics
 
 class PersonalShopperAI:
     """
@@ -15,28 +18,117 @@ class PersonalShopperAI:
     # Simulated product database (in production: real-time API calls)
     PRODUCT_DATABASE = {
         "food": [
-            {"name": "Pizza Combo", "vendor": "Pizza Palace", "price": 25.99, "distance": 2.3, "rating": 4.5, "student_discount": True, "halal": False, "vegan": False, "ethical": True},
-            {"name": "Veggie Pizza", "vendor": "Green Slice", "price": 22.50, "distance": 3.1, "rating": 4.7, "student_discount": False, "halal": True, "vegan": True, "ethical": True},
-            {"name": "Meat Lovers Pizza", "vendor": "Quick Bite", "price": 18.99, "distance": 1.5, "rating": 4.2, "student_discount": True, "halal": True, "vegan": False, "ethical": False},
-            {"name": "Gourmet Pizza", "vendor": "Artisan Kitchen", "price": 32.00, "distance": 4.0, "rating": 4.9, "student_discount": False, "halal": False, "vegan": False, "ethical": True},
-            {"name": "Grocery Bundle", "vendor": "Fresh Mart", "price": 45.00, "distance": 1.0, "rating": 4.3, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Pizza Combo", "vendor": "Pizza Palace", "price": 25.99, "distance": 2.3, "lat": 43.68358, "lon": -79.3957, "rating": 4.5, "student_discount": True, "halal": False, "vegan": False, "ethical": True},
+            {"name": "Veggie Pizza", "vendor": "Green Slice", "price": 22.50, "distance": 3.1, "lat": 43.64234, "lon": -79.36967, "rating": 4.7, "student_discount": False, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Meat Lovers Pizza", "vendor": "Quick Bite", "price": 18.99, "distance": 1.5, "lat": 43.66407, "lon": -79.41428, "rating": 4.2, "student_discount": True, "halal": True, "vegan": False, "ethical": False},
+            {"name": "Gourmet Pizza", "vendor": "Artisan Kitchen", "price": 32.00, "distance": 4.0, "lat": 43.68479, "lon": -79.35623, "rating": 4.9, "student_discount": False, "halal": False, "vegan": False, "ethical": True},
+            {"name": "Grocery Bundle", "vendor": "Fresh Mart", "price": 45.00, "distance": 1.0, "lat": 43.65404, "lon": -79.39786, "rating": 4.3, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
         ],
         "venue": [
-            {"name": "Community Hall", "vendor": "City Events", "price": 150.00, "distance": 2.0, "rating": 4.4, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
-            {"name": "Modern Conference Room", "vendor": "Business Center", "price": 200.00, "distance": 5.0, "rating": 4.6, "student_discount": False, "halal": True, "vegan": True, "ethical": True},
-            {"name": "Outdoor Space", "vendor": "Park Services", "price": 80.00, "distance": 3.5, "rating": 4.1, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Community Hall", "vendor": "City Events", "price": 150.00, "distance": 2.0, "lat": 43.67807, "lon": -79.40906, "rating": 4.4, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Modern Conference Room", "vendor": "Business Center", "price": 200.00, "distance": 5.0, "lat": 43.65125, "lon": -79.33567, "rating": 4.6, "student_discount": False, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Outdoor Space", "vendor": "Park Services", "price": 80.00, "distance": 3.5, "lat": 43.64836, "lon": -79.43429, "rating": 4.1, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
         ],
         "decor": [
-            {"name": "Balloon Package", "vendor": "Party Plus", "price": 35.00, "distance": 2.5, "rating": 4.3, "student_discount": True, "halal": True, "vegan": True, "ethical": False},
-            {"name": "Premium Decorations", "vendor": "Elegant Affairs", "price": 65.00, "distance": 4.5, "rating": 4.8, "student_discount": False, "halal": True, "vegan": True, "ethical": True},
-            {"name": "Budget Decor Set", "vendor": "ValueDecorations", "price": 25.00, "distance": 1.2, "rating": 3.9, "student_discount": True, "halal": True, "vegan": True, "ethical": False},
+            {"name": "Balloon Package", "vendor": "Party Plus", "price": 35.00, "distance": 2.5, "lat": 43.68403, "lon": -79.38507, "rating": 4.3, "student_discount": True, "halal": True, "vegan": True, "ethical": False},
+            {"name": "Premium Decorations", "vendor": "Elegant Affairs", "price": 65.00, "distance": 4.5, "lat": 43.62551, "lon": -79.37431, "rating": 4.8, "student_discount": False, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Budget Decor Set", "vendor": "ValueDecorations", "price": 25.00, "distance": 1.2, "lat": 43.66746, "lon": -79.40922, "rating": 3.9, "student_discount": True, "halal": True, "vegan": True, "ethical": False},
         ],
         "misc": [
-            {"name": "Supplies Bundle", "vendor": "Office Depot", "price": 30.00, "distance": 2.0, "rating": 4.5, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
-            {"name": "Tech Equipment Rental", "vendor": "TechRent", "price": 75.00, "distance": 3.0, "rating": 4.7, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Supplies Bundle", "vendor": "Office Depot", "price": 30.00, "distance": 2.0, "lat": 43.66831, "lon": -79.37199, "rating": 4.5, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
+            {"name": "Tech Equipment Rental", "vendor": "TechRent", "price": 75.00, "distance": 3.0, "lat": 43.63953, "lon": -79.41434, "rating": 4.7, "student_discount": True, "halal": True, "vegan": True, "ethical": True},
         ]
     }
     
+    # Per-category spatial index over vendor coordinates, built on first use
+    _geo_index: Dict[str, GridIndex] = {}
+    
+    @staticmethod
+    def get_geo_index(category: str) -> GridIndex:
+        """Spatial index of a category's vendors (lazily built from PRODUCT_DATABASE)"""
+        index = PersonalShopperAI._geo_index.get(category)
+        if index is None:
+            index = GridIndex()
+            for product in PersonalShopperAI.PRODUCT_DATABASE.get(category, []):
+                index.insert(product["lat"], product["lon"], product)
+            PersonalShopperAI._geo_index[category] = index
+        return index
+    
+    @staticmethod
+    def passes_filters(product: Dict, preferences: Dict) -> bool:
+        """Mandatory (non-distance) filters a product must satisfy"""
+        if preferences.get("student_discount") and not product["student_discount"]:
+            return False
+        if preferences.get("halal") and not product["halal"]:
+            return False
+        if preferences.get("vegan") and not product["vegan"]:
+            return False
+        if preferences.get("ethical") and not product["ethical"]:
+            return False
+        if preferences.get("max_price") and product["price"] > preferences["max_price"]:
+            return False
+        return True
+    
+    @staticmethod
+    def valid_price(price: Any) -> bool:
+        return isinstance(price, (int, float)) and not isinstance(price, bool) and math.isfinite(price) and price > 0
+    
+    @staticmethod
+    def apply_quote(product: Dict, quotes: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Merge a live vendor quote into a catalog product.
+        Returns None when the vendor reports the product unavailable; a quote without
+        a usable price (missing, non-numeric or not positive) is ignored.
+        """
+        quote = quotes.get((product["vendor"], product["name"])) if quotes else None
+        if quote is None:
+            return product
+        if not quote.get("available", True):
+            return None
+        if not PersonalShopperAI.valid_price(quote.get("price")):
+            return product
+        live_product = product.copy()
+        live_product["price"] = quote["price"]
+        live_product["live_price"] = True
+        return live_product
+    
+    @staticmethod
+    def locate_products(category: str, preferences: Dict, quotes: Optional[Dict] = None) -> List[Dict]:
+        """
+        Candidate products with distance computed from the user's location.
+        Radius filters and "closest" nearest-k queries only visit nearby grid cells.
+        """
+        lat = preferences["user_lat"]
+        lon = preferences["user_lon"]
+        index = PersonalShopperAI.get_geo_index(category)
+        
+        def matches(product: Dict) -> bool:
+            live_product = PersonalShopperAI.apply_quote(product, quotes)
+            return live_product is not None and PersonalShopperAI.passes_filters(live_product, preferences)
+        
+        if preferences.get("max_distance"):
+            located = index.within_radius(lat, lon, preferences["max_distance"], matches)
+        elif preferences.get("nearest_k"):
+            located = index.nearest(lat, lon, preferences["nearest_k"], matches)
+        else:
+            located = index.nearest(lat, lon, index.size, matches)
+        
+        products = []
+        for distance, product in located:
+            product = PersonalShopperAI.apply_quote(product, quotes).copy()
+            product["distance"] = round(distance, 2)
+            products.append(product)
+        return products
+    
+    @staticmethod
+    def estimate_delivery(distance_km: float) -> str:
+        """Delivery estimate from travel distance (about 15 minutes per km for local couriers)"""
+        minutes = distance_km * 15
+        if distance_km < 5:
+            return f"{max(5, round(minutes))} minutes"
+        hours = math.floor(minutes / 60)
+        return f"{hours}-{hours + 1} hours"
+    
     @staticmethod
     def calculate_score(product: Dict, preferences: Dict) -> float:
         """
@@ -80,31 +172,33 @@ class PersonalShopperAI:
         return round(score, 2)
     
     @staticmethod
-    def search_products(category: str, preferences: Dict) -> List[Dict]:
+    def search_products(category: str, preferences: Dict, quotes: Optional[Dict] = None) -> List[Dict]:
         """
         AI searches and ranks products based on user preferences
+        quotes: optional live vendor prices keyed by (vendor, product name)
         """
-        products = PersonalShopperAI.PRODUCT_DATABASE.get(category, [])
-        
-        # Apply hard filters first
-        filtered_products = []
-        for product in products:
-            # Check mandatory filters
-            if preferences.get("student_discount") and not product["student_discount"]:
-                continue
-            if preferences.get("halal") and not product["halal"]:
-                continue
-            if preferences.get("vegan") and not product["vegan"]:
-                continue
-            if preferences.get("ethical") and not product["ethical"]:
-                continue
-            if preferences.get("max_price") and product["price"] > preferences["max_price"]:
-                continue
-            if preferences.get("max_distance") and product["distance"] > preferences["max_distance"]:
-                continue
-            
-            filtered_products.append(product)
+        if preferences.get("user_lat") is not None and preferences.get("user_lon") is not None:
+            # Real distances from the user's location via the spatial index
+            filtered_products = PersonalShopperAI.locate_products(category, preferences, quotes)
+        else:
+            # Fall back to the precomputed campus distances
+            filtered_products = []
+            for product in PersonalShopperAI.PRODUCT_DATABASE.get(category, []):
+                product = PersonalShopperAI.apply_quote(product, quotes)
+                if product is None:
+                    continue
+                if not PersonalShopperAI.passes_filters(product, preferences):
+                    continue
+                if preferences.get("max_distance") and product["distance"] > preferences["max_distance"]:
+                    continue
+                filtered_products.append(product)
         
+        with metrics.timed(SEARCH_SCORING_SECONDS):
+            return PersonalShopperAI.rank_products(filtered_products, preferences)
+
+    @staticmethod
+    def rank_products(filtered_products: List[Dict], preferences: Dict) -> List[Dict]:
+        """Score, price and sort the products that passed the filters"""
         # Calculate AI scores for each product
         scored_products = []
         for product in filtered_products:
@@ -148,7 +242,7 @@ class PersonalShopperAI:
             "original_price": product["price"],
             "final_price": final_price,
             "savings": product.get("savings", 0),
-            "estimated_delivery": f"{product['distance'] * 15} minutes" if product['distance'] < 5 else "1-2 hours",
+            "estimated_delivery": PersonalShopperAI.estimate_delivery(product["distance"]),
             "payment_method": "Budget Account",
             "timestamp": datetime.now().isoformat(),
             "ai_reasoning": PersonalShopperAI.generate_reasoning(product, preferences)
@@ -0,0 +1,246 @@
+"""
+Request Profiler - Stdlib sampling profiler with slow-request capture
+Off by default: nothing is sampled until SLOW_REQUEST_MS is set, or an admin sets a
+slow threshold or starts a profiling session. While on, a background thread samples
+every thread's stack (sys._current_frames) during requests. Requests slower than the
+threshold, and requests picked by a profiling session (next N requests or a time
+window), keep the samples taken during their lifetime in a bounded ring buffer,
+exported as collapsed stacks (flamegraph input). Samples are process-wide: concurrent
+requests show up in each other's profiles, labelled by thread at the root of every stack.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))  # 0: slow capture off (opt in, e.g. 1000)
+SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 10))
+MAX_PROFILES = 50
+MAX_SAMPLES = 20000  # recent thread samples kept for attribution (~a few MB at most)
+
+# Leaf frames of threads that are waiting for work rather than doing it
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"), ("thread.py", "_worker"), ("queue.py", "get"), ("socket.py", "accept")
+}
+
+_labels: Dict[Any, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = os.path.basename(code.co_filename)
+        label = _labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+
+def _idle(code) -> bool:
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+class RequestProfiler:
+    def __init__(self, slow_ms: float = SLOW_REQUEST_MS, interval_ms: float = SAMPLE_INTERVAL_MS):
+        self.slow_ms = slow_ms
+        self.interval_ms = interval_ms
+        self.in_flight = 0
+        self.session: Optional[Dict[str, Any]] = None
+        self.samples: Deque[Tuple[float, Tuple[str, ...]]] = deque(maxlen=MAX_SAMPLES)
+        self.profiles: Deque[Dict[str, Any]] = deque(maxlen=MAX_PROFILES)
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.sequence = itertools.count(1)
+
+    # Sampling
+
+    def active(self) -> bool:
+        return bool(self.slow_ms) or self.session is not None
+
+    def _ensure_sampler(self) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+            self.thread = None
+
+    def _run(self) -> None:
+        while not self.stopping.wait(self.interval_ms / 1000):
+            if self.in_flight:
+                self.sample()
+
+    def sample(self) -> None:
+        """One stack per busy thread, root first with the thread name"""
+        now = time.monotonic()
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        taken = []
+        for ident, frame in sys._current_frames().items():
+            if ident == me or _idle(frame.f_code):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            stack.reverse()
+            taken.append((now, tuple(stack)))
+        with self.lock:
+            self.samples.extend(taken)
+
+    def samples_between(self, start: float, end: float) -> Counter:
+        with self.lock:
+            recent = list(self.samples)
+        return Counter(stack for t, stack in recent if start <= t <= end)
+
+    # Sessions
+
+    def start_session(self, requests: Optional[int] = None, seconds: Optional[float] = None,
+                      path_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Profile the next N matching requests and/or every matching request for a time window"""
+        self.session = {
+            "id": f"SES-{uuid.uuid4().hex[:8].upper()}",
+            "remaining": requests,
+            "until": time.monotonic() + seconds if seconds else None,
+            "path_prefix": path_prefix,
+            "started_at": datetime.now().isoformat()
+        }
+        return self.describe_session()
+
+    def stop_session(self) -> None:
+        self.session = None
+
+    def describe_session(self) -> Optional[Dict[str, Any]]:
+        session = self.session
+        if session is None:
+            return None
+        return {
+            "id": session["id"],
+            "remaining_requests": session["remaining"],
+            "seconds_left": round(max(0.0, session["until"] - time.monotonic()), 1) if session["until"] else None,
+            "path_prefix": session["path_prefix"],
+            "started_at": session["started_at"]
+        }
+
+    def _claim(self, path: str) -> Optional[str]:
+        """Session id if this request should be profiled (ending the session when it is used up)"""
+        session = self.session
+        if session is None or path.startswith("/admin"):
+            return None
+        if session["until"] is not None and time.monotonic() > session["until"]:
+            self.session = None
+            return None
+        if session["path_prefix"] and not path.startswith(session["path_prefix"]):
+            return None
+        if session["remaining"] is not None:
+            session["remaining"] -= 1
+            if session["remaining"] <= 0:
+                self.session = None
+        return session["id"]
+
+    # Captured profiles
+
+    def _record(self, scope: Dict, status: int, start: float, end: float, session_id: Optional[str]) -> None:
+        duration_ms = (end - start) * 1000
+        headers = dict(scope.get("headers") or [])
+        samples = self.samples_between(start, end)
+        profile = {
+            "id": f"PRF-{next(self.sequence):05d}",
+            "reason": "session" if session_id else "slow",
+            "session_id": session_id,
+            "started_at": datetime.fromtimestamp(time.time() - (time.monotonic() - start)).isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(scope.get("route"), "path", None),
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "content_length": int(headers.get(b"content-length", 0) or 0),
+            "status": status,
+            "sample_count": sum(samples.values()),
+            "interval_ms": self.interval_ms,
+            "samples": samples
+        }
+        with self.lock:
+            self.profiles.append(profile)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [{k: v for k, v in p.items() if k != "samples"} for p in reversed(self.profiles)]
+
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return next((p for p in self.profiles if p["id"] == profile_id), None)
+
+    @staticmethod
+    def collapsed(profiles: List[Dict[str, Any]]) -> str:
+        """Brendan Gregg's collapsed format: "frame;frame;frame count" per line"""
+        merged: Counter = Counter()
+        for profile in profiles:
+            merged.update(profile["samples"])
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in merged.most_common())
+
+    def all_profiles(self, reason: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [p for p in self.profiles if reason is None or p["reason"] == reason]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.profiles.clear()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "slow_threshold_ms": self.slow_ms,
+            "interval_ms": self.interval_ms,
+            "max_profiles": MAX_PROFILES,
+            "sampler_running": self.thread is not None and self.thread.is_alive(),
+            "in_flight": self.in_flight
+        }
+
+
+class ProfilerMiddleware:
+    """Counts in-flight requests for the sampler and captures profiles when requests end"""
+
+    def __init__(self, app, request_profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = request_profiler or profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if scope["type"] != "http" or not profiler.active():
+            await self.app(scope, receive, send)
+            return
+
+        profiler._ensure_sampler()
+        session_id = profiler._claim(scope["path"])
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # Middleware runs on the event loop thread only, so the counter needs no lock
+        profiler.in_flight += 1
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            end = time.monotonic()
+            profiler.in_flight -= 1
+            slow = profiler.slow_ms and (end - start) * 1000 >= profiler.slow_ms
+            if session_id or slow:
+                profiler._record(scope, status, start, end, session_id)
+
+
+profiler = RequestProfiler()
@@ -0,0 +1,263 @@
+"""
+Receipt Fingerprinting - Duplicate receipt detection
+MinHash signatures over normalized text with an LSH band index, plus an exact
+amount+date+vendor hash, persisted as an append-only log so it survives restarts.
+Each receipt is tagged with its budget and kept when a new budget starts, so a
+receipt claimed under an earlier budget is still caught. Deleted expenses are
+logged as removals; the log is rewritten once most of it is superseded.
+Changes are made in memory; save() (blocking: run_io) writes them to the log.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+INDEX_FILE = "app/db/receipt_fingerprints.jsonl"
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS  # 16 bands x 4 rows: candidate pairs from ~50% similarity
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_THRESHOLD = 0.75
+COMPACT_MIN_DEAD = 1000  # superseded log lines tolerated before a rewrite
+
+# XOR masks define the hash permutations; fixed seed keeps signatures stable across restarts
+_MASKS = [random.Random(20240601 + i).getrandbits(64) for i in range(NUM_HASHES)]
+
+_DATE_PATTERNS = [
+    re.compile(r'\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b'),
+    re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})\b'),
+]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation noise and collapse whitespace"""
+    text = re.sub(r'[^a-z0-9.$/\-\s]', ' ', text.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def minhash_signature(normalized: str) -> List[int]:
+    """MinHash over character shingles of the normalized text"""
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    hashes = [_hash64(s) for s in shingles]
+    return [min(h ^ mask for h in hashes) for mask in _MASKS]
+
+
+def extract_date(text: str) -> Optional[str]:
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return "-".join(match.groups())
+    return None
+
+
+def fingerprint_receipt(text: str, amount: float) -> Dict[str, Any]:
+    """
+    Fingerprint of a receipt.
+    The exact key is only set when a date is found, since amount+vendor alone
+    repeats legitimately (the same coffee order every week). For the same reason a
+    near (text) match only counts when the extracted date and amount agree too.
+    """
+    normalized = normalize_text(text)
+    date = extract_date(normalized)
+    vendor = next((line.strip() for line in text.lower().splitlines() if line.strip()), "")
+
+    exact = None
+    if date and amount:
+        exact = hashlib.sha256(f"{amount:.2f}|{date}|{normalize_text(vendor)}".encode()).hexdigest()
+
+    return {
+        "exact": exact,
+        "signature": minhash_signature(normalized),
+        "date": date,
+        "amount": round(amount, 2) if amount else None
+    }
+
+
+def same_receipt_details(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Dates and amounts agree where both receipts have them (older log entries have neither)"""
+    for field in ("date", "amount"):
+        if a.get(field) is not None and b.get(field) is not None and a[field] != b[field]:
+            return False
+    return True
+
+
+def estimated_similarity(a: List[int], b: List[int]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class ReceiptFingerprintIndex:
+    """
+    In-memory LSH index of every logged receipt, rebuilt from the append-only log at startup.
+    A lookup only compares against receipts sharing at least one band bucket.
+    """
+
+    def __init__(self, path: str = INDEX_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file_lock = threading.Lock()  # one save at a time, in order
+        self.loaded = False
+        self.exact: Dict[str, str] = {}
+        self.exact_keys: Dict[str, str] = {}  # expense id -> its exact key
+        self.buckets: Dict[str, List[str]] = {}
+        self.signatures: Dict[str, List[int]] = {}
+        self.budgets: Dict[str, Optional[str]] = {}  # expense id -> budget it was logged under
+        self.details: Dict[str, Dict[str, Any]] = {}  # expense id -> extracted date and amount
+        self.unsaved: List[Dict[str, Any]] = []
+        self.dead = 0  # log lines a later removal superseded (both count)
+
+    @staticmethod
+    def _band_keys(signature: List[int]) -> List[str]:
+        return [
+            f"{band}:" + ",".join(str(v) for v in signature[band * ROWS:(band + 1) * ROWS])
+            for band in range(BANDS)
+        ]
+
+    def _insert(self, expense_id: str, fingerprint: Dict[str, Any], budget_id: Optional[str]) -> None:
+        self.budgets[expense_id] = budget_id
+        if fingerprint.get("exact"):
+            self.exact.setdefault(fingerprint["exact"], expense_id)
+            self.exact_keys[expense_id] = fingerprint["exact"]
+        self.signatures[expense_id] = fingerprint["signature"]
+        self.details[expense_id] = {"date": fingerprint.get("date"), "amount": fingerprint.get("amount")}
+        for key in self._band_keys(fingerprint["signature"]):
+            self.buckets.setdefault(key, []).append(expense_id)
+
+    def _delete(self, expense_id: str) -> None:
+        signature = self.signatures.pop(expense_id, None)
+        if signature is None:
+            return
+        self.budgets.pop(expense_id, None)
+        self.details.pop(expense_id, None)
+        self.dead += 2
+        exact = self.exact_keys.pop(expense_id, None)
+        if exact and self.exact.get(exact) == expense_id:
+            del self.exact[exact]
+        for key in self._band_keys(signature):
+            bucket = self.buckets.get(key, [])
+            if expense_id in bucket:
+                bucket.remove(expense_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def _entry(self, expense_id: str) -> Dict[str, Any]:
+        return {
+            "expense_id": expense_id,
+            "budget_id": self.budgets[expense_id],
+            "exact": self.exact_keys.get(expense_id),
+            "signature": self.signatures[expense_id],
+            **self.details[expense_id]
+        }
+
+    def _load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry.get("removed"):
+                            self._delete(entry["expense_id"])
+                        else:
+                            self._insert(entry["expense_id"], entry, entry.get("budget_id"))
+        except Exception as e:
+            print(f"Error loading receipt index: {e}")
+
+    def load(self) -> None:
+        """Read the log now (startup, via run_io) rather than on the first lookup"""
+        with self.lock:
+            self._load()
+
+    def find_duplicate(self, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Matching earlier expense (of any budget, see budget_id), checking the exact key
+        first and then LSH candidates with the same date and amount
+        """
+        with self.lock:
+            self._load()
+
+            if fingerprint.get("exact") and fingerprint["exact"] in self.exact:
+                expense_id = self.exact[fingerprint["exact"]]
+                return {"expense_id": expense_id, "budget_id": self.budgets[expense_id], "match": "exact", "similarity": 1.0}
+
+            candidates = set()
+            for key in self._band_keys(fingerprint["signature"]):
+                candidates.update(self.buckets.get(key, ()))
+
+            best = None
+            for expense_id in candidates:
+                if not same_receipt_details(fingerprint, self.details[expense_id]):
+                    continue
+                similarity = estimated_similarity(fingerprint["signature"], self.signatures[expense_id])
+                if similarity >= NEAR_DUPLICATE_THRESHOLD and (best is None or similarity > best["similarity"]):
+                    best = {
+                        "expense_id": expense_id,
+                        "budget_id": self.budgets[expense_id],
+                        "match": "near",
+                        "similarity": round(similarity, 2)
+                    }
+            return best
+
+    def add(self, expense_id: str, fingerprint: Dict[str, Any], budget_id: Optional[str]) -> None:
+        """Index a receipt logged under budget_id; its log line is written by the next save()"""
+        with self.lock:
+            self._load()
+            self._insert(expense_id, fingerprint, budget_id)
+            self.unsaved.append(self._entry(expense_id))
+
+    def remove(self, expense_ids: List[str]) -> None:
+        """Forget receipts whose expenses are gone (deleted, or never committed)"""
+        with self.lock:
+            self._load()
+            for expense_id in expense_ids:
+                if expense_id in self.signatures:
+                    self._delete(expense_id)
+                    self.unsaved.append({"expense_id": expense_id, "removed": True})
+
+    def save(self) -> None:
+        """
+        Append the changes made since the last save (blocking). Once superseded lines
+        outnumber the live receipts the whole log is rewritten from memory instead.
+        Raises if the file can't be written; the changes stay unsaved for the next try.
+        """
+        with self.file_lock:
+            with self.lock:
+                if not self.unsaved:
+                    return
+                compact = self.dead >= COMPACT_MIN_DEAD and self.dead > len(self.signatures)
+                entries = [self._entry(expense_id) for expense_id in self.signatures] if compact else self.unsaved
+                written = len(self.unsaved)
+                dead = self.dead
+            lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            if compact:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(lines)
+                os.replace(tmp_path, self.path)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(lines)
+            with self.lock:
+                # Changes made while writing stay for the next save
+                del self.unsaved[:written]
+                if compact:
+                    self.dead -= dead
+
+
+receipt_index = ReceiptFingerprintIndex()
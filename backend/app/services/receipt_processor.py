@@ -4,8 +4,36 @@ Simulates AI-powered receipt verification, text extraction, and fraud detection
 """
 import re
 import random
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+from app.services.receipt_fingerprint import fingerprint_receipt
+
+def _build_scanner(amount_patterns: List[str], keywords: List[str]):
+    """
+    One regex for every amount pattern and keyword. Each alternative sits in a lookahead so
+    finditer tries every position and overlapping hits (like "hall" in "hallighting") are
+    all seen. Amount patterns capture into named groups a0, a1, ... (their first hit is the
+    leftmost match, as with search()); keywords sharing a first letter are grouped under it,
+    longest first, and end in an empty named group k0, k1, ... that names the keyword.
+    Keywords and amount patterns never start the same way, so one alternative per position
+    is enough; a keyword also implies the keywords it contains (_CONTAINED).
+    """
+    amounts = []
+    for index, pattern in enumerate(amount_patterns):
+        named = pattern.replace("(", f"(?P<a{index}>", 1)
+        # A match inside a run of digits is never the leftmost one
+        amounts.append(r"(?<!\d)" + named if pattern.startswith(r"(\d") else named)
+    
+    by_letter: Dict[str, List[str]] = {}
+    keyword_of = {}
+    for index, keyword in enumerate(sorted(keywords, key=len, reverse=True)):
+        keyword_of[f"k{index}"] = keyword
+        by_letter.setdefault(keyword[0], []).append(f"{re.escape(keyword[1:])}(?P<k{index}>)")
+    grouped = [f"{re.escape(letter)}(?:{'|'.join(tails)})" for letter, tails in by_letter.items()]
+    
+    contained = {k: [other for other in keywords if other in k] for k in keywords}
+    return re.compile("(?=" + "|".join(amounts + grouped) + ")"), keyword_of, contained
+
 
 class ReceiptProcessor:
     """
@@ -13,7 +41,7 @@ class ReceiptProcessor:
     In production, this would use OCR (Tesseract/AWS Textract) and ML models
     """
     
-    # Common receipt patterns for text extraction (simplified for prototype)
+    # Common receipt patterns for text extraction, in priority order (simplified for prototype)
     AMOUNT_PATTERNS = [
         r'total[:\s]+\$?(\d+\.?\d*)',
         r'amount[:\s]+\$?(\d+\.?\d*)',
@@ -28,66 +56,94 @@ class ReceiptProcessor:
         'fake', 'sample', 'template', 'draft'
     ]
     
+    # Simple keyword matching for categories, in priority order (prototype)
+    CATEGORY_KEYWORDS = {
+        'food': ['restaurant', 'cafe', 'pizza', 'burger', 'coffee', 'food', 'grocery', 'lunch', 'dinner', 'breakfast'],
+        'venue': ['venue', 'hall', 'rental', 'space', 'hotel', 'conference', 'room'],
+        'decor': ['decor', 'decoration', 'flowers', 'balloon', 'banner', 'lighting'],
+        'misc': ['misc', 'other', 'general', 'supply', 'office']
+    }
+    
+    # Every keyword set merged into one table
+    _KEYWORDS = list(dict.fromkeys(SUSPICIOUS_KEYWORDS + [k for words in CATEGORY_KEYWORDS.values() for k in words]))
+    _CATEGORY_OF = {k: cat for cat, words in CATEGORY_KEYWORDS.items() for k in words}
+    _SCANNER, _KEYWORD_OF, _CONTAINED = _build_scanner(AMOUNT_PATTERNS, _KEYWORDS)
+    
     @staticmethod
-    def extract_amount_from_text(text: str) -> float:
+    def scan_text(text: str) -> Dict[str, Any]:
         """
-        Extract monetary amount from receipt text
-        In production: Use trained ML model or advanced OCR
+        Extract amount, category hits and fraud keywords from receipt text in one
+        finditer walk over it. The result is shared by every step of the processing pipeline.
         """
-        text_lower = text.lower()
+        first_amounts: Dict[int, str] = {}
+        keywords = set()
+        for match in ReceiptProcessor._SCANNER.finditer(text.lower()):
+            name = match.lastgroup
+            if name[0] == "a":
+                first_amounts.setdefault(int(name[1:]), match.group(name))
+            else:
+                keywords.update(ReceiptProcessor._CONTAINED[ReceiptProcessor._KEYWORD_OF[name]])
         
-        # Try each pattern
-        for pattern in ReceiptProcessor.AMOUNT_PATTERNS:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            if matches:
-                try:
-                    amount = float(matches[0])
-                    if 0.01 <= amount <= 100000:  # Reasonable bounds
-                        return round(amount, 2)
-                except ValueError:
-                    continue
+        # First match of each pattern, in priority order, until one is in bounds
+        amount = 0.0
+        amount_candidates = []
+        for index in range(len(ReceiptProcessor.AMOUNT_PATTERNS)):
+            if index not in first_amounts:
+                continue
+            amount_candidates.append(first_amounts[index])
+            try:
+                value = float(first_amounts[index])
+            except ValueError:
+                continue
+            if 0.01 <= value <= 100000:  # Reasonable bounds
+                amount = round(value, 2)
+                break
         
-        return 0.0
+        hit_categories = {ReceiptProcessor._CATEGORY_OF[k] for k in keywords if k in ReceiptProcessor._CATEGORY_OF}
+        
+        return {
+            "amount": amount,
+            "amount_candidates": amount_candidates,
+            "categories": [c for c in ReceiptProcessor.CATEGORY_KEYWORDS if c in hit_categories],
+            "suspicious_keywords": [k for k in ReceiptProcessor.SUSPICIOUS_KEYWORDS if k in keywords]
+        }
+    
+    @staticmethod
+    def extract_amount_from_text(text: str, scan: Optional[Dict[str, Any]] = None) -> float:
+        """
+        Extract monetary amount from receipt text
+        In production: Use trained ML model or advanced OCR
+        """
+        scan = scan or ReceiptProcessor.scan_text(text)
+        return scan["amount"]
     
     @staticmethod
-    def detect_category_from_text(text: str) -> str:
+    def detect_category_from_text(text: str, scan: Optional[Dict[str, Any]] = None) -> str:
         """
         Use AI to detect expense category from receipt content
         In production: Use NLP/classification model
         """
-        text_lower = text.lower()
-        
-        # Simple keyword matching (prototype)
-        category_keywords = {
-            'food': ['restaurant', 'cafe', 'pizza', 'burger', 'coffee', 'food', 'grocery', 'lunch', 'dinner', 'breakfast'],
-            'venue': ['venue', 'hall', 'rental', 'space', 'hotel', 'conference', 'room'],
-            'decor': ['decor', 'decoration', 'flowers', 'balloon', 'banner', 'lighting'],
-            'misc': ['misc', 'other', 'general', 'supply', 'office']
-        }
-        
-        for category, keywords in category_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return category
-        
-        return 'misc'
+        scan = scan or ReceiptProcessor.scan_text(text)
+        return scan["categories"][0] if scan["categories"] else 'misc'
     
     @staticmethod
-    def verify_authenticity(text: str, filename: str) -> Dict[str, Any]:
+    def verify_authenticity(text: str, filename: str, scan: Optional[Dict[str, Any]] = None,
+                            quality_score: Optional[int] = None) -> Dict[str, Any]:
         """
         AI-powered authenticity verification
         In production: Use image analysis, metadata check, ML fraud detection
         """
-        text_lower = text.lower()
+        scan = scan or ReceiptProcessor.scan_text(text)
         filename_lower = filename.lower()
         
         # Check for suspicious keywords
         suspicious_flags = []
         for keyword in ReceiptProcessor.SUSPICIOUS_KEYWORDS:
-            if keyword in text_lower or keyword in filename_lower:
+            if keyword in scan["suspicious_keywords"] or keyword in filename_lower:
                 suspicious_flags.append(f"Contains '{keyword}'")
         
         # Check if amount is extracted (real receipts have amounts)
-        amount = ReceiptProcessor.extract_amount_from_text(text)
+        amount = scan["amount"]
         if amount == 0:
             suspicious_flags.append("No valid amount detected")
         
@@ -95,9 +151,9 @@ class ReceiptProcessor:
         if amount > 10000:
             suspicious_flags.append(f"Unusually high amount: ${amount}")
         
-        # Simulated image quality check (in production: analyze actual image)
-        # For prototype, randomly flag some as low quality
-        quality_score = random.randint(60, 100)
+        # Image quality from OCR confidence; simulated for plain-text uploads
+        if quality_score is None:
+            quality_score = random.randint(60, 100)
         if quality_score < 70:
             suspicious_flags.append(f"Low image quality: {quality_score}%")
         
@@ -121,25 +177,33 @@ class ReceiptProcessor:
         }
     
     @staticmethod
-    def process_receipt(text: str, filename: str, user_category: str = None) -> Dict[str, Any]:
+    def process_receipt(text: str, filename: str, user_category: str = None,
+                        quality_score: Optional[int] = None) -> Dict[str, Any]:
         """
         Complete receipt processing pipeline
         """
+        # Step 0: One scan of the text, shared by every step below
+        scan = ReceiptProcessor.scan_text(text)
+        
         # Step 1: Verify authenticity
-        verification = ReceiptProcessor.verify_authenticity(text, filename)
+        verification = ReceiptProcessor.verify_authenticity(text, filename, scan, quality_score)
         
         # Step 2: Extract amount
-        amount = ReceiptProcessor.extract_amount_from_text(text)
+        amount = ReceiptProcessor.extract_amount_from_text(text, scan)
         
         # Step 3: Detect category (or use user-provided)
-        ai_category = ReceiptProcessor.detect_category_from_text(text)
+        ai_category = ReceiptProcessor.detect_category_from_text(text, scan)
         final_category = user_category if user_category else ai_category
         
+        # Step 4: Fingerprint for duplicate detection
+        fingerprint = fingerprint_receipt(text, amount)
+        
         return {
             "amount": amount,
             "category": final_category,
             "ai_suggested_category": ai_category,
             "verification": verification,
+            "fingerprint": fingerprint,
             "filename": filename,
             "processed_at": datetime.now().isoformat()
         }
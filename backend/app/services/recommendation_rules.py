@@ -0,0 +1,147 @@
+"""
+Recommendation Rules - Declarative rule registry for the agentic AI
+Rules declare the derived features they read; features are computed lazily, at most
+once per evaluation, and shared by every rule (and by feedback and recommendations)
+"""
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.services.metrics import RULE_EVAL_SECONDS, metrics
+
+FEATURES: Dict[str, Callable[["RuleContext"], Any]] = {}
+
+
+def feature(name: str):
+    """Register a derived feature computed from the budget data"""
+    def register(fn: Callable[["RuleContext"], Any]):
+        FEATURES[name] = fn
+        return fn
+    return register
+
+
+class RuleContext:
+    """One evaluation's view of the budget; ctx["name"] computes a feature on first use"""
+
+    def __init__(self, data: Dict):
+        self.data = data or {}
+        self.values: Dict[str, Any] = {}
+        self.emitted: List[Any] = []
+        self.timings: Dict[str, float] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.values:
+            self.values[name] = FEATURES[name](self)
+        return self.values[name]
+
+
+class Rule:
+    """
+    when(ctx) -> bool decides whether the rule fires; then(ctx) returns what it emits
+    (a list of recommendations, or a single item). A firing rule with stop=True ends
+    the evaluation, so cheap, decisive rules should get low priority numbers.
+    """
+
+    def __init__(self, name: str, priority: int, when: Callable[[RuleContext], bool],
+                 then: Callable[[RuleContext], Any], requires: Iterable[str] = (), stop: bool = False):
+        self.name = name
+        self.priority = priority
+        self.when = when
+        self.then = then
+        self.requires = tuple(requires)
+        self.stop = stop
+
+
+class RuleEngine:
+    """Rules sorted by priority (lower first), evaluated with per-rule timing stats"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rules: List[Rule] = []
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def register(self, rule: Rule) -> Rule:
+        missing = [f for f in rule.requires if f not in FEATURES]
+        if missing:
+            raise ValueError(f"Rule {rule.name} requires unknown features: {', '.join(missing)}")
+        if any(r.name == rule.name for r in self.rules):
+            raise ValueError(f"Rule {rule.name} is already registered")
+        with self.lock:
+            keys = [r.priority for r in self.rules]
+            self.rules.insert(bisect.bisect_right(keys, rule.priority), rule)
+            self.stats[rule.name] = {"evaluations": 0, "fired": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+        return rule
+
+    def rule(self, name: str, priority: int, requires: Iterable[str] = (), stop: bool = False,
+             when: Optional[Callable[[RuleContext], bool]] = None):
+        """Decorator form: the decorated function is the rule's `then`"""
+        def register(then: Callable[[RuleContext], Any]):
+            self.register(Rule(name, priority, when or (lambda ctx: True), then, requires, stop))
+            return then
+        return register
+
+    def unregister(self, name: str) -> None:
+        with self.lock:
+            self.rules = [r for r in self.rules if r.name != name]
+            self.stats.pop(name, None)
+
+    def _record(self, name: str, elapsed_ms: float, fired: bool, failed: bool) -> None:
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                return
+            stats["evaluations"] += 1
+            stats["fired"] += fired
+            stats["errors"] += failed
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def evaluate(self, ctx: RuleContext) -> List[Any]:
+        """
+        Run rules in priority order and collect what fires. A failing rule is
+        skipped (and counted) rather than breaking the dashboard.
+        """
+        ctx.emitted = []
+        with metrics.timed(RULE_EVAL_SECONDS, self.name):
+            self._run(ctx)
+        return ctx.emitted
+
+    def _run(self, ctx: RuleContext) -> None:
+        for rule in list(self.rules):
+            start = time.perf_counter()
+            fired = failed = False
+            try:
+                if rule.when(ctx):
+                    output = rule.then(ctx)
+                    if isinstance(output, list):
+                        ctx.emitted.extend(output)
+                        fired = bool(output)
+                    elif output is not None:
+                        ctx.emitted.append(output)
+                        fired = True
+            except Exception as e:
+                failed = True
+                print(f"Rule {rule.name} failed: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            ctx.timings[f"{self.name}.{rule.name}"] = elapsed_ms
+            self._record(rule.name, elapsed_ms, fired, failed)
+            if fired and rule.stop:
+                break
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Registered rules in evaluation order with their timing stats"""
+        with self.lock:
+            return [
+                {
+                    "name": r.name,
+                    "priority": r.priority,
+                    "requires": list(r.requires),
+                    "stop": r.stop,
+                    **self.stats[r.name],
+                    "avg_ms": self.stats[r.name]["total_ms"] / self.stats[r.name]["evaluations"]
+                    if self.stats[r.name]["evaluations"] else 0.0
+                }
+                for r in self.rules
+            ]
@@ -0,0 +1,307 @@
+"""
+Reconciler - Background check of derived totals against the raw records
+One durable snapshot of the data file is streamed element by element (expenses,
+Interac and wallet transactions, ledger entries), so memory stays bounded by the
+reader's chunk size plus one running total per account and category. Every derived
+value is recomputed and compared. Derived caches (ledger balances, categories,
+remaining, wallet balance, allocation statistics) can be repaired; disagreements
+between raw records are only reported.
+"""
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from app.db import db
+from app.db.json_stream import JSONStreamReader
+from app.db.store import store
+from app.services.executors import run_io
+from app.services.ledger import TOLERANCE, UNALLOCATED, WALLET, category_account, spent_account
+
+RECONCILE_INTERVAL_S = float(os.environ.get("RECONCILE_INTERVAL_S", 3600))  # 0: on demand only
+RECONCILE_REPAIR = os.environ.get("RECONCILE_REPAIR", "0") == "1"
+CHUNK_BYTES = int(os.environ.get("RECONCILE_CHUNK_BYTES", 64 * 1024))
+MAX_REPORTS = 20
+MAX_LISTED = 200  # discrepancies listed per report; the rest are only counted
+
+SCALARS = ("budget_id", "state_version", "total_budget", "remaining", "categories")
+
+
+def _add(totals: Dict[str, float], key: str, amount: float) -> None:
+    totals[key] = round(totals.get(key, 0.0) + amount, 2)
+
+
+def scan(path: str, chunk_size: int = CHUNK_BYTES) -> Dict[str, Any]:
+    """Single streaming pass over the data file; returns the stored and recomputed totals"""
+    found: Dict[str, Any] = {
+        "categories": {},
+        "expenses": 0,
+        "spent": {},  # per category, from the expense list
+        "interac_transactions": 0,
+        "budget_sends": 0.0,  # Interac sends paid from the budget
+        "wallet_balance": None,
+        "wallet_transactions": 0,
+        "wallet_sum": 0.0,
+        "allocation_current": None,
+        "ledger": None
+    }
+    with open(path, "r") as f:
+        reader = JSONStreamReader(f, chunk_size)
+        if reader.peek() != "{":
+            raise ValueError("Data file does not hold a JSON object")
+        for key in reader.members():
+            if key == "expenses":
+                for expense in reader.elements():
+                    found["expenses"] += 1
+                    _add(found["spent"], expense["category"], expense["amount"])
+            elif key == "transactions":
+                for transaction in reader.elements():
+                    found["interac_transactions"] += 1
+                    if transaction.get("type") == "send" and transaction.get("payment_method") == "interac":
+                        found["budget_sends"] = round(found["budget_sends"] + transaction["amount"], 2)
+            elif key == "wallet":
+                for wallet_key in reader.members():
+                    if wallet_key == "transactions":
+                        for transaction in reader.elements():
+                            found["wallet_transactions"] += 1
+                            found["wallet_sum"] = round(found["wallet_sum"] + transaction.get("amount", 0.0), 2)
+                    elif wallet_key == "balance":
+                        found["wallet_balance"] = reader.value()
+                    else:
+                        reader.skip()
+            elif key == "ledger":
+                found["ledger"] = _scan_ledger(reader)
+            elif key == "allocation_stats":
+                found["allocation_current"] = reader.value().get("current", {})
+            elif key in SCALARS:
+                found[key] = reader.value()
+            else:
+                reader.skip()
+    return found
+
+
+def _scan_ledger(reader: JSONStreamReader) -> Dict[str, Any]:
+    ledger: Dict[str, Any] = {"entries": 0, "recomputed": {}, "cached": {}, "unbalanced": [], "unbalanced_count": 0}
+    for key in reader.members():
+        if key == "entries":
+            for entry in reader.elements():
+                ledger["entries"] += 1
+                total = 0.0
+                for posting in entry["postings"]:
+                    _add(ledger["recomputed"], posting["account"], posting["amount"])
+                    total += posting["amount"]
+                if abs(total) >= TOLERANCE:
+                    ledger["unbalanced_count"] += 1
+                    if len(ledger["unbalanced"]) < MAX_LISTED:
+                        ledger["unbalanced"].append({"id": entry["id"], "imbalance": round(total, 2)})
+        elif key == "balances":
+            ledger["cached"] = reader.value()
+        else:
+            reader.skip()
+    return ledger
+
+
+class _Changed(Exception):
+    pass
+
+
+class _Findings:
+    def __init__(self):
+        self.listed: List[Dict[str, Any]] = []
+        self.count = 0
+        self.fixes: Dict[str, Any] = {}
+
+    def compare(self, check: str, subject: str, expected: float, actual: Optional[float],
+                fix: Optional[str] = None) -> None:
+        """Record a discrepancy; `fix` names the derived value repair() would set to `expected`"""
+        actual = actual or 0.0
+        if abs(expected - actual) < TOLERANCE:
+            return
+        self.count += 1
+        if len(self.listed) < MAX_LISTED:
+            self.listed.append({
+                "check": check,
+                "subject": subject,
+                "expected": round(expected, 2),
+                "actual": round(actual, 2),
+                "difference": round(actual - expected, 2),
+                "repairable": fix is not None
+            })
+        if fix is not None:
+            self.fixes.setdefault(fix, {})[subject] = round(expected, 2)
+
+
+def evaluate(found: Dict[str, Any]) -> _Findings:
+    findings = _Findings()
+    categories = found["categories"]
+    ledger = found["ledger"]
+
+    # Raw records against each other
+    if "total_budget" in found:
+        findings.compare("remaining_vs_records", "remaining",
+                         found["total_budget"] - sum(found["spent"].values()) - found["budget_sends"],
+                         found.get("remaining"))
+    if found["wallet_balance"] is not None:
+        findings.compare("wallet_vs_transactions", "wallet.balance", found["wallet_sum"], found["wallet_balance"])
+
+    # Allocation statistics are a cache of per-category spending
+    if found["allocation_current"] is not None:
+        for name in sorted(set(found["spent"]) | set(found["allocation_current"])):
+            findings.compare("allocation_stats", name, found["spent"].get(name, 0.0),
+                             found["allocation_current"].get(name), fix="allocation_current")
+
+    if ledger is None:
+        # Opened on the next write from these very fields; only their internal consistency matters
+        findings.compare("remaining_vs_categories", "remaining", sum(categories.values()), found.get("remaining"))
+        return findings
+
+    recomputed = ledger["recomputed"]
+    for entry in ledger["unbalanced"]:
+        findings.compare("ledger_entry_balance", entry["id"], 0.0, entry["imbalance"])
+    findings.count += ledger["unbalanced_count"] - len(ledger["unbalanced"])
+    for account in sorted(set(recomputed) | set(ledger["cached"])):
+        findings.compare("ledger_balance_cache", account, recomputed.get(account, 0.0),
+                         ledger["cached"].get(account), fix="ledger_balances")
+    for name in sorted(set(found["spent"]) | {a.split(":", 1)[1] for a in recomputed if a.startswith("spent:")}):
+        findings.compare("spent_vs_expenses", name, found["spent"].get(name, 0.0),
+                         recomputed.get(spent_account(name)))
+
+    # Projections of the ledger
+    for name in sorted(set(categories) | {a.split(":", 1)[1] for a in recomputed if a.startswith("category:")}):
+        findings.compare("category_projection", name, recomputed.get(category_account(name), 0.0),
+                         categories.get(name), fix="categories")
+    envelope = sum(v for a, v in recomputed.items() if a.startswith("category:") or a == UNALLOCATED)
+    findings.compare("remaining_projection", "remaining", envelope, found.get("remaining"), fix="remaining")
+    if found["wallet_balance"] is not None or WALLET in recomputed:
+        findings.compare("wallet_projection", "wallet.balance", recomputed.get(WALLET, 0.0),
+                         found["wallet_balance"], fix="wallet_balance")
+    return findings
+
+
+def apply_fixes(data: Dict, fixes: Dict[str, Dict[str, float]]) -> int:
+    """Set derived values to their recomputed totals; returns how many were changed"""
+    fixed = 0
+    for account, amount in fixes.get("ledger_balances", {}).items():
+        data["ledger"]["balances"][account] = amount
+        fixed += 1
+    for name, amount in fixes.get("categories", {}).items():
+        data.setdefault("categories", {})[name] = amount
+        fixed += 1
+    if "remaining" in fixes:
+        data["remaining"] = fixes["remaining"]["remaining"]
+        fixed += 1
+    if "wallet_balance" in fixes:
+        data.setdefault("wallet", {"balance": 0.0, "transactions": []})["balance"] = fixes["wallet_balance"]["wallet.balance"]
+        fixed += 1
+    for name, amount in fixes.get("allocation_current", {}).items():
+        data["allocation_stats"]["current"][name] = amount
+        fixed += 1
+    return fixed
+
+
+class Reconciler:
+    def __init__(self, interval_s: float = RECONCILE_INTERVAL_S, repair: bool = RECONCILE_REPAIR,
+                 chunk_bytes: int = CHUNK_BYTES):
+        self.interval_s = interval_s
+        self.repair = repair
+        self.chunk_bytes = chunk_bytes
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=MAX_REPORTS)
+        self.sequence = itertools.count(1)
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running: Optional[asyncio.Lock] = None
+
+    def start(self) -> None:
+        """Schedule periodic runs on the running loop (app startup)"""
+        if self.interval_s > 0 and (self.task is None or self.task.done()):
+            self.task = asyncio.get_running_loop().create_task(self._schedule())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.run(repair=self.repair, trigger="schedule")
+            except Exception as e:
+                print(f"Reconciliation failed: {e}")
+
+    async def run(self, repair: bool = False, trigger: str = "manual") -> Dict[str, Any]:
+        """Scan, compare and (optionally) repair; one run at a time"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.running = loop, asyncio.Lock()
+        async with self.running:
+            # Push acknowledged-but-unflushed writes to the file, so the scan sees them
+            await store.flush()
+            started = time.monotonic()
+            report: Dict[str, Any] = {
+                "id": f"REC-{next(self.sequence):05d}",
+                "trigger": trigger,
+                "started_at": datetime.now().isoformat(),
+                "repair": None
+            }
+            try:
+                found = await run_io(scan, db.FILE, self.chunk_bytes)
+            except FileNotFoundError:
+                report.update(status="no_data", discrepancy_count=0, discrepancies=[])
+            except Exception as e:
+                report.update(status="error", detail=str(e), discrepancy_count=0, discrepancies=[])
+            else:
+                findings = evaluate(found)
+                report.update(
+                    status="discrepancies" if findings.count else "ok",
+                    budget_id=found.get("budget_id"),
+                    state_version=found.get("state_version"),
+                    scanned={
+                        "expenses": found["expenses"],
+                        "interac_transactions": found["interac_transactions"],
+                        "wallet_transactions": found["wallet_transactions"],
+                        "ledger_entries": found["ledger"]["entries"] if found["ledger"] else None
+                    },
+                    discrepancy_count=findings.count,
+                    discrepancies=findings.listed
+                )
+                if repair:
+                    report["repair"] = await self._repair(found.get("state_version"), findings.fixes)
+            report["duration_ms"] = round((time.monotonic() - started) * 1000, 2)
+            self.reports.append(report)
+            return report
+
+    @staticmethod
+    async def _repair(version: Optional[int], fixes: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+        if not fixes:
+            return {"status": "nothing_to_repair", "fixed": 0}
+        try:
+            async with store.write() as data:
+                # The fixes only hold for the scanned version (raising leaves it uncommitted)
+                if data.get("state_version") != version:
+                    raise _Changed()
+                fixed = apply_fixes(data, fixes)
+        except _Changed:
+            return {"status": "skipped", "fixed": 0, "reason": "The budget changed after the scan; run again"}
+        return {"status": "applied", "fixed": fixed}
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        return next((r for r in self.reports if r["id"] == report_id), None)
+
+    def list_reports(self) -> List[Dict[str, Any]]:
+        return [{k: v for k, v in r.items() if k != "discrepancies"} for r in reversed(self.reports)]
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval_s,
+            "auto_repair": self.repair,
+            "chunk_bytes": self.chunk_bytes,
+            "scheduled": self.task is not None and not self.task.done()
+        }
+
+
+reconciler = Reconciler()
@@ -0,0 +1,63 @@
+"""
+Search Quotes - What a shopping search showed, for the purchase that follows
+/shop/search saves its ranked products (with the live vendor prices they were
+priced at) under a quote id; /shop/purchase picks the product from that quote by
+product id, so it charges exactly what the user saw. Quotes expire after
+SEARCH_QUOTE_TTL_SECONDS and live in this process only.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+QUOTE_TTL_SECONDS = float(os.environ.get("SEARCH_QUOTE_TTL_SECONDS", 900))
+
+
+def product_id(product: Dict[str, Any]) -> str:
+    return f"{product['vendor']}/{product['name']}"
+
+
+class SearchQuotes:
+    """Bounded LRU of recent searches: quote id -> category, products and expiry"""
+
+    def __init__(self, ttl: float = QUOTE_TTL_SECONDS, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def save(self, category: str, products: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Tag each product with its product_id and remember them; returns the quote"""
+        for product in products:
+            product["product_id"] = product_id(product)
+        quote = {
+            "quote_id": f"Q-{uuid.uuid4().hex[:12].upper()}",
+            "category": category,
+            "products": products,
+            "expires_at": time.time() + self.ttl
+        }
+        with self.lock:
+            self.entries[quote["quote_id"]] = quote
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return quote
+
+    def get(self, quote_id: str) -> Optional[Dict[str, Any]]:
+        """The quote, or None if it is unknown or expired"""
+        with self.lock:
+            quote = self.entries.get(quote_id)
+            if quote is None:
+                return None
+            if quote["expires_at"] <= time.time():
+                del self.entries[quote_id]
+                return None
+            return quote
+
+    @staticmethod
+    def product(quote: Dict[str, Any], selected_id: str) -> Optional[Dict[str, Any]]:
+        return next((p for p in quote["products"] if p["product_id"] == selected_id), None)
+
+
+search_quotes = SearchQuotes()
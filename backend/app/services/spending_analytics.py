@@ -0,0 +1,273 @@
+"""
+Spending Analytics - Columnar expense analysis for the agentic AI
+Expenses are converted once into arrays (amount, category code, timestamp), kept
+for the live expense list and extended as expenses are appended, and reduced with
+NumPy group-by style operations. NumPy is optional (not in requirements.txt): the
+pure Python path is the default and gives the same results.
+Both paths read naive timestamps as wall-clock time (seconds as if they were UTC),
+so windows line up with datetime.now() whatever the server's timezone.
+"""
+import math
+import threading
+import warnings
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY_SECONDS = 86400.0
+ROLLING_WINDOWS = {"rolling_7d": 7, "rolling_30d": 30}
+MAX_HORIZON_DAYS = 3650  # beyond this a category is effectively not depleting (no date is given)
+
+
+def expense_time(expense: Dict) -> str:
+    """When the expense happened (manual entries and receipts use different keys)"""
+    return expense.get("timestamp") or expense.get("processed_at") or expense.get("payment_date") or ""
+
+
+def wall_seconds(value: Any) -> float:
+    """Seconds for a datetime or ISO string: naive ones as wall-clock time, NaN if unparseable"""
+    try:
+        moment = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return math.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _wall_seconds_array(times: List[str]) -> "np.ndarray":
+    """
+    wall_seconds over ISO strings in bulk: a trailing Z or +HH:MM / +HHMM offset is cut
+    off with byte-matrix operations and subtracted, and the naive rest is parsed in C
+    by datetime64. Raises ValueError (or a warning as error) for anything it can't read.
+    """
+    raw = np.array([(t or "NaT").encode("ascii") for t in times], dtype="S")
+    n, width = len(raw), raw.dtype.itemsize
+    chars = raw.view(np.uint8).reshape(n, width)
+    lengths = (chars != 0).sum(axis=1)
+    rows = np.arange(n)
+    # The last six characters of each string, tail[k] being the k-th from the end
+    tail = {k: np.where(lengths >= k, chars[rows, np.maximum(lengths - k, 0)], 0).astype(np.int64) for k in range(1, 7)}
+    digit = {k: tail[k] - ord("0") for k in range(1, 6)}
+    plus, minus = ord("+"), ord("-")
+
+    timed = lengths >= 16  # an offset only follows a time
+    zulu = timed & (tail[1] == ord("Z"))
+    colon = timed & ((tail[6] == plus) | (tail[6] == minus)) & (tail[3] == ord(":"))
+    compact = timed & ~colon & ((tail[5] == plus) | (tail[5] == minus))
+    sign = np.where(np.where(colon, tail[6], tail[5]) == minus, -1, 1)
+    offsets = np.where(colon, (digit[5] * 10 + digit[4]) * 3600, (digit[4] * 10 + digit[3]) * 3600)
+    offsets = np.where(colon | compact, (offsets + (digit[2] * 10 + digit[1]) * 60) * sign, 0)
+
+    cut = lengths - np.where(colon, 6, np.where(compact, 5, np.where(zulu, 1, 0)))
+    chars[np.arange(width)[None, :] >= cut[:, None]] = 0
+    stamps = raw.astype("datetime64[us]")
+    seconds = stamps.astype("int64").astype(np.float64) / 1e6 - offsets
+    seconds[np.isnat(stamps)] = np.nan
+    return seconds
+
+
+class ExpenseColumns:
+    """
+    Column view of an expense list.
+    Category codes index into `categories`; timestamps are wall-clock seconds (see wall_seconds; NaN if unknown).
+    """
+
+    def __init__(self, expenses: List[Dict] = ()):
+        self.count = 0
+        self.categories: List[str] = []
+        if np is not None:
+            self.amounts = np.empty(0, dtype=np.float64)
+            self.codes = np.empty(0, dtype=np.int64)
+            self.timestamps = np.empty(0, dtype=np.float64)
+        else:
+            self.amounts, self.codes, self.timestamps = [], [], []
+        self._append(expenses)
+
+    def extended(self, expenses: List[Dict]) -> "ExpenseColumns":
+        """A copy with expenses appended (converting only those); self is left as it was"""
+        columns = ExpenseColumns.__new__(ExpenseColumns)
+        columns.count = self.count
+        columns.categories = list(self.categories)
+        columns.amounts, columns.codes, columns.timestamps = self.amounts, self.codes, self.timestamps
+        columns._append(expenses)
+        return columns
+
+    def _append(self, expenses: List[Dict]) -> None:
+        count = len(expenses)
+        codes = {name: code for code, name in enumerate(self.categories)}
+
+        if np is not None:
+            amounts = np.fromiter((e["amount"] for e in expenses), dtype=np.float64, count=count)
+            new_codes = np.fromiter(
+                (codes.setdefault(e["category"], len(codes)) for e in expenses), dtype=np.int64, count=count
+            )
+            times = [expense_time(e) for e in expenses]
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error")
+                    seconds = _wall_seconds_array(times)
+            except (ValueError, UnicodeError, Warning):
+                # Malformed strings: one at a time
+                seconds = np.fromiter((wall_seconds(t) for t in times), dtype=np.float64, count=count)
+            self.amounts = np.concatenate((self.amounts, amounts))
+            self.codes = np.concatenate((self.codes, new_codes))
+            self.timestamps = np.concatenate((self.timestamps, seconds))
+        else:
+            self.amounts = self.amounts + [e["amount"] for e in expenses]
+            self.codes = self.codes + [codes.setdefault(e["category"], len(codes)) for e in expenses]
+            self.timestamps = self.timestamps + [wall_seconds(expense_time(e)) for e in expenses]
+
+        self.count += count
+        self.categories = list(codes)
+
+
+class ColumnCache:
+    """
+    Columns of the live expense list, converted once and extended when expenses are
+    appended. Rebuilt when the list is replaced (a new budget) or shrank or shifted
+    (a deletion), detected by comparing the last converted row.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source: Optional[List[Dict]] = None
+        self.columns: Optional[ExpenseColumns] = None
+        self.last: Optional[tuple] = None
+        self.rebuilds = 0
+
+    @staticmethod
+    def _row(expense: Dict) -> tuple:
+        return expense["amount"], expense["category"], expense_time(expense)
+
+    def of(self, expenses: List[Dict]) -> ExpenseColumns:
+        with self.lock:
+            columns = self.columns
+            if (columns is None or self.source is not expenses or len(expenses) < columns.count
+                    or (columns.count and self._row(expenses[columns.count - 1]) != self.last)):
+                columns = ExpenseColumns(expenses)
+                self.rebuilds += 1
+            elif len(expenses) > columns.count:
+                columns = columns.extended(expenses[columns.count:])
+            self.source = expenses
+            self.columns = columns
+            self.last = self._row(expenses[-1]) if expenses else None
+            return columns
+
+
+expense_columns = ColumnCache()
+
+
+class SpendingAnalytics:
+    """Per-category totals, real per-day velocity, rolling windows and depletion ETAs"""
+
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {
+            "total_spent": 0,
+            "avg_daily_spend": 0,
+            "avg_per_transaction": 0,
+            "category_totals": {},
+            "category_counts": {},
+            "category_velocity": {},
+            **{name: {} for name in ROLLING_WINDOWS},
+            "active_days": 0,
+            "expense_count": 0
+        }
+
+    @staticmethod
+    def analyze(expenses: List[Dict], columns: Optional[ExpenseColumns] = None,
+                now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Spending patterns over the whole history.
+        Velocity is spend per calendar day between the first and last dated expense (min 1 day).
+        """
+        if not expenses:
+            return SpendingAnalytics._empty()
+
+        columns = columns or expense_columns.of(expenses)
+        now_ts = wall_seconds(now or datetime.now())
+        if np is not None:
+            return SpendingAnalytics._analyze_numpy(columns, now_ts)
+        return SpendingAnalytics._analyze_python(columns, now_ts)
+
+    @staticmethod
+    def _analyze_numpy(columns: ExpenseColumns, now_ts: float) -> Dict[str, Any]:
+        k = len(columns.categories)
+        totals = np.bincount(columns.codes, weights=columns.amounts, minlength=k)
+        counts = np.bincount(columns.codes, minlength=k)
+
+        dated = ~np.isnan(columns.timestamps)
+        if dated.any():
+            span = columns.timestamps[dated]
+            active_days = max(1.0, (span.max() - span.min()) / DAY_SECONDS)
+        else:
+            active_days = 1.0
+
+        rolling = {}
+        for name, days in ROLLING_WINDOWS.items():
+            recent = dated & (columns.timestamps >= now_ts - days * DAY_SECONDS)
+            window = np.bincount(columns.codes[recent], weights=columns.amounts[recent], minlength=k)
+            rolling[name] = dict(zip(columns.categories, window.tolist()))
+
+        total_spent = float(totals.sum())
+        return {
+            "total_spent": total_spent,
+            "avg_daily_spend": total_spent / active_days,
+            "avg_per_transaction": total_spent / columns.count,
+            "category_totals": dict(zip(columns.categories, totals.tolist())),
+            "category_counts": dict(zip(columns.categories, counts.tolist())),
+            "category_velocity": dict(zip(columns.categories, (totals / active_days).tolist())),
+            **rolling,
+            "active_days": active_days,
+            "expense_count": columns.count
+        }
+
+    @staticmethod
+    def _analyze_python(columns: ExpenseColumns, now_ts: float) -> Dict[str, Any]:
+        totals = dict.fromkeys(columns.categories, 0.0)
+        counts = dict.fromkeys(columns.categories, 0)
+        rolling = {name: dict.fromkeys(columns.categories, 0.0) for name in ROLLING_WINDOWS}
+        first = last = None
+
+        for amount, code, ts in zip(columns.amounts, columns.codes, columns.timestamps):
+            cat = columns.categories[code]
+            totals[cat] += amount
+            counts[cat] += 1
+            if ts == ts:  # not NaN
+                first = ts if first is None else min(first, ts)
+                last = ts if last is None else max(last, ts)
+                for name, days in ROLLING_WINDOWS.items():
+                    if ts >= now_ts - days * DAY_SECONDS:
+                        rolling[name][cat] += amount
+
+        active_days = max(1.0, (last - first) / DAY_SECONDS) if first is not None else 1.0
+        total_spent = sum(totals.values())
+        return {
+            "total_spent": total_spent,
+            "avg_daily_spend": total_spent / active_days,
+            "avg_per_transaction": total_spent / columns.count,
+            "category_totals": totals,
+            "category_counts": counts,
+            "category_velocity": {cat: total / active_days for cat, total in totals.items()},
+            **rolling,
+            "active_days": active_days,
+            "expense_count": columns.count
+        }
+
+    @staticmethod
+    def depletion_eta(remaining: float, daily_velocity: float, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Days until a category runs out at its current per-day pace"""
+        if daily_velocity <= 0:
+            return {"days_left": None, "depletion_date": None}
+        days_left = max(0.0, remaining / daily_velocity)
+        if days_left > MAX_HORIZON_DAYS:
+            return {"days_left": days_left, "depletion_date": None}
+        return {
+            "days_left": days_left,
+            "depletion_date": ((now or datetime.now()) + timedelta(days=days_left)).date().isoformat()
+        }
@@ -0,0 +1,202 @@
+"""
+Vendor Price Aggregator - Concurrent live price/availability lookups
+Fans out to vendor APIs over a pooled async HTTP client with per-vendor deadlines,
+circuit breakers, hedged requests and a last-known-price cache
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.executors import run_io
+
+try:
+    import httpx
+except ImportError:  # Live pricing is disabled without an async HTTP client
+    httpx = None
+
+
+class CircuitBreaker:
+    """
+    Stops calling a vendor after repeated failures.
+    After reset_timeout exactly one trial request is let through (half-open);
+    concurrent callers keep getting refused until it succeeds or fails.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open" and not self.probing:
+            self.probing = True  # this caller is the probe
+            return True
+        return state == "closed"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def abandon_probe(self) -> None:
+        """The probe was cancelled before it got an answer: let the next caller try"""
+        self.probing = False
+
+
+class VendorAdapter:
+    """
+    One vendor price API.
+    Expects GET {url}/prices?category=<cat> -> {"products": [{"name", "price", "available"}]}
+    """
+
+    def __init__(self, name: str, url: str, timeout: float = 1.0, hedge_after: Optional[float] = None):
+        self.name = name
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        # Fire a duplicate request if the first one is slower than this
+        self.hedge_after = hedge_after if hedge_after is not None else timeout * 0.6
+        self.breaker = CircuitBreaker()
+
+    async def fetch(self, client: "httpx.AsyncClient", category: str) -> List[Dict[str, Any]]:
+        response = await client.get(f"{self.url}/prices", params={"category": category})
+        response.raise_for_status()
+        return response.json().get("products", [])
+
+
+class VendorPriceAggregator:
+    """
+    Queries every configured vendor concurrently, so a search costs the
+    slowest allowed vendor rather than the sum of all of them.
+    """
+
+    def __init__(self, adapters: List[VendorAdapter], max_connections: int = 100):
+        self.adapters = adapters
+        self.max_connections = max_connections
+        self._client: Optional["httpx.AsyncClient"] = None
+        # (vendor, category) -> (fetched_at, products) for timeout fallback
+        self.cache: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return httpx is not None and bool(self.adapters)
+
+    def _new_client(self) -> "httpx.AsyncClient":
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections)
+        return httpx.AsyncClient(limits=limits)
+
+    async def start(self) -> None:
+        """
+        Create the shared client, so connections are pooled and kept alive across searches.
+        Building it loads the TLS settings (blocking, ~200 ms), so it is done on an I/O
+        thread at app startup rather than inside the first search's deadline.
+        """
+        if self.enabled and self._client is None:
+            client = await run_io(self._new_client)
+            if self._client is None:
+                self._client = client
+            else:
+                await client.aclose()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _hedged_fetch(self, adapter: VendorAdapter, category: str) -> List[Dict[str, Any]]:
+        """First attempt, plus a backup attempt if the first is slow; whichever finishes first wins"""
+        client = self._client
+        attempts = [asyncio.ensure_future(adapter.fetch(client, category))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=adapter.hedge_after)
+            if not done:
+                attempts.append(asyncio.ensure_future(adapter.fetch(client, category)))
+            for next_done in asyncio.as_completed(attempts):
+                try:
+                    return await next_done
+                except Exception:
+                    if all(a.done() for a in attempts):
+                        raise
+            raise RuntimeError(f"No response from {adapter.name}")
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _query_vendor(self, adapter: VendorAdapter, category: str) -> Dict[str, Any]:
+        key = (adapter.name, category)
+        if adapter.breaker.allow():
+            try:
+                products = await asyncio.wait_for(self._hedged_fetch(adapter, category), adapter.timeout)
+                adapter.breaker.record_success()
+                self.cache[key] = (time.time(), products)
+                return {"vendor": adapter.name, "source": "live", "products": products}
+            except asyncio.CancelledError:
+                adapter.breaker.abandon_probe()
+                raise
+            except Exception:
+                adapter.breaker.record_failure()
+
+        cached = self.cache.get(key)
+        if cached:
+            return {"vendor": adapter.name, "source": "cache", "cached_at": cached[0], "products": cached[1]}
+        return {"vendor": adapter.name, "source": "unavailable", "products": []}
+
+    async def aggregate(self, category: str) -> Dict[str, Any]:
+        """
+        Live quotes for a category keyed by (vendor, product name),
+        plus a per-vendor status report
+        """
+        await self.start()  # no-op once the app has started it
+        results = await asyncio.gather(*(self._query_vendor(a, category) for a in self.adapters))
+
+        quotes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for result in results:
+            for product in result["products"]:
+                if "name" in product and "price" in product:
+                    quotes[(result["vendor"], product["name"])] = product
+
+        return {
+            "quotes": quotes,
+            "vendors": {r["vendor"]: r["source"] for r in results}
+        }
+
+
+def load_adapters() -> List[VendorAdapter]:
+    """
+    Vendor endpoints from VENDOR_ENDPOINTS, a JSON list like
+    [{"name": "Pizza Palace", "url": "http://localhost:9001", "timeout": 0.8}]
+    """
+    raw = os.environ.get("VENDOR_ENDPOINTS", "").strip()
+    if not raw:
+        return []
+    try:
+        configs = json.loads(raw)
+    except json.JSONDecodeError:
+        print("Error loading VENDOR_ENDPOINTS: invalid JSON")
+        return []
+    return [
+        VendorAdapter(c["name"], c["url"], c.get("timeout", 1.0), c.get("hedge_after"))
+        for c in configs
+    ]
+
+
+aggregator = VendorPriceAggregator(load_adapters())
@@ -3,9 +3,12 @@ from typing import Dict, List, Optional
 import random
 import string
 
+from app.services.ledger import TOP_UPS, WALLET, Ledger
+
 class WalletService:
     """
     Internal wallet service - handles balance, transactions, and Interac payments
+    Balance changes are ledger postings; wallet["transactions"] is the readable history
     """
     
     @staticmethod
@@ -19,30 +22,36 @@ class WalletService:
         return wallet_data.get("balance", 0.0)
     
     @staticmethod
-    def add_funds(wallet_data: Dict, amount: float, payment_method: str = "interac_debit") -> Dict:
+    def wallet_of(data: Dict) -> Dict:
+        """The budget's wallet record, created on first use"""
+        if "wallet" not in data:
+            data["wallet"] = {"balance": 0.0, "transactions": []}
+        return data["wallet"]
+    
+    @staticmethod
+    def add_funds(data: Dict, amount: float, payment_method: str = "interac_debit", source: str = TOP_UPS) -> Dict:
         """
-        Add funds to wallet
+        Add funds to the budget's wallet (source: the ledger account the money comes from)
         Returns transaction record
         """
         if amount <= 0:
             raise ValueError("Amount must be greater than 0")
         
-        current_balance = wallet_data.get("balance", 0.0)
-        new_balance = current_balance + amount
+        wallet_data = WalletService.wallet_of(data)
+        transaction_id = WalletService.generate_transaction_id()
+        Ledger.post(data, "wallet_top_up", [(source, WALLET, amount)], f"Top-up via {payment_method}", transaction_id)
         
         transaction = {
-            "id": WalletService.generate_transaction_id(),
+            "id": transaction_id,
             "type": "add_funds",
             "amount": amount,
-            "balance_after": new_balance,
+            "balance_after": wallet_data["balance"],
             "payment_method": payment_method,
             "timestamp": datetime.now().isoformat(),
             "status": "completed",
             "description": f"Added ${amount:.2f} to wallet via {payment_method}"
         }
         
-        wallet_data["balance"] = new_balance
-        
         if "transactions" not in wallet_data:
             wallet_data["transactions"] = []
         wallet_data["transactions"].append(transaction)
@@ -50,35 +59,35 @@ class WalletService:
         return transaction
     
     @staticmethod
-    def deduct_funds(wallet_data: Dict, amount: float, description: str, 
+    def deduct_funds(data: Dict, amount: float, description: str, payee: str,
                      transaction_type: str = "purchase") -> Dict:
         """
-        Deduct funds from wallet for a purchase
+        Pay `payee` (a ledger account) from the budget's wallet
         Returns transaction record
         Raises ValueError if insufficient funds
         """
         if amount <= 0:
             raise ValueError("Amount must be greater than 0")
         
+        wallet_data = WalletService.wallet_of(data)
         current_balance = wallet_data.get("balance", 0.0)
         
         if current_balance < amount:
             raise ValueError(f"Insufficient funds. Balance: ${current_balance:.2f}, Required: ${amount:.2f}")
         
-        new_balance = current_balance - amount
+        transaction_id = WalletService.generate_transaction_id()
+        Ledger.post(data, transaction_type, [(WALLET, payee, amount)], description, transaction_id)
         
         transaction = {
-            "id": WalletService.generate_transaction_id(),
+            "id": transaction_id,
             "type": transaction_type,
             "amount": -amount,  # Negative for deduction
-            "balance_after": new_balance,
+            "balance_after": wallet_data["balance"],
             "timestamp": datetime.now().isoformat(),
             "status": "completed",
             "description": description
         }
         
-        wallet_data["balance"] = new_balance
-        
         if "transactions" not in wallet_data:
             wallet_data["transactions"] = []
         wallet_data["transactions"].append(transaction)
@@ -0,0 +1,4 @@
+"""
+Backend benchmarks - synthetic budgets and a load generator for every router
+Run from backend/: python -m benchmarks.run --help
+"""
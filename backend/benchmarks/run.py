@@ -0,0 +1,423 @@
+"""
+Benchmark runner - drives every router through the ASGI app (or a live server)
+
+    python -m benchmarks.run --scales 10,1000,100000 --concurrency 1,8 --output baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.2
+
+Every scenario starts from the same generated data file. Results hold p50/p99
+latency, throughput, peak RSS and bytes written per request, keyed by
+scale/scenario/concurrency so two baselines can be compared. A route of the app
+that no scenario covers stops the run (see uncovered_routes).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Keep runtime stores out of the repo and external services out of the numbers
+os.environ.pop("VENDOR_ENDPOINTS", None)
+os.environ.pop("RECEIPT_JOB_DB", None)
+os.environ.setdefault("OCR_ENGINE", "stub")
+os.environ.setdefault("RATE_LIMITS_ENABLED", "0")  # one benchmark client would hit its own limits
+os.environ.setdefault("ADMIN_TOKEN", "bench")  # in-process runs; a live server needs the same token
+
+import httpx  # noqa: E402
+
+from app.db import db  # noqa: E402
+from app.db.store import store  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.job_queue import job_queue  # noqa: E402
+from app.services.ocr_pipeline import receipt_pipeline  # noqa: E402
+from app.services.receipt_fingerprint import ReceiptFingerprintIndex, receipt_index  # noqa: E402
+from benchmarks.synthetic import generate_budget, generate_catalog, install_catalog  # noqa: E402
+
+RECEIPT_TEXT = "Fresh Mart\n2025-03-14\nGrocery bundle\nSubtotal 41.50\nTax 3.50\nTotal: $45.00\nThank you"
+ADMIN = {"X-Admin-Token": os.environ["ADMIN_TOKEN"]}
+
+
+def receipt(i: int) -> Dict[str, Any]:
+    return {"receipt_text": RECEIPT_TEXT.replace("41.50", f"{i}.50"), "filename": f"r{i}.txt"}
+
+
+async def queued_receipt(client: httpx.AsyncClient, count: int) -> Dict[str, Any]:
+    response = await client.post("/upload-receipt", json=receipt(0))
+    return {"job_id": response.json()["job_id"]}
+
+
+async def money_requests(client: httpx.AsyncClient, count: int) -> Dict[str, Any]:
+    """A pending request per timed request (paying or declining one settles it)"""
+    ids = []
+    for i in range(count):
+        response = await client.post("/request-money", json={"requester_email": f"m{i}@club.ca", "amount": 5})
+        ids.append(response.json()["request"]["id"])
+    return {"request_id": ids[0], "ids": ids}
+
+
+async def captured_profile(client: httpx.AsyncClient, count: int) -> Dict[str, Any]:
+    await client.post("/admin/profiler/session", json={"requests": 1, "path_prefix": "/dashboard"}, headers=ADMIN)
+    await client.get("/dashboard")
+    profiles = (await client.get("/admin/profiler", headers=ADMIN)).json()["profiles"]
+    return {"profile_id": profiles[0]["id"] if profiles else "none"}
+
+
+async def reconciliation_report(client: httpx.AsyncClient, count: int) -> Dict[str, Any]:
+    response = await client.post("/admin/reconciliation/run", headers=ADMIN)
+    return {"report_id": response.json()["id"]}
+
+
+# router, name, method, path (formatted with what setup returned, or callable(i, setup) -> path),
+# optional json body (or callable(i) -> body), headers, setup(client, requests) and route
+# (the app's route template, when it isn't the path without its query)
+SCENARIOS: List[Dict[str, Any]] = [
+    {"router": "app", "name": "root", "method": "GET", "path": "/"},
+    {"router": "app", "name": "metrics", "method": "GET", "path": "/metrics"},
+    {"router": "budget", "name": "dashboard", "method": "GET", "path": "/dashboard"},
+    {"router": "budget", "name": "ai-rules", "method": "GET", "path": "/ai-rules"},
+    {"router": "budget", "name": "create-budget", "method": "POST", "path": "/create-budget",
+     "body": {"total_budget": 5000}},
+    {"router": "expenses", "name": "add-expense", "method": "POST", "path": "/add-expense",
+     "body": lambda i: {"amount": 1 + i % 20, "category": ["food", "venue", "decor", "misc"][i % 4],
+                        "vendor_name": "Bench Vendor"}},
+    {"router": "expenses", "name": "delete-expense", "method": "POST", "path": "/delete-expense",
+     "body": {"expense_index": 0}},
+    {"router": "expenses", "name": "reallocate-funds", "method": "POST", "path": "/reallocate-funds",
+     "body": {"from_category": "food", "to_category": "misc", "amount": 1}},
+    {"router": "expenses", "name": "upload-receipt", "method": "POST", "path": "/upload-receipt", "body": receipt},
+    {"router": "expenses", "name": "receipt-job", "method": "GET", "path": "/receipt-jobs/{job_id}",
+     "setup": queued_receipt},
+    {"router": "expenses", "name": "upload-receipts", "method": "POST", "path": "/upload-receipts",
+     "body": lambda i: {"receipts": [receipt(i * 4 + k) for k in range(4)]}},
+    {"router": "expenses", "name": "auto-rebalance", "method": "GET", "path": "/auto-rebalance"},
+    {"router": "expenses", "name": "auto-rebalance-settings", "method": "POST", "path": "/auto-rebalance",
+     "body": {"enabled": False}},
+    {"router": "expenses", "name": "bulk-pay-vendors", "method": "POST", "path": "/bulk-pay-vendors"},
+    {"router": "payment", "name": "send-interac", "method": "POST", "path": "/send-interac",
+     "body": {"recipient_email": "vendor@club.ca", "amount": 1}},
+    {"router": "payment", "name": "request-money", "method": "POST", "path": "/request-money",
+     "body": {"requester_email": "member@club.ca", "amount": 5}},
+    {"router": "payment", "name": "money-requests", "method": "GET", "path": "/money-requests"},
+    {"router": "payment", "name": "money-request", "method": "GET", "path": "/money-requests/{request_id}",
+     "setup": money_requests},
+    {"router": "payment", "name": "pay-money-request", "method": "POST",
+     "path": lambda i, found: f"/money-requests/{found['ids'][i]}/pay", "setup": money_requests,
+     "route": "POST /money-requests/{request_id}/pay"},
+    {"router": "payment", "name": "decline-money-request", "method": "POST",
+     "path": lambda i, found: f"/money-requests/{found['ids'][i]}/decline", "setup": money_requests,
+     "route": "POST /money-requests/{request_id}/decline"},
+    {"router": "payment", "name": "settle-expense", "method": "POST", "path": "/settle-expense",
+     "body": {"expense_id": "0", "recipient_email": "member@club.ca"}},
+    {"router": "payment", "name": "transactions", "method": "GET", "path": "/transactions"},
+    {"router": "payment", "name": "settlement-suggestions", "method": "GET", "path": "/settlement-suggestions"},
+    {"router": "shopping", "name": "search", "method": "POST", "path": "/shop/search",
+     "body": {"category": "food", "optimize_for": "balanced", "user_lat": 43.65, "user_lon": -79.38}},
+    {"router": "shopping", "name": "search-closest", "method": "POST", "path": "/shop/search",
+     "body": {"category": "venue", "optimize_for": "closest", "user_lat": 43.65, "user_lon": -79.38}},
+    {"router": "shopping", "name": "purchase", "method": "POST", "path": "/shop/purchase",
+     "body": {"category": "misc", "product_index": 0}},
+    {"router": "shopping", "name": "basket", "method": "POST", "path": "/shop/basket",
+     "body": {"max_items_per_category": 2}},
+    {"router": "shopping", "name": "categories", "method": "GET", "path": "/shop/categories"},
+    {"router": "wallet", "name": "balance", "method": "GET", "path": "/wallet/balance"},
+    {"router": "wallet", "name": "add-funds", "method": "POST", "path": "/wallet/add-funds", "body": {"amount": 10}},
+    {"router": "wallet", "name": "transactions", "method": "GET", "path": "/wallet/transactions?limit=50"},
+    {"router": "wallet", "name": "stats", "method": "GET", "path": "/wallet/stats"},
+    {"router": "export", "name": "expenses-ndjson", "method": "GET", "path": "/export/expenses?format=ndjson",
+     "route": "GET /export/{dataset}"},
+    {"router": "export", "name": "wallet-csv", "method": "GET", "path": "/export/wallet-transactions?format=csv",
+     "route": "GET /export/{dataset}"},
+    {"router": "ledger", "name": "balances", "method": "GET", "path": "/ledger/balances"},
+    {"router": "ledger", "name": "entries", "method": "GET", "path": "/ledger/entries?limit=100"},
+    {"router": "ledger", "name": "audit", "method": "GET", "path": "/ledger/audit"},
+    {"router": "admin", "name": "admission", "method": "GET", "path": "/admin/admission", "headers": ADMIN},
+    {"router": "admin", "name": "reconciliation", "method": "GET", "path": "/admin/reconciliation", "headers": ADMIN},
+    {"router": "admin", "name": "reconciliation-run", "method": "POST", "path": "/admin/reconciliation/run",
+     "headers": ADMIN},
+    {"router": "admin", "name": "reconciliation-report", "method": "GET", "path": "/admin/reconciliation/{report_id}",
+     "headers": ADMIN, "setup": reconciliation_report},
+    {"router": "admin", "name": "profiler", "method": "GET", "path": "/admin/profiler", "headers": ADMIN},
+    {"router": "admin", "name": "profiler-settings", "method": "POST", "path": "/admin/profiler/settings",
+     "body": {}, "headers": ADMIN},
+    # A session for a path no scenario requests, so nothing timed gets profiled
+    {"router": "admin", "name": "profiler-session", "method": "POST", "path": "/admin/profiler/session",
+     "body": {"requests": 1, "path_prefix": "/bench-unprofiled"}, "headers": ADMIN},
+    {"router": "admin", "name": "profiler-session-stop", "method": "DELETE", "path": "/admin/profiler/session",
+     "headers": ADMIN},
+    {"router": "admin", "name": "profile", "method": "GET", "path": "/admin/profiles/{profile_id}",
+     "headers": ADMIN, "setup": captured_profile},
+    {"router": "admin", "name": "profile-collapsed", "method": "GET", "path": "/admin/profiles/{profile_id}/collapsed",
+     "headers": ADMIN, "setup": captured_profile},
+    {"router": "admin", "name": "profiles-collapsed", "method": "GET", "path": "/admin/profiles/collapsed",
+     "headers": ADMIN, "setup": captured_profile},
+    {"router": "admin", "name": "profiles-clear", "method": "DELETE", "path": "/admin/profiles", "headers": ADMIN},
+]
+
+# Not timed: they serve the API's own documentation
+UNBENCHMARKED_ROUTES = {"GET /openapi.json", "GET /docs", "GET /docs/oauth2-redirect", "GET /redoc"}
+
+
+def route_of(scenario: Dict[str, Any]) -> str:
+    return scenario.get("route") or f"{scenario['method']} {scenario['path'].split('?')[0]}"
+
+
+def uncovered_routes() -> List[str]:
+    """Routes of the app (method and template) that no scenario requests"""
+    covered = {route_of(s) for s in SCENARIOS} | UNBENCHMARKED_ROUTES
+    routes = [f"{method.upper()} {path}" for path, operations in app.openapi()["paths"].items()
+              for method in operations]
+    return [route for route in routes if route not in covered]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def bytes_written() -> Optional[int]:
+    """Bytes this process has written so far (Linux /proc), None elsewhere"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS mark so each scenario reports its own peak (Linux)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS; it can't be reset
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
+
+
+def body_for(scenario: Dict[str, Any], i: int) -> Optional[Dict]:
+    body = scenario.get("body")
+    return body(i) if callable(body) else body
+
+
+def path_for(scenario: Dict[str, Any], i: int, found: Dict[str, Any]) -> str:
+    path = scenario["path"]
+    return path(i, found) if callable(path) else path.format(**found)
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Dict[str, Any], requests: int,
+                       concurrency: int, restore: Optional[Callable[[], None]]) -> Dict[str, Any]:
+    if restore:
+        await store.flush()  # a pending batch would overwrite the restored file
+        restore()
+    found = await scenario["setup"](client, requests + 1) if "setup" in scenario else {}
+    headers = scenario.get("headers")
+
+    async def request(i: int) -> httpx.Response:
+        return await client.request(scenario["method"], path_for(scenario, i, found),
+                                    json=body_for(scenario, i), headers=headers)
+
+    # One untimed request warms imports, indexes and caches
+    await request(0)
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(1, requests + 1))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await request(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+
+    reset_peak_rss()
+    written_before = bytes_written()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    written_after = bytes_written()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "bytes_written_per_request": (
+            round((written_after - written_before) / requests) if written_before is not None else None
+        )
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="kyfh-bench-")
+    results: Dict[str, Any] = {}
+    live = bool(args.base_url)
+
+    if not live:
+        db.FILE = os.path.join(workdir, "data.json")
+        receipt_pipeline.cache.directory = os.path.join(workdir, "ocr_cache")
+        install_catalog(generate_catalog(args.catalog_size, seed=args.seed))
+
+    selected = [s for s in SCENARIOS if not args.only or s["router"] in args.only or s["name"] in args.only]
+
+    try:
+        for scale in args.scales:
+            pristine = os.path.join(workdir, f"pristine-{scale}.json")
+            data = generate_budget(scale, args.wallet_transactions, args.interac_transactions, seed=args.seed)
+            with open(pristine, "w") as f:
+                json.dump(data, f)
+            del data
+
+            def restore():
+                shutil.copyfile(pristine, db.FILE)
+                store.invalidate()
+                # Start each scenario with an empty duplicate index
+                fresh = ReceiptFingerprintIndex(os.path.join(workdir, "receipt_fingerprints.jsonl"))
+                receipt_index.__dict__.update(fresh.__dict__)
+                if os.path.exists(fresh.path):
+                    os.unlink(fresh.path)
+
+            if live:
+                client = httpx.AsyncClient(base_url=args.base_url, timeout=300)
+                restore_fn = None  # the server owns its data file
+            else:
+                client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                           timeout=300)
+                restore_fn = restore
+
+            async with client:
+                for scenario in selected:
+                    for concurrency in args.concurrency:
+                        key = f"{scale}/{scenario['router']}:{scenario['name']}/c{concurrency}"
+                        result = await run_scenario(client, scenario, args.requests, concurrency, restore_fn)
+                        results[key] = result
+                        print(f"{key:<55} p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+                              f"{result['throughput_rps']:>8.1f} req/s  rss {result['peak_rss_mb']:>7.1f} MB"
+                              + (f"  errors {result['errors']}" if result["errors"] else ""), flush=True)
+    finally:
+        if not live:
+            await job_queue.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": "live" if live else "in-process",
+            "scales": args.scales,
+            "requests": args.requests,
+            "wallet_transactions": args.wallet_transactions,
+            "interac_transactions": args.interac_transactions,
+            "catalog_size": args.catalog_size,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    """Scenarios whose p50 or p99 got slower than the baseline by more than threshold"""
+    regressions = []
+    for key, result in current["results"].items():
+        old = baseline["results"].get(key)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            before, after = old[metric], result[metric]
+            if after - before > min_delta_ms and before > 0 and after / before > 1 + threshold:
+                regressions.append(f"{key} {metric}: {before:.2f} -> {after:.2f} ms (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every backend router with synthetic data")
+    parser.add_argument("--scales", default="10,1000,10000",
+                        help="Comma-separated expense counts, e.g. 10,1000,100000,1000000")
+    parser.add_argument("--requests", type=int, default=50, help="Timed requests per scenario")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrent client counts")
+    parser.add_argument("--wallet-transactions", type=int, default=10000)
+    parser.add_argument("--interac-transactions", type=int, default=1000)
+    parser.add_argument("--catalog-size", type=int, default=2000, help="Products per shopping category")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", default="", help="Comma-separated routers or scenario names to run")
+    parser.add_argument("--base-url", default=None,
+                        help="Benchmark a running server instead (it must already hold a budget)")
+    parser.add_argument("--output", default=None, help="Write results as JSON (a new baseline)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown ratio (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+    args.scales = [int(s) for s in args.scales.split(",") if s]
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c]
+    args.only = {o for o in args.only.split(",") if o}
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    uncovered = uncovered_routes()
+    if uncovered:
+        print(f"{len(uncovered)} route(s) without a benchmark scenario: {', '.join(uncovered)}")
+        return 2
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Stub vendor servers - local price APIs for exercising the live pricing path
+
+    python -m benchmarks.stub_vendors serve --delay-ms 50
+
+"serve" starts stub vendors on localhost, named after the catalog's vendors and
+quoting their catalog products (PRICE_FACTOR times the catalog price, so the live
+prices show in /shop/search), and prints the VENDOR_ENDPOINTS value to start the
+backend with. tests/test_vendor_aggregator.py drives VendorPriceAggregator
+against fresh stubs.
+"""
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from app.services.personal_shopper import PersonalShopperAI
+
+PRICE_FACTOR = 0.9
+
+
+def catalog_by_vendor() -> Dict[str, Dict[str, List[Dict]]]:
+    """vendor -> category -> its products in PersonalShopperAI.PRODUCT_DATABASE"""
+    vendors: Dict[str, Dict[str, List[Dict]]] = defaultdict(dict)
+    for category, products in PersonalShopperAI.PRODUCT_DATABASE.items():
+        for product in products:
+            vendors[product["vendor"]].setdefault(category, []).append(product)
+    return dict(vendors)
+
+
+class StubVendor:
+    """
+    GET /prices?category=<cat> on an ephemeral port. delays (seconds) are used in
+    turn, one per request; failing answers 503 until switched back. Answers
+    `products` synthetic items, or the given catalog products (by category).
+    """
+
+    def __init__(self, name: str, delays: Optional[List[float]] = None, products: int = 5,
+                 catalog: Optional[Dict[str, List[Dict]]] = None):
+        self.name = name
+        self.delays = itertools.cycle(delays or [0.0])
+        self.products = products
+        self.catalog = catalog
+        self.failing = False
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _handler(self):
+        vendor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (deadline or a losing hedge)
+
+            def do_GET(self):
+                with vendor.lock:
+                    vendor.hits += 1
+                    delay = next(vendor.delays)
+                    failing = vendor.failing
+                time.sleep(delay)
+                request = urlparse(self.path)
+                if request.path != "/prices":
+                    self.send_error(404)
+                    return
+                if failing:
+                    self.send_error(503)
+                    return
+                category = parse_qs(request.query).get("category", ["misc"])[0]
+                body = json.dumps({"products": vendor.quote(category)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def quote(self, category: str) -> List[Dict]:
+        if self.catalog is not None:
+            return [
+                {"name": p["name"], "price": round(p["price"] * PRICE_FACTOR, 2), "available": True}
+                for p in self.catalog.get(category, [])
+            ]
+        return [
+            {"name": f"{category} item {i}", "price": round(10 + i * 2.5, 2), "available": True}
+            for i in range(self.products)
+        ]
+
+    def start(self) -> "StubVendor":
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), name=f"stub-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def serve(args) -> int:
+    catalog = catalog_by_vendor()
+    names = list(catalog)[:args.vendors] if args.vendors else list(catalog)
+    vendors = [StubVendor(name, [args.delay_ms / 1000], catalog=catalog[name]).start() for name in names]
+    endpoints = [{"name": v.name, "url": v.url, "timeout": args.timeout} for v in vendors]
+    print(f"VENDOR_ENDPOINTS='{json.dumps(endpoints)}'")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for v in vendors:
+            v.stop()
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stub vendor price APIs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Run stub vendors until interrupted")
+    serve_parser.add_argument("--vendors", type=int, default=0, help="Serve the first N catalog vendors (default: all)")
+    serve_parser.add_argument("--delay-ms", type=float, default=50, help="Response delay of every vendor")
+    serve_parser.add_argument("--timeout", type=float, default=1.0, help="Deadline written into VENDOR_ENDPOINTS")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    return serve(parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Synthetic data at realistic scales, generated from a fixed seed so runs are comparable
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from app.services.budget_splitter import AllocationStats
+from app.services.overspend_predictor import OverspendForecaster
+from app.services.personal_shopper import PersonalShopperAI
+
+CATEGORIES = {"food": 0.4, "venue": 0.3, "decor": 0.2, "misc": 0.1}
+VENDORS = ["Pizza Palace", "Fresh Mart", "City Events", "Party Supplies Co", "Office Depot", "Green Slice"]
+EPOCH = datetime(2025, 1, 1)
+
+
+def generate_expenses(count: int, rng: random.Random, span_days: int = 365) -> List[Dict[str, Any]]:
+    """Mix of manual entries, verified receipts and AI purchases, spread over span_days"""
+    names = list(CATEGORIES)
+    weights = list(CATEGORIES.values())
+    step = span_days * 86400 / max(count, 1)
+    expenses = []
+    for i in range(count):
+        when = (EPOCH + timedelta(seconds=i * step)).isoformat()
+        category = rng.choices(names, weights)[0]
+        amount = round(rng.lognormvariate(3, 0.8), 2)
+        kind = rng.random()
+        if kind < 0.6:
+            expenses.append({
+                "amount": amount, "category": category, "vendor_name": rng.choice(VENDORS),
+                "status": rng.choice(["pending", "paid"]), "timestamp": when
+            })
+        elif kind < 0.9:
+            expenses.append({
+                "id": f"EXP-{i:08X}", "amount": amount, "category": category, "receipt_verified": True,
+                "verification_status": "verified", "verification_confidence": 90, "verification_flags": [],
+                "ai_suggested_category": category, "filename": f"receipt-{i}.txt", "processed_at": when,
+                "duplicate_of": None
+            })
+        else:
+            expenses.append({
+                "amount": amount, "category": category, "ai_purchased": True, "purchase_id": f"PUR-{i:08X}",
+                "vendor": rng.choice(VENDORS), "product_name": "Synthetic Product", "original_price": amount,
+                "savings": 0, "ai_reasoning": "synthetic", "timestamp": when
+            })
+    return expenses
+
+
+def generate_wallet(count: int, rng: random.Random) -> Dict[str, Any]:
+    balance = 0.0
+    transactions = []
+    for i in range(count):
+        when = (EPOCH + timedelta(minutes=i)).isoformat()
+        if i % 3 == 0:
+            amount = round(rng.uniform(50, 500), 2)
+            balance += amount
+            kind, description = "add_funds", f"Added ${amount:.2f} to wallet via interac_debit"
+        else:
+            amount = round(rng.uniform(5, 100), 2)
+            balance -= amount
+            kind, description = "vendor_payment", "Vendor Payment: Synthetic"
+        transactions.append({
+            "id": f"TXN-{i:08X}", "type": kind, "amount": amount, "balance_after": round(balance, 2),
+            "payment_method": "interac_debit", "timestamp": when, "status": "completed", "description": description
+        })
+    # Enough balance for bulk vendor payments at any scale
+    return {"balance": round(balance, 2) + 10_000_000, "transactions": transactions}
+
+
+def generate_budget(expenses: int, wallet_transactions: int, interac_transactions: int, seed: int = 1) -> Dict:
+    """A budget document as the routes store it, derived state included"""
+    rng = random.Random(seed)
+    expense_list = generate_expenses(expenses, rng)
+    spent = sum(e["amount"] for e in expense_list)
+    total = round(max(spent * 1.5, 1000.0), 2)
+    categories = {cat: total * share for cat, share in CATEGORIES.items()}
+    for e in expense_list:
+        categories[e["category"]] -= e["amount"]
+
+    data = {
+        "budget_id": f"BUD-BENCH{seed:03d}",
+        "total_budget": total,
+        "categories": categories,
+        "expenses": expense_list,
+        "remaining": total - spent,
+        "wallet": generate_wallet(wallet_transactions, rng),
+        "transactions": [
+            {
+                "id": f"{i:08x}", "type": "send", "recipient": f"member{i % 50}@club.ca",
+                "amount": round(rng.uniform(5, 200), 2), "message": "Budget expense transfer", "status": "completed",
+                "timestamp": (EPOCH + timedelta(hours=i)).isoformat(), "has_security": False,
+                "payment_method": "interac"
+            }
+            for i in range(interac_transactions)
+        ],
+        "money_requests": []
+    }
+    data["forecast_state"] = OverspendForecaster.rebuild(expense_list)
+    AllocationStats.state_of(data)
+    return data
+
+
+def generate_catalog(per_category: int, seed: int = 1) -> Dict[str, List[Dict]]:
+    """Vendor catalog around downtown Toronto, like the built-in one but larger"""
+    rng = random.Random(seed)
+    catalog = {}
+    for category in CATEGORIES:
+        products = []
+        for i in range(per_category):
+            lat = 43.65 + rng.uniform(-0.2, 0.2)
+            lon = -79.38 + rng.uniform(-0.3, 0.3)
+            products.append({
+                "name": f"{category.title()} Item {i}", "vendor": f"Vendor {i % 200}",
+                "price": round(rng.uniform(5, 300), 2), "distance": round(rng.uniform(0.2, 30), 1),
+                "lat": lat, "lon": lon, "rating": round(rng.uniform(3, 5), 1),
+                "student_discount": rng.random() < 0.4, "halal": rng.random() < 0.5,
+                "vegan": rng.random() < 0.3, "ethical": rng.random() < 0.6
+            })
+        catalog[category] = products
+    return catalog
+
+
+def install_catalog(catalog: Dict[str, List[Dict]]) -> None:
+    """Replace the personal shopper's product database (and its spatial index)"""
+    PersonalShopperAI.PRODUCT_DATABASE = catalog
+    PersonalShopperAI._geo_index = {}
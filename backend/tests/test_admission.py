@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import (
+    AdmissionController, AdmissionMiddleware, ConcurrencyLimiter, InMemoryBucketStore, Limit, SQLiteBucketStore,
+    _policy, parse_limit
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def bucket_store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryBucketStore()
+    else:
+        store = SQLiteBucketStore(str(tmp_path / "buckets.db"))
+        yield store
+        store.conn.close()
+
+
+class App:
+    """Answers 200; requests to /slow wait until released"""
+
+    def __init__(self):
+        self.release = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["path"] == "/slow":
+            await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def _call(middleware, path, method="POST", client="10.0.0.1"):
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": (client, 5000)}
+    response = {}
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+
+    await middleware(scope, receive, send)
+    return response["status"], response["headers"].get(b"retry-after")
+
+
+def test_parse_limit():
+    assert parse_limit("2:10") == Limit(2.0, 10)
+    assert parse_limit("0.5") == Limit(0.5, 1)
+    assert parse_limit("0") is None and parse_limit(" ") is None
+
+
+def test_buckets_refill_at_their_rate(bucket_store):
+    buckets = [("money:client:a", Limit(2.0, 3))]
+    assert [bucket_store.take(buckets, 100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket_store.take(buckets, 100.0) == pytest.approx(0.5)
+    assert bucket_store.take(buckets, 100.25) == pytest.approx(0.25)
+    assert bucket_store.take(buckets, 100.5) == 0.0
+    # Never more than the burst, however long the bucket was idle
+    assert [bucket_store.take(buckets, 1000.0) for _ in range(4)][-1] > 0
+
+
+def test_a_token_is_taken_from_every_bucket_or_none(bucket_store):
+    client, budget = ("money:client:a", Limit(1.0, 5)), ("money:budget:b", Limit(1.0, 1))
+    assert bucket_store.take([client, budget], 100.0) == 0.0
+    for _ in range(3):
+        assert bucket_store.take([client, budget], 100.0) > 0
+    # The refused requests left the client bucket alone
+    assert [bucket_store.take([client], 100.0) for _ in range(5)] == [0.0] * 4 + [1.0]
+
+
+def test_rate_limited_routes_get_429_with_retry_after():
+    controller = AdmissionController([_policy("money", [r"POST /send-interac"], "1:2", "0")],
+                                     InMemoryBucketStore(), None)
+    middleware = AdmissionMiddleware(App(), controller)
+
+    async def scenario():
+        sends = [await _call(middleware, "/send-interac") for _ in range(3)]
+        other_client = await _call(middleware, "/send-interac", client="10.0.0.2")
+        unlimited = [await _call(middleware, "/send-interac", method="GET") for _ in range(3)]
+        return sends, other_client, unlimited
+
+    sends, other_client, unlimited = asyncio.run(scenario())
+    assert sends == [(200, None), (200, None), (429, b"1")]
+    assert other_client == (200, None)
+    assert unlimited == [(200, None)] * 3
+    assert controller.stats["rate_limited"] == 1
+
+
+def test_full_queue_and_long_waits_are_shed_with_503():
+    app = App()
+    controller = AdmissionController([], InMemoryBucketStore(), ConcurrencyLimiter(limit=1, max_queued=1,
+                                                                                   timeout_ms=5000))
+    middleware = AdmissionMiddleware(app, controller)
+
+    async def scenario():
+        app.release = asyncio.Event()
+        running = asyncio.create_task(_call(middleware, "/slow"))
+        queued = asyncio.create_task(_call(middleware, "/budget"))
+        await asyncio.sleep(0.01)
+        shed = await _call(middleware, "/budget")
+        exempt = await _call(middleware, "/admin/admission", method="GET")
+        app.release.set()
+        return await running, await queued, shed, exempt
+
+    running, queued, shed, exempt = asyncio.run(scenario())
+    assert running == queued == exempt == (200, None)
+    assert shed == (503, b"1")
+    assert controller.limiter.active == 0 and controller.stats["shed"] == 1
+
+    controller.limiter.timeout = 0.05
+
+    async def timed_out():
+        app.release = asyncio.Event()
+        running = asyncio.create_task(_call(middleware, "/slow"))
+        await asyncio.sleep(0.01)
+        waited = await _call(middleware, "/budget")
+        app.release.set()
+        await running
+        return waited, await _call(middleware, "/budget")
+
+    waited, after = asyncio.run(timed_out())
+    assert waited == (503, b"1") and after == (200, None)
+    assert controller.limiter.active == 0 and not controller.limiter.waiters
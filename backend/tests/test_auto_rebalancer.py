@@ -0,0 +1,96 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.auto_rebalancer import SOURCE_BUFFER, SOURCE_MAX_SHARE, AutoRebalancer
+from app.services.ledger import Ledger
+from app.services.overspend_predictor import OverspendForecaster
+
+NOW = datetime(2026, 10, 1, 12)
+
+
+def _budget(rng, categories):
+    """Random balances and spending histories (some categories unused)"""
+    expenses = []
+    for category in categories:
+        daily = rng.choice([0, 0, 5, 20, 60])
+        expenses += [{"category": category, "amount": daily, "timestamp": (NOW - timedelta(days=d)).isoformat()}
+                     for d in range(14) if daily]
+    data = {"categories": {c: round(rng.uniform(0, 400), 2) for c in categories}, "expenses": expenses}
+    data["forecast_state"] = OverspendForecaster.rebuild(expenses)
+    data["remaining"] = round(sum(data["categories"].values()), 2)
+    return data
+
+
+def _rates(data):
+    state = data["forecast_state"]
+    now = NOW.timestamp()
+    return {c: OverspendForecaster.rate(state[c], now)["daily_rate"] if c in state else 0.0 for c in data["categories"]}
+
+
+def test_sources_never_drop_below_their_buffer():
+    rng = random.Random(11)
+    for _ in range(300):
+        data = _budget(rng, ["food", "venue", "decor", "misc", "prizes"])
+        min_days = rng.choice([1.0, 3.0, 7.0])
+        plan = AutoRebalancer.plan(data, min_days, NOW)
+        rates = _rates(data)
+
+        given, received = {}, {}
+        for t in plan["transfers"]:
+            assert t["amount"] >= 0.01 and t["from"] != t["to"]
+            given[t["from"]] = given.get(t["from"], 0) + t["amount"]
+            received[t["to"]] = received.get(t["to"], 0) + t["amount"]
+        assert not set(given) & set(received)
+
+        for category, amount in given.items():
+            before = data["categories"][category]
+            after = before - amount
+            assert after >= rates[category] * min_days * SOURCE_BUFFER - 0.01
+            assert amount <= before * SOURCE_MAX_SHARE + 0.01
+        for category, amount in received.items():
+            # Filled up to the threshold, never past it
+            assert data["categories"][category] + amount <= rates[category] * min_days + 0.01
+            if category not in plan["unresolved"]:
+                assert data["categories"][category] + amount >= rates[category] * min_days - 0.01
+
+
+def test_plan_is_read_only_and_apply_posts_one_balanced_entry():
+    data = {"categories": {"food": 10.0, "venue": 500.0}, "remaining": 510.0,
+            "expenses": [{"category": "food", "amount": 30.0, "timestamp": (NOW - timedelta(days=d)).isoformat()}
+                         for d in range(7)]}
+    data["forecast_state"] = OverspendForecaster.rebuild(data["expenses"])
+    plan = AutoRebalancer.plan(data, 3.0, NOW)
+    assert data["categories"] == {"food": 10.0, "venue": 500.0}
+    assert [(t["from"], t["to"]) for t in plan["transfers"]] == [("venue", "food")]
+
+    entry = AutoRebalancer.apply(data, plan, "test")
+    moved = plan["transfers"][0]["amount"]
+    assert data["categories"] == {"food": round(10 + moved, 2), "venue": round(500 - moved, 2)}
+    assert data["remaining"] == 510.0
+    assert data["rebalance_log"] == [entry]
+    assert Ledger.entries(data, limit=1)[0]["ref"] == entry["id"]
+    assert Ledger.audit(data)["ok"]
+
+
+def test_shortfall_without_sources_is_reported():
+    data = {"categories": {"food": 5.0, "venue": 0.0}, "remaining": 5.0,
+            "expenses": [{"category": "food", "amount": 50.0, "timestamp": NOW.isoformat()}]}
+    data["forecast_state"] = OverspendForecaster.rebuild(data["expenses"])
+    plan = AutoRebalancer.plan(data, 3.0, NOW)
+    assert plan["transfers"] == []
+    assert plan["unresolved"]["food"] > 0
+
+
+def test_only_opted_in_budgets_rebalance_after_an_expense():
+    data = {"categories": {"food": 10.0, "venue": 500.0}, "remaining": 510.0,
+            "expenses": [{"category": "food", "amount": 30.0, "timestamp": datetime.now().isoformat()}]}
+    data["forecast_state"] = OverspendForecaster.rebuild(data["expenses"])
+    assert AutoRebalancer.after_expense(data, data["expenses"][0]) is None
+
+    data["auto_rebalance"] = {"enabled": True, "min_days_left": 3.0}
+    entry = AutoRebalancer.after_expense(data, data["expenses"][0])
+    assert entry["trigger"] == "expense food $30.00"
+    assert data["categories"]["food"] > 10.0
+    assert sum(data["categories"].values()) == pytest.approx(510.0)
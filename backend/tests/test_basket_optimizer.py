@@ -0,0 +1,24 @@
+from app.services.basket_optimizer import BasketOptimizer
+
+
+def _product(name, price, score):
+    return {"name": name, "vendor": f"{name} Co", "price": price, "ai_score": score}
+
+
+CANDIDATES = {
+    "food": [_product("Pizza", 20.0, 80), _product("Salad", 12.0, 60)],
+    "decor": [_product("Balloons", 15.0, 70)]
+}
+
+
+def test_picks_best_set_within_budget():
+    plan = BasketOptimizer.optimize(CANDIDATES, {"food": 25, "decor": 20}, 30)
+    assert [item["name"] for item in plan["items"]] == ["Salad", "Balloons"]
+    assert plan["total_cost"] == 27.0
+
+
+def test_overspent_budget_gives_an_empty_plan():
+    plan = BasketOptimizer.optimize(CANDIDATES, {"food": -5, "decor": 20}, -5)
+    assert plan["items"] == []
+    assert plan["total_cost"] == 0
+    assert plan["unfilled_categories"] == ["food", "decor"]
@@ -0,0 +1,12 @@
+import os
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("httpx")
+
+
+def test_every_route_has_a_benchmark_scenario():
+    with mock.patch.dict(os.environ):  # the runner sets its own environment on import
+        from benchmarks.run import uncovered_routes
+    assert uncovered_routes() == []
@@ -0,0 +1,75 @@
+import pytest
+
+from app.services.budget_splitter import (
+    DEFAULT_SHARES, AllocationStats, optimize_allocation, overspend_risk, split_budget
+)
+
+
+def _history(budgets):
+    """Stats after the given past budgets: [(total, {category: spent})]"""
+    stats = AllocationStats.empty()
+    for total, spent in budgets:
+        old = {"total_budget": total, "categories": dict.fromkeys(DEFAULT_SHARES, 0.0),
+               "expenses": [{"category": c, "amount": a} for c, a in spent.items()],
+               "allocation_stats": {**stats, "current": dict(spent)}}
+        stats = AllocationStats.carry_over(old)
+    return stats
+
+
+def test_without_history_the_split_follows_the_default_shares():
+    allocation = split_budget(1000)
+    assert sum(allocation.values()) == 1000
+    assert sorted(allocation, key=allocation.get, reverse=True) == ["food", "venue", "decor", "misc"]
+    for category, share in DEFAULT_SHARES.items():
+        assert allocation[category] == pytest.approx(1000 * share, abs=0.01)
+
+
+def test_history_moves_money_to_where_clubs_spend():
+    stats = _history([(1000, {"food": 200, "venue": 600, "decor": 50, "misc": 50})] * 6)
+    allocation = split_budget(1000, stats=stats)
+    assert sum(allocation.values()) == pytest.approx(1000, abs=0.001)
+    assert allocation["venue"] > allocation["food"] > allocation["decor"]
+    assert stats["budgets"] == 6
+
+
+def test_equal_margin_and_lower_risk_than_the_default_split():
+    stats = _history([(1000, {"food": 500, "venue": 200, "decor": 150, "misc": 100})] * 4)
+    distribution = AllocationStats.distribution(stats, list(DEFAULT_SHARES))
+    allocation = optimize_allocation(1000, distribution)
+    risk = overspend_risk(allocation, 1000, distribution)
+    # One shared z: every category has (close to) the same chance of overspending
+    assert max(risk.values()) - min(risk.values()) < 0.01
+    default_risk = overspend_risk({c: 1000 * s for c, s in DEFAULT_SHARES.items()}, 1000, distribution)
+    assert max(risk.values()) < max(default_risk.values())
+
+
+def test_constraints_are_respected_and_checked():
+    allocation = split_budget(500, constraints={"food": {"min": 300}, "misc": {"max": 10}})
+    assert allocation["food"] >= 300 and allocation["misc"] <= 10
+    assert sum(allocation.values()) == pytest.approx(500, abs=0.001)
+    assert all(round(a, 2) == a for a in allocation.values())
+
+    with pytest.raises(ValueError):
+        split_budget(100, constraints={"food": {"min": 80}, "venue": {"min": 30}})
+    with pytest.raises(ValueError):
+        split_budget(100, constraints={c: {"max": 20} for c in DEFAULT_SHARES})
+    with pytest.raises(ValueError):
+        split_budget(100, constraints={"food": {"min": 50, "max": 40}})
+
+
+def test_custom_categories_share_what_the_defaults_leave():
+    allocation = split_budget(900, categories=["food", "prizes", "transport"])
+    assert set(allocation) == {"food", "prizes", "transport"}
+    assert allocation["prizes"] == pytest.approx(allocation["transport"], abs=0.01)
+    assert sum(allocation.values()) == pytest.approx(900, abs=0.001)
+
+
+def test_expense_updates_keep_current_spending():
+    data = {"expenses": [{"category": "food", "amount": 10.0}]}
+    AllocationStats.state_of(data)
+    expense = {"category": "venue", "amount": 25.0}
+    data["expenses"].append(expense)
+    AllocationStats.observe_expense(data, expense)
+    assert data["allocation_stats"]["current"] == {"food": 10.0, "venue": 25.0}
+    AllocationStats.forget_expense(data, expense)
+    assert data["allocation_stats"]["current"]["venue"] == 0.0
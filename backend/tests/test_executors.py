@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+
+import pytest
+
+from app.services import executors
+from app.services.executors import json_response, run_cpu, run_io
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def _where(suffix=""):
+    return threading.current_thread().name, request_id.get(), suffix
+
+
+def test_work_runs_on_its_pool_with_the_callers_context():
+    async def scenario():
+        request_id.set("REQ-1")
+        return await run_io(_where, suffix="io"), await run_cpu(_where)
+
+    (io_thread, io_request, suffix), (cpu_thread, cpu_request, _) = asyncio.run(scenario())
+    assert io_thread.startswith("storage") and cpu_thread.startswith("cpu")
+    assert io_request == cpu_request == "REQ-1" and suffix == "io"
+
+
+def test_errors_reach_the_caller():
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(run_cpu(lambda: 1 / 0))
+
+
+def test_the_loop_keeps_serving_during_blocking_work():
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        await run_cpu(time.sleep, 0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert len(ticks) >= 5
+
+
+def test_json_response_matches_the_stdlib_encoding():
+    content = {"budget_id": "BUD-1", "remaining": 12.5, "expenses": [{"amount": 1.0, "vendor": "Café"}],
+               "flags": None, "nested": {"ok": True}}
+    response = asyncio.run(json_response(content, status_code=201))
+    assert response.status_code == 201 and response.media_type == "application/json"
+    assert json.loads(response.body) == content
+
+
+def test_encoder_falls_back_to_the_stdlib(monkeypatch):
+    monkeypatch.setattr(executors, "JSON_ENCODER", "json")
+    name, encode = executors.default_encoder()
+    assert name == "json" and json.loads(encode({"a": [1, 2]})) == {"a": [1, 2]}
+
+    monkeypatch.setattr(executors, "JSON_ENCODER", "orjson")
+    monkeypatch.setattr(executors, "orjson", None)
+    assert executors.default_encoder()[0] == "json"
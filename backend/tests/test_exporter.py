@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db import db
+from app.db.json_stream import JSONStreamReader
+from app.services import exporter
+from app.services.exporter import DATASETS, iter_records, stream_csv, stream_ndjson
+
+EXPENSES = [
+    {"id": "EXP-1", "timestamp": "2026-05-30T23:59:59", "amount": 10.0, "category": "food", "status": "paid"},
+    {"id": "EXP-2", "timestamp": "2026-05-31T00:00:00", "amount": 20.0, "category": "venue"},
+    {"id": "EXP-3", "timestamp": "2026-05-31T23:59:59.5", "amount": 30.0, "category": "food",
+     "verification_flags": ["duplicate"]},
+    {"id": "EXP-4", "timestamp": "2026-06-01T00:00:00", "amount": 40.0, "category": "food"},
+    {"id": "EXP-5", "amount": 50.0, "category": "food"},
+]
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"budget_id": "BUD-1", "expenses": EXPENSES,
+                                "wallet": {"balance": 5.0, "transactions": [{"id": "TXN-1", "amount": 5.0}]}}))
+    monkeypatch.setattr(db, "FILE", str(path))
+    return path
+
+
+def _ids(**filters):
+    return [r["id"] for r in iter_records("expenses", **filters)]
+
+
+def test_date_only_end_covers_the_whole_day(data_file):
+    assert _ids(start="2026-05-31", end="2026-05-31") == ["EXP-2", "EXP-3"]
+    # A datetime end is the last instant included
+    assert _ids(end="2026-05-31T00:00:00") == ["EXP-1", "EXP-2"]
+    assert _ids(start="2026-06-01") == ["EXP-4"]
+
+
+def test_offsets_are_compared_in_local_time(data_file):
+    # Local midnight written as UTC
+    start = datetime(2026, 5, 31).astimezone().astimezone(timezone.utc).isoformat()
+    assert _ids(start=start, end="2026-05-31") == ["EXP-2", "EXP-3"]
+
+
+def test_filters_and_undated_records(data_file):
+    assert _ids() == ["EXP-1", "EXP-2", "EXP-3", "EXP-4", "EXP-5"]
+    assert _ids(category="food") == ["EXP-1", "EXP-3", "EXP-4", "EXP-5"]
+    assert _ids(status="paid") == ["EXP-1"]
+    assert "EXP-5" not in _ids(end="2030-01-01")
+    assert [r["id"] for r in iter_records("wallet-transactions")] == ["TXN-1"]
+    assert list(iter_records("money-requests")) == []
+
+
+def test_csv_and_ndjson_stream_in_chunks(data_file, monkeypatch):
+    monkeypatch.setattr(exporter, "CHUNK_RECORDS", 2)
+    columns = DATASETS["expenses"]["columns"]
+    chunks = list(stream_csv(iter_records("expenses"), columns))
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [r["id"] for r in rows] == [e["id"] for e in EXPENSES]
+    assert rows[2]["verification_flags"] == '["duplicate"]' and rows[4]["timestamp"] == ""
+
+    chunks = list(stream_ndjson(iter_records("expenses")))
+    assert len(chunks) == 3
+    assert [json.loads(line) for line in "".join(chunks).splitlines()] == EXPENSES
+
+
+def test_missing_file_exports_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "FILE", str(tmp_path / "missing.json"))
+    assert list(iter_records("expenses")) == []
+    assert list(stream_csv(iter_records("expenses"), ["id"])) == ["id\r\n"]
+
+
+def test_stream_reader_matches_json_load_across_chunk_boundaries():
+    rng = random.Random(5)
+    records = [{"id": i, "amount": rng.uniform(-1e6, 1e6), "big": rng.random() * 10 ** rng.randint(-8, 20),
+                "note": rng.choice(['', 'a "quoted" ]} value', "café \\ done", None, True])} for i in range(200)]
+    document = json.dumps({"skip": {"nested": [1, [2, {"expenses": []}]]}, "expenses": records}, indent=1)
+    for chunk_size in (1, 7, 64):
+        reader = JSONStreamReader(io.StringIO(document), chunk_size=chunk_size)
+        assert list(reader.array_at(["expenses"])) == records
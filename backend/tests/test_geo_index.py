@@ -0,0 +1,68 @@
+import math
+import random
+
+from app.services.geo_index import EARTH_RADIUS_KM, GridIndex, haversine_batch
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _vendors(seed, n, lat=43.65, lon=-79.38, spread=0.6):
+    rng = random.Random(seed)
+    return [(lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread, spread), f"V{i}") for i in range(n)]
+
+
+def _index(vendors, cell_km=2.0):
+    index = GridIndex(cell_km)
+    for lat, lon, name in vendors:
+        index.insert(lat, lon, name)
+    return index
+
+
+def test_haversine_batch_matches_the_formula():
+    points = [(45.5, -73.57), (49.28, -123.12), (43.65, -79.38)]
+    expected = [_haversine(43.65, -79.38, lat, lon) for lat, lon in points]
+    assert all(math.isclose(a, b, abs_tol=1e-9) for a, b in zip(haversine_batch(43.65, -79.38, points), expected))
+    assert math.isclose(expected[0], 504, rel_tol=0.01)  # Toronto - Montreal
+
+
+def test_within_radius_matches_brute_force():
+    vendors = _vendors(1, 500)
+    index = _index(vendors)
+    for origin_lat, origin_lon, radius in ((43.65, -79.38, 5), (43.9, -79.0, 12.5), (43.1, -80.2, 40), (60, 10, 3)):
+        expected = sorted((_haversine(origin_lat, origin_lon, lat, lon), name)
+                          for lat, lon, name in vendors if _haversine(origin_lat, origin_lon, lat, lon) <= radius)
+        found = index.within_radius(origin_lat, origin_lon, radius)
+        assert [name for _, name in found] == [name for _, name in expected]
+        assert all(math.isclose(d, e, abs_tol=1e-9) for (d, _), (e, _) in zip(found, expected))
+
+
+def test_nearest_matches_brute_force():
+    vendors = _vendors(2, 300)
+    for cell_km in (0.5, 2.0, 25.0):
+        index = _index(vendors, cell_km)
+        for origin_lat, origin_lon in ((43.65, -79.38), (44.5, -78.0), (10.0, 10.0)):
+            by_distance = sorted((_haversine(origin_lat, origin_lon, lat, lon), name) for lat, lon, name in vendors)
+            for k in (1, 7, 300, 301):
+                found = index.nearest(origin_lat, origin_lon, k)
+                assert [name for _, name in found] == [name for _, name in by_distance[:k]]
+
+
+def test_predicate_filters_before_ranking():
+    vendors = _vendors(3, 200)
+    index = _index(vendors)
+    even = lambda name: int(name[1:]) % 2 == 0
+    found = index.nearest(43.65, -79.38, 5, predicate=even)
+    expected = sorted((_haversine(43.65, -79.38, lat, lon), name) for lat, lon, name in vendors if even(name))[:5]
+    assert [name for _, name in found] == [name for _, name in expected]
+    assert all(even(name) for _, name in index.within_radius(43.65, -79.38, 30, predicate=even))
+
+
+def test_empty_index_and_non_positive_k():
+    assert GridIndex().nearest(0, 0, 3) == []
+    assert _index(_vendors(4, 10)).nearest(43.65, -79.38, 0) == []
+    assert GridIndex().within_radius(0, 0, 10) == []
@@ -0,0 +1,86 @@
+import asyncio
+
+from app.db import db
+from app.db.store import DataStore
+from app.routes.budget import BudgetCreate, create_budget
+from app.routes.expenses import ExpenseCreate, add_expense
+from app.services import insight_cache as insight_cache_module
+from app.services.insight_cache import InsightCache
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        return {"version": data.get("state_version"), "call": self.calls}
+
+
+def test_hit_until_the_version_changes():
+    cache, compute = InsightCache(), Counter()
+    data = {"budget_id": "BUD-1", "state_version": 3}
+    assert cache.get_or_compute(data, compute) == cache.get_or_compute(data, compute) == {"version": 3, "call": 1}
+    data["state_version"] = 4
+    assert cache.get_or_compute(data, compute) == {"version": 4, "call": 2}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_entries_expire_after_max_age(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(insight_cache_module.time, "monotonic", lambda: clock[0])
+    cache, compute = InsightCache(max_age=60), Counter()
+    data = {"budget_id": "BUD-1", "state_version": 1}
+    cache.get_or_compute(data, compute)
+    clock[0] += 59
+    cache.get_or_compute(data, compute)
+    clock[0] += 2
+    cache.get_or_compute(data, compute)
+    assert compute.calls == 2
+
+
+def test_least_recently_used_budget_is_evicted():
+    cache, compute = InsightCache(max_entries=2), Counter()
+    budgets = [{"budget_id": f"BUD-{i}", "state_version": 1} for i in range(3)]
+    cache.get_or_compute(budgets[0], compute)
+    cache.get_or_compute(budgets[1], compute)
+    cache.get_or_compute(budgets[0], compute)  # now the most recent
+    cache.get_or_compute(budgets[2], compute)
+    assert list(cache.entries) == ["BUD-0", "BUD-2"]
+    cache.invalidate(budgets[0])
+    assert list(cache.entries) == ["BUD-2"]
+
+
+def test_slow_compute_does_not_replace_newer_insights():
+    cache = InsightCache()
+    old = {"budget_id": "BUD-1", "state_version": 1}
+    new = {"budget_id": "BUD-1", "state_version": 2}
+
+    def slow(data):
+        # A newer state is cached while this one is being computed
+        cache.get_or_compute(new, lambda d: "new")
+        return "old"
+
+    assert cache.get_or_compute(old, slow) == "old"
+    assert cache.entries["BUD-1"]["value"] == "new"
+
+
+def test_every_committed_write_changes_the_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "FILE", str(tmp_path / "data.json"))
+    store = DataStore(max_delay_ms=1)
+
+    async def scenario():
+        versions = []
+        async with store.write() as data:
+            await create_budget(BudgetCreate(total_budget=100, categories=["food"]), data)
+        for amount in (1, 2):
+            async with store.read() as data:
+                versions.append(data["state_version"])
+            async with store.write() as data:
+                await add_expense(ExpenseCreate(amount=amount, category="food"), data)
+        async with store.read() as data:
+            versions.append(data["state_version"])
+        return versions
+
+    versions = asyncio.run(scenario())
+    assert versions == sorted(set(versions))
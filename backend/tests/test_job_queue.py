@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from app.services.job_queue import InMemoryJobStore, JobQueue, SQLiteJobStore
+
+
+async def _finished(queue, job_ids, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        jobs = [await asyncio.to_thread(queue.get, job_id) for job_id in job_ids]
+        if all(job["status"] in ("completed", "failed") for job in jobs):
+            return jobs
+        assert asyncio.get_running_loop().time() < deadline, jobs
+        await asyncio.sleep(0.01)
+
+
+def _job(job_id, status, priority=5):
+    now = datetime.now().isoformat()
+    return {"id": job_id, "kind": "echo", "priority": priority, "status": status, "payload": {"n": job_id},
+            "result": None, "error": None, "created_at": now, "updated_at": now}
+
+
+def test_lower_priority_numbers_run_first_in_submission_order():
+    ran = []
+    release = threading.Event()
+
+    def handler(payload, job_id, resumed):
+        if payload["n"] == "first":
+            release.wait(5)
+        ran.append(payload["n"])
+        return {"n": payload["n"]}
+
+    async def scenario():
+        queue = JobQueue(InMemoryJobStore(), concurrency=1)
+        queue.register("echo", handler)
+        jobs = [await queue.submit("echo", {"n": "first"}, priority=9)]
+        await asyncio.sleep(0.05)  # the only worker is busy with it
+        for n, priority in (("low", 7), ("high-a", 1), ("mid", 4), ("high-b", 1)):
+            jobs.append(await queue.submit("echo", {"n": n}, priority=priority))
+        release.set()
+        finished = await _finished(queue, [job["id"] for job in jobs])
+        await queue.stop()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert ran == ["first", "high-a", "high-b", "mid", "low"]
+    assert all(job["status"] == "completed" and job["payload"] is None for job in finished)
+
+
+def test_failed_job_records_the_error():
+    def handler(payload, job_id, resumed):
+        raise ValueError("unreadable")
+
+    async def scenario():
+        queue = JobQueue(InMemoryJobStore(), concurrency=1)
+        queue.register("echo", handler)
+        job = await queue.submit("echo", {})
+        [failed] = await _finished(queue, [job["id"]])
+        await queue.stop()
+        return failed
+
+    failed = asyncio.run(scenario())
+    assert failed["status"] == "failed"
+    assert failed["error"] == {"status_code": 500, "detail": "unreadable"}
+
+
+def test_only_the_most_recent_finished_jobs_are_kept():
+    store = InMemoryJobStore(max_finished=2)
+    for n in range(5):
+        store.create(_job(f"J{n}", "queued"))
+    for n in range(4):
+        store.update(f"J{n}", status="completed" if n % 2 else "failed")
+
+    assert store.get("J0") is None and store.get("J1") is None
+    assert store.get("J2")["status"] == "failed"
+    assert store.get("J3")["status"] == "completed"
+    assert store.get("J4")["status"] == "queued"  # unfinished jobs are never pruned
+
+
+def test_sqlite_jobs_queued_or_running_at_restart_are_resumed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    before = SQLiteJobStore(path)
+    before.create(_job("QUEUED", "queued"))
+    before.create(_job("RUNNING", "queued"))
+    before.update("RUNNING", status="running")
+    before.create(_job("DONE", "queued"))
+    before.update("DONE", status="completed", result={"n": "DONE"}, payload=None)
+    before.conn.close()
+
+    ran = []
+
+    def handler(payload, job_id, resumed):
+        ran.append((job_id, resumed))
+        return {"n": payload["n"]}
+
+    async def scenario():
+        queue = JobQueue(SQLiteJobStore(path), concurrency=2)
+        queue.register("echo", handler)
+        queue.start()
+        finished = await _finished(queue, ["QUEUED", "RUNNING", "DONE"])
+        await queue.stop()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert sorted(ran) == [("QUEUED", True), ("RUNNING", True)]
+    assert [job["result"] for job in finished] == [{"n": "QUEUED"}, {"n": "RUNNING"}, {"n": "DONE"}]
+    assert SQLiteJobStore(path).unfinished() == []
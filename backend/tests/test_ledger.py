@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.budget import BudgetCreate, create_budget
+from app.routes.expenses import ExpenseCreate, FundReallocation, add_expense, reallocate_funds
+from app.routes.payment import InteracTransfer, SettleExpense, send_interac, settle_expense
+from app.services.ledger import WALLET, Ledger, category_account, interac_account, settled_account, spent_account
+
+
+def _budget(total=300.0, categories=("food", "venue", "misc")):
+    data = {}
+    asyncio.run(create_budget(BudgetCreate(total_budget=total, categories=list(categories)), data))
+    return data
+
+
+def _expense(data, amount, category="food"):
+    return asyncio.run(add_expense(ExpenseCreate(amount=amount, category=category), data))
+
+
+def test_every_entry_sums_to_zero():
+    data = _budget()
+    _expense(data, 10.005)
+    _expense(data, 33.333, "venue")
+    asyncio.run(reallocate_funds(FundReallocation(from_category="misc", to_category="food", amount=5.555), data))
+    asyncio.run(send_interac(InteracTransfer(recipient_email="a@example.com", amount=7.777), data))
+    asyncio.run(settle_expense(SettleExpense(expense_id="1", recipient_email="b@example.com"), data))
+
+    entries = data["ledger"]["entries"]
+    assert [e["kind"] for e in entries] == ["budget", "expense", "expense", "reallocation", "interac_transfer", "settlement"]
+    for entry in entries:
+        assert round(sum(p["amount"] for p in entry["postings"]), 2) == 0
+        assert all(round(p["amount"], 2) == p["amount"] for p in entry["postings"])
+    assert Ledger.audit(data)["ok"]
+
+
+def test_expense_records_match_the_ledger_rounding():
+    data = _budget()
+    remaining = data["remaining"]
+    _expense(data, 10.005)
+    _expense(data, 0.014, "venue")
+
+    amounts = [e["amount"] for e in data["expenses"]]
+    assert amounts == [round(10.005, 2), 0.01]
+    assert Ledger.balance(data, spent_account("food")) == amounts[0]
+    assert Ledger.balance(data, spent_account("venue")) == amounts[1]
+    assert data["remaining"] == round(remaining - sum(amounts), 2)
+    assert data["remaining"] == round(sum(data["categories"].values()), 2)
+
+
+def test_category_may_be_overdrawn_while_remaining_covers_it():
+    data = _budget(total=100.0, categories=("food", "venue"))
+    food = data["categories"]["food"]
+    _expense(data, food + 10)
+
+    assert data["categories"]["food"] == round(-10, 2)
+    assert Ledger.audit(data)["ok"]
+    with pytest.raises(HTTPException) as error:
+        _expense(data, data["remaining"] + 1, "venue")
+    assert error.value.status_code == 400
+
+
+def test_wallet_is_never_overdrawn():
+    data = _budget()
+    entries = len(data["ledger"]["entries"])
+    with pytest.raises(ValueError):
+        Ledger.post(data, "purchase", [(WALLET, interac_account("a@example.com"), 0.01)])
+    assert len(data["ledger"]["entries"]) == entries
+    assert Ledger.balance(data, WALLET) == 0.0
+
+
+def test_settlement_pays_out_once_without_spending_the_budget_again():
+    data = _budget()
+    _expense(data, 20.0)
+    remaining = data["remaining"]
+    settle = SettleExpense(expense_id="0", recipient_email="b@example.com")
+    asyncio.run(settle_expense(settle, data))
+
+    assert data["remaining"] == remaining
+    assert Ledger.balance(data, spent_account("food")) == 20.0
+    assert Ledger.balance(data, settled_account("food")) == -20.0
+    assert Ledger.balance(data, interac_account("b@example.com")) == 20.0
+    assert data["expenses"][0]["status"] == "paid"
+    assert Ledger.balance(data, category_account("food")) == data["categories"]["food"]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(settle_expense(settle, data))
+    assert error.value.status_code == 400
+    assert len(data["transactions"]) == 1
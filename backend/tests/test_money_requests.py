@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import db
+from app.db.store import DataStore
+from app.services import money_requests as money_requests_module
+from app.services.ledger import Ledger
+from app.services.money_requests import DEFAULT_TTL_HOURS, ExpiryScheduler, MoneyRequests
+
+
+def _request(data, ttl_hours, amount=10.0):
+    return MoneyRequests.create(data, "member@example.com", amount, None, ttl_hours=ttl_hours)
+
+
+def test_expire_due_pops_only_due_entries():
+    rng = random.Random(2)
+    data = {}
+    requests = [_request(data, rng.uniform(0.5, 48)) for _ in range(100)]
+    for request in rng.sample(requests, 20):
+        MoneyRequests.transition(data, request["id"], rng.choice(["paid", "declined"]))
+    now = time.time() + 24 * 3600
+    index = data["money_request_index"]
+    due = {rid for rid, expires_at in index["pending"].items() if expires_at <= now}
+    not_due = [entry for entry in index["expiry_heap"] if entry[0] > now]
+
+    assert set(MoneyRequests.expire_due(data, now)) == due
+    # Entries of settled requests that fell due were dropped too; the rest were left alone
+    assert sorted(index["expiry_heap"]) == sorted(not_due)
+    assert all(MoneyRequests.get(data, rid)["status"] == "expired" for rid in due)
+    assert MoneyRequests.next_expiry(data) == min(entry[0] for entry in not_due)
+    assert MoneyRequests.expire_due(data, now) == []
+    assert {r["id"] for r in MoneyRequests.active(data, now)} == {rid for _, rid in not_due} & set(index["pending"])
+
+
+def test_transitions():
+    data = {}
+    paid, declined, overdue = _request(data, 1, amount=25.0), _request(data, 1), _request(data, 1)
+
+    MoneyRequests.transition(data, paid["id"], "paid")
+    assert data["wallet"]["balance"] == 25.0
+    assert data["transactions"][-1]["money_request_id"] == paid["id"]
+    assert Ledger.audit(data)["ok"]
+    MoneyRequests.transition(data, declined["id"], "declined")
+    with pytest.raises(ValueError):
+        MoneyRequests.transition(data, paid["id"], "declined")
+    with pytest.raises(LookupError):
+        MoneyRequests.transition(data, "missing", "paid")
+
+    data["money_request_index"]["pending"][overdue["id"]] = time.time() - 1
+    with pytest.raises(ValueError, match="expired"):
+        MoneyRequests.transition(data, overdue["id"], "paid")
+    assert data["wallet"]["balance"] == 25.0
+    assert [r["status"] for r in data["money_requests"]] == ["paid", "declined", "expired"]
+
+
+def test_history_from_before_the_index():
+    old = (datetime.now() - timedelta(hours=DEFAULT_TTL_HOURS + 1)).isoformat()
+    recent = datetime.now().isoformat()
+    data = {"money_requests": [
+        {"id": "old", "status": "pending", "timestamp": old},
+        {"id": "recent", "status": "pending", "timestamp": recent},
+        {"id": "done", "status": "paid", "timestamp": recent}
+    ]}
+    # Read-only callers get the answer without the index being stored
+    assert [r["id"] for r in MoneyRequests.active(data)] == ["recent"]
+    assert "money_request_index" not in data and MoneyRequests.get(data, "done")["status"] == "paid"
+
+    assert MoneyRequests.expire_due(data) == ["old"]
+    assert "expires_at" in data["money_requests"][1] and "expires_at" not in data["money_requests"][2]
+
+
+def test_scheduler_expires_requests_when_they_fall_due(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "FILE", str(tmp_path / "data.json"))
+    store = DataStore(max_delay_ms=1)
+    monkeypatch.setattr(money_requests_module, "store", store)
+    scheduler = ExpiryScheduler()
+
+    async def scenario():
+        async with store.write() as data:
+            short = _request(data, 0.1 / 3600)
+            long = _request(data, 1)
+        scheduler.wake()
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        async with store.read() as data:
+            return MoneyRequests.get(data, short["id"])["status"], MoneyRequests.get(data, long["id"])["status"]
+
+    assert asyncio.run(scenario()) == ("expired", "pending")
+    assert scheduler.expired == 1
+    assert db.load_data()["money_requests"][0]["status"] == "expired"
@@ -0,0 +1,81 @@
+import base64
+import os
+
+from app.services.ocr_pipeline import OCRCache, ReceiptPipeline, StubOCREngine, detect_kind
+
+RECEIPT = b"Hall Rental Co\nConference room\nTotal: $250.00\n"
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")
+
+
+class CountingEngine(StubOCREngine):
+    def __init__(self):
+        self.calls = 0
+
+    def extract(self, doc):
+        self.calls += 1
+        return super().extract(doc)
+
+
+def _pipeline(tmp_path, engine=None, **cache_options):
+    return ReceiptPipeline(engine or CountingEngine(), OCRCache(str(tmp_path / "ocr_cache"), **cache_options))
+
+
+def _upload(content, filename="receipt.txt"):
+    return {"file_base64": base64.b64encode(content).decode(), "filename": filename, "category": None}
+
+
+def test_detect_kind_from_magic_bytes():
+    assert detect_kind(memoryview(b"%PDF-1.7 ...")) == "pdf"
+    assert detect_kind(memoryview(b"\x89PNG\r\n\x1a\n")) == "png"
+    assert detect_kind(memoryview(b"\xff\xd8\xff\xe0")) == "jpeg"
+    assert detect_kind(memoryview(RECEIPT)) == "text"
+
+
+def test_same_bytes_skip_ocr_under_any_filename(tmp_path):
+    pipeline = _pipeline(tmp_path)
+    first = pipeline.run(_upload(RECEIPT))
+    second = pipeline.run(_upload(RECEIPT, "renamed.txt"))
+
+    assert pipeline.engine.calls == 1
+    assert (first["ocr"]["cached"], second["ocr"]["cached"]) == (False, True)
+    assert first["ocr"]["content_sha256"] == second["ocr"]["content_sha256"]
+    assert (first["amount"], first["category"]) == (second["amount"], second["category"]) == (250.0, "venue")
+    assert second["filename"] == "renamed.txt"
+
+
+def test_cache_survives_a_restart_and_is_keyed_by_engine_version(tmp_path):
+    _pipeline(tmp_path).run(_upload(RECEIPT))
+
+    restarted = _pipeline(tmp_path)
+    assert restarted.run(_upload(RECEIPT))["ocr"]["cached"]
+    assert restarted.engine.calls == 0
+
+    upgraded = CountingEngine()
+    upgraded.version = "2"
+    assert not _pipeline(tmp_path, upgraded).run(_upload(RECEIPT))["ocr"]["cached"]
+    assert upgraded.calls == 1
+
+
+def test_unreadable_uploads_are_not_cached(tmp_path):
+    pipeline = _pipeline(tmp_path)
+    for _ in range(2):
+        result = pipeline.run(_upload(PIXEL_PNG, "scan.png"))
+        assert not result["ocr"]["cached"] and result["amount"] == 0
+    assert pipeline.engine.calls == 2
+
+
+def test_text_uploads_go_straight_to_parsing(tmp_path):
+    pipeline = _pipeline(tmp_path)
+    result = pipeline.run({"receipt_text": RECEIPT.decode(), "filename": "r.txt", "category": "misc"})
+    assert result["amount"] == 250.0 and result["category"] == "misc"
+    assert "ocr" not in result and pipeline.engine.calls == 0
+
+
+def test_disk_cache_is_capped(tmp_path):
+    pipeline = _pipeline(tmp_path, max_entries=2, max_files=10)
+    for i in range(25):
+        pipeline.run(_upload(RECEIPT + f"#{i}".encode()))
+    files = os.listdir(tmp_path / "ocr_cache")
+    assert 9 <= len(files) <= 10
+    assert len(pipeline.cache.entries) == 2
@@ -0,0 +1,73 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+from app.services.overspend_predictor import OverspendForecaster
+
+START = datetime(2026, 9, 1, 12)
+
+
+def _expense(day, amount, category="food"):
+    return {"amount": amount, "category": category, "timestamp": (START + timedelta(days=day)).isoformat()}
+
+
+def _close(a, b):
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_incremental_updates_match_a_full_fit_in_any_order():
+    rng = random.Random(3)
+    expenses = [_expense(rng.uniform(0, 40), rng.uniform(1, 80), rng.choice(["food", "venue"])) for _ in range(200)]
+    fitted = OverspendForecaster.rebuild(expenses)
+
+    data = {"expenses": []}
+    for expense in rng.sample(expenses, len(expenses)):
+        data["expenses"].append(expense)
+        OverspendForecaster.observe_expense(data, expense)
+    for category, cat in fitted.items():
+        incremental = data["forecast_state"][category]
+        assert _close(incremental["t"], cat["t"]) and _close(incremental["t0"], cat["t0"])
+        # Out-of-order expenses are folded in with the same weights the full fit gives them
+        assert math.isclose(incremental["s"], cat["s"], rel_tol=1e-9)
+        assert math.isclose(incremental["q"], cat["q"], rel_tol=1e-9)
+
+
+def test_forget_removes_what_observe_added():
+    expenses = [_expense(day, 10.0 + day) for day in range(10)]
+    data = {"expenses": list(expenses)}
+    OverspendForecaster.state_of(data)
+    removed = data["expenses"].pop(4)
+    OverspendForecaster.forget_expense(data, removed)
+
+    expected = OverspendForecaster.rebuild(data["expenses"])["food"]
+    assert math.isclose(data["forecast_state"]["food"]["s"], expected["s"], rel_tol=1e-9)
+    assert math.isclose(data["forecast_state"]["food"]["q"], expected["q"], rel_tol=1e-9)
+
+
+def test_steady_spending_gives_its_daily_rate():
+    expenses = [_expense(day, 10.0) for day in range(60)]
+    state = OverspendForecaster.rebuild(expenses)
+    rate = OverspendForecaster.rate(state["food"], state["food"]["t"])
+    assert math.isclose(rate["daily_rate"], 10.0, rel_tol=0.1)
+    assert 0 < rate["daily_rate_std"] < rate["daily_rate"]
+
+
+def test_forecast_dates_bracket_the_depletion_date():
+    data = {"categories": {"food": 50.0, "venue": 500.0, "decor": 20.0},
+            "expenses": [_expense(day, 10.0) for day in range(30)] + [_expense(day, 5.0, "venue") for day in range(30)]}
+    now = START + timedelta(days=29)
+    forecasts = OverspendForecaster.forecast(data, now)
+
+    assert [f["category"] for f in forecasts] == ["food", "venue"]  # decor has no spending
+    food = forecasts[0]
+    assert 4 <= food["days_left"] <= 6
+    assert food["depletion_date_earliest"] <= food["depletion_date"] <= food["depletion_date_latest"]
+    assert food["risk_level"] in ("high", "medium")
+    assert forecasts[1]["risk_level"] == "low"
+
+
+def test_undated_expenses_are_not_forecast():
+    expenses = [_expense(0, 10.0), {"amount": 99.0, "category": "food"}, {"amount": 5.0, "category": "venue",
+                                                                           "timestamp": "not a date"}]
+    state = OverspendForecaster.rebuild(expenses)
+    assert list(state) == ["food"] and state["food"]["s"] == 10.0
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.profiler import ProfilerMiddleware, RequestProfiler
+
+
+def busy_handler(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+async def app(scope, receive, send):
+    busy_handler(float(scope["query_string"] or 0))
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+def profiler():
+    profiler = RequestProfiler(slow_ms=0, interval_ms=1)
+    yield profiler
+    profiler.stop()
+
+
+def _get(profiler, path, seconds=0.0):
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": str(seconds).encode(), "headers": []}
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    asyncio.run(ProfilerMiddleware(app, profiler)(scope, receive, send))
+
+
+def test_nothing_runs_until_switched_on(profiler):
+    _get(profiler, "/budget", 0.05)
+    assert profiler.thread is None and profiler.list_profiles() == []
+
+
+def test_slow_requests_keep_their_samples(profiler):
+    profiler.slow_ms = 40
+    _get(profiler, "/fast")
+    _get(profiler, "/slow", 0.1)
+
+    [profile] = profiler.all_profiles()
+    assert profile["path"] == "/slow" and profile["reason"] == "slow" and profile["status"] == 201
+    assert profile["duration_ms"] >= 100 and profile["sample_count"] > 0
+    assert any("busy_handler (test_profiler.py:" in frame for stack in profile["samples"] for frame in stack)
+    assert profiler.in_flight == 0
+
+    collapsed = RequestProfiler.collapsed([profile])
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in collapsed.splitlines()) == profile["sample_count"]
+    assert all(line.startswith("MainThread;") for line in collapsed.splitlines())
+
+
+def test_session_takes_the_next_matching_requests(profiler):
+    session = profiler.start_session(requests=2, path_prefix="/budget")
+    for path in ("/admin/profiler", "/wallet", "/budget", "/budget/dashboard", "/budget"):
+        _get(profiler, path)
+    profiles = profiler.list_profiles()
+    assert [p["path"] for p in profiles] == ["/budget/dashboard", "/budget"]
+    assert {p["session_id"] for p in profiles} == {session["id"]}
+    assert profiler.session is None
+
+
+def test_session_window_ends(profiler):
+    profiler.start_session(seconds=60)
+    _get(profiler, "/budget")
+    profiler.session["until"] = time.monotonic() - 1
+    _get(profiler, "/budget")
+    assert len(profiler.list_profiles()) == 1 and profiler.describe_session() is None
+
+
+def test_idle_threads_are_not_sampled(profiler):
+    ready = threading.Event()
+    waiter = threading.Thread(target=ready.wait, name="idle-waiter")
+    worker = threading.Thread(target=busy_handler, args=(0.2,), name="busy-worker")
+    waiter.start()
+    worker.start()
+    time.sleep(0.05)  # both threads settled in their loops
+    try:
+        profiler.sample()
+    finally:
+        ready.set()
+        waiter.join()
+        worker.join()
+    # The sampling thread leaves itself out too
+    assert {stack[0] for _, stack in profiler.samples} == {"busy-worker"}
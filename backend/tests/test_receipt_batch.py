@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.routes import expenses
+from app.routes.budget import BudgetCreate, create_budget
+from app.services.receipt_batch import ReceiptBatchProcessor
+from app.services.receipt_fingerprint import ReceiptFingerprintIndex
+
+
+def _receipt(i, total):
+    return {"receipt_text": f"Fresh Mart #{i}\nGrocery bundle\nTotal: ${total:.2f}", "filename": f"r{i}.txt",
+            "category": "food", "file_base64": None}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setenv("RECEIPT_WORKERS", "2")
+    ReceiptBatchProcessor.shutdown()
+    yield
+    ReceiptBatchProcessor.shutdown()
+
+
+async def _collect(receipts):
+    return [pair async for pair in ReceiptBatchProcessor.process_stream(receipts)]
+
+
+def test_every_receipt_is_yielded_once_with_its_own_result(pool):
+    receipts = [_receipt(i, 10 + i) for i in range(12)]
+    receipts[5] = {"receipt_text": None, "file_base64": "not base64!", "filename": "bad.png", "category": None}
+
+    pairs = asyncio.run(_collect(receipts))
+    assert sorted(index for index, _ in pairs) == list(range(12))
+    results = dict(pairs)
+    assert results[5]["filename"] == "bad.png" and "error" in results[5]
+    for index in set(results) - {5}:
+        assert results[index]["filename"] == f"r{index}.txt"
+        assert results[index]["amount"] == 10 + index
+
+
+def test_batch_is_logged_in_upload_order(pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(expenses, "receipt_index", ReceiptFingerprintIndex(str(tmp_path / "fingerprints.jsonl")))
+    data = {}
+    asyncio.run(create_budget(BudgetCreate(total_budget=100, categories=["food"]), data))
+    # 60 + 30 fit, then 20 doesn't and 5 still does, whatever order the workers finish in
+    receipts = [_receipt(0, 60), _receipt(1, 30), _receipt(2, 20), _receipt(3, 5)]
+    results = [None] * len(receipts)
+    for index, result in asyncio.run(_collect(receipts)):
+        results[index] = result
+
+    logged, rejected = expenses.commit_receipt_results(data, results)
+    assert [entry["index"] for entry in logged] == [0, 1, 3]
+    assert [entry["index"] for entry in rejected] == [2]
+    assert data["remaining"] == 5.0
+    assert [e["amount"] for e in data["expenses"]] == [60, 30, 5]
@@ -0,0 +1,60 @@
+import pytest
+
+from app.services.receipt_fingerprint import ReceiptFingerprintIndex, fingerprint_receipt
+
+RECEIPT = """Campus Coffee Co
+123 College St, Toronto
+Date: {date}
+2x Large Latte        9.50
+1x Blueberry Muffin   3.25
+1x Bagel w/ Cream Cheese 4.75
+Subtotal             17.50
+HST                   2.28
+Total                19.78
+Thank you for visiting!
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ReceiptFingerprintIndex(str(tmp_path / "fingerprints.jsonl"))
+    index.add("EXP-1", fingerprint_receipt(RECEIPT.format(date="2026-10-05"), 19.78), "BUD-1")
+    return index
+
+
+def test_weekly_repeat_is_not_a_duplicate(index):
+    repeat = fingerprint_receipt(RECEIPT.format(date="2026-10-12"), 19.78)
+    assert index.find_duplicate(repeat) is None
+
+
+def test_rescan_of_the_same_receipt_is_a_duplicate(index):
+    rescan = fingerprint_receipt(RECEIPT.format(date="2026-10-05"), 19.78)
+    assert index.find_duplicate(rescan)["match"] == "exact"
+
+
+def test_noisy_rescan_is_a_near_duplicate(index):
+    # OCR dropped the vendor line, so the exact key differs; date and amount still agree
+    noisy = RECEIPT.format(date="2026-10-05").replace("Campus Coffee Co", "Campus Cofee C0")
+    match = index.find_duplicate(fingerprint_receipt(noisy, 19.78))
+    assert match["match"] == "near" and match["expense_id"] == "EXP-1"
+
+
+def test_same_text_with_another_amount_is_not_a_duplicate(index):
+    assert index.find_duplicate(fingerprint_receipt(RECEIPT.format(date="2026-10-05"), 21.50)) is None
+
+
+def test_failed_save_keeps_changes_for_the_next_one(index, tmp_path):
+    index.path = str(tmp_path / "missing" / "dir" / "fingerprints.jsonl")
+    (tmp_path / "missing").write_text("not a directory")
+    with pytest.raises(OSError):
+        index.save()
+
+    index.path = str(tmp_path / "fingerprints.jsonl")
+    index.remove(["EXP-1"])
+    index.save()
+    assert index.unsaved == []
+
+    reloaded = ReceiptFingerprintIndex(index.path)
+    reloaded.load()
+    assert "EXP-1" not in reloaded.signatures
+    assert reloaded.find_duplicate(fingerprint_receipt(RECEIPT.format(date="2026-10-05"), 19.78)) is None
@@ -0,0 +1,55 @@
+import random
+import re
+
+from app.services.receipt_processor import ReceiptProcessor
+
+TOKENS = (ReceiptProcessor._KEYWORDS + ["hallighting", "roomservice", "copyedited", "Total:", "TOTAL", "amount ",
+                                        "sum:", "$", "$$", ".", ":", " ", "\n", "x", "0", "7", "12.5", "12.50",
+                                        "1234.567", "99999.99", "100001.00", "0.00", "45", "$3.", "total: $0.001"])
+
+
+def _reference(text):
+    """The separate scans the single-pass scanner replaced"""
+    text_lower = text.lower()
+    amount = 0.0
+    for pattern in ReceiptProcessor.AMOUNT_PATTERNS:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        if matches:
+            try:
+                value = float(matches[0])
+            except ValueError:
+                continue
+            if 0.01 <= value <= 100000:
+                amount = round(value, 2)
+                break
+    categories = [category for category, keywords in ReceiptProcessor.CATEGORY_KEYWORDS.items()
+                  if any(keyword in text_lower for keyword in keywords)]
+    suspicious = [k for k in ReceiptProcessor.SUSPICIOUS_KEYWORDS if k in text_lower]
+    return amount, categories, suspicious
+
+
+def _scanned(text):
+    scan = ReceiptProcessor.scan_text(text)
+    return scan["amount"], scan["categories"], scan["suspicious_keywords"]
+
+
+def test_single_pass_matches_separate_scans():
+    rng = random.Random(7)
+    for _ in range(2000):
+        text = "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 25)))
+        assert _scanned(text) == _reference(text), text
+
+
+def test_amount_priority_and_bounds():
+    assert ReceiptProcessor.scan_text("Items 41.50\nTax 3.50\nTotal: $45.00")["amount"] == 45.0
+    assert ReceiptProcessor.scan_text("Amount 12\nfee $3.25")["amount"] == 12.0
+    # Out of bounds: fall through to the next pattern
+    assert ReceiptProcessor.scan_text("total: 0\npaid $19.99")["amount"] == 19.99
+    assert ReceiptProcessor.scan_text("ref 123456.00")["amount"] == 0.0
+
+
+def test_overlapping_keywords_are_all_seen():
+    scan = ReceiptProcessor.scan_text("Hallighting rental - photocopy")
+    assert scan["categories"] == ["venue", "decor"]
+    assert scan["suspicious_keywords"] == ["photocopy", "copy"]
+    assert ReceiptProcessor.detect_category_from_text("", ReceiptProcessor.scan_text("")) == "misc"
@@ -0,0 +1,85 @@
+import pytest
+
+from app.services import recommendation_rules
+from app.services.agentic_ai import feedback_engine, recommendation_engine
+from app.services.recommendation_rules import Rule, RuleContext, RuleEngine
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """Test features (counting their computations) registered for one test"""
+    calls = []
+
+    def register(name, fn):
+        def counted(ctx):
+            calls.append(name)
+            return fn(ctx)
+        monkeypatch.setitem(recommendation_rules.FEATURES, name, counted)
+
+    register("t_total", lambda ctx: ctx.data["total"])
+    register("t_half", lambda ctx: ctx["t_total"] / 2)
+    register("t_expensive", lambda ctx: sum(range(10 ** 5)))
+    return calls
+
+
+def test_rules_run_by_priority_then_registration_order(computed):
+    engine = RuleEngine("test")
+    for name, priority in (("c", 30), ("a", 10), ("b1", 20), ("b2", 20)):
+        engine.rule(name, priority)(lambda ctx, name=name: name)
+    assert engine.evaluate(RuleContext({})) == ["a", "b1", "b2", "c"]
+    assert [r["name"] for r in engine.describe()] == ["a", "b1", "b2", "c"]
+
+
+def test_stop_short_circuits_and_skipped_features_are_never_computed(computed):
+    engine = RuleEngine("test")
+    engine.rule("small", 10, requires=["t_total"], stop=True, when=lambda ctx: ctx["t_total"] < 100)(
+        lambda ctx: "small budget")
+    engine.rule("costly", 20, requires=["t_expensive"])(lambda ctx: ctx["t_expensive"] and "costly")
+
+    assert engine.evaluate(RuleContext({"total": 50})) == ["small budget"]
+    assert computed == ["t_total"]
+    assert engine.evaluate(RuleContext({"total": 500})) == ["costly"]
+    stats = {r["name"]: r for r in engine.describe()}
+    assert stats["small"]["evaluations"] == 2 and stats["small"]["fired"] == 1
+    assert stats["costly"]["evaluations"] == 1
+
+
+def test_features_are_computed_once_per_context(computed):
+    engine = RuleEngine("test")
+    engine.rule("one", 10, requires=["t_half"])(lambda ctx: ctx["t_half"])
+    engine.rule("two", 20, requires=["t_half", "t_total"])(lambda ctx: [ctx["t_half"], ctx["t_total"]])
+    ctx = RuleContext({"total": 10})
+    assert engine.evaluate(ctx) == [5.0, 5.0, 10]
+    assert sorted(computed) == ["t_half", "t_total"]
+    assert set(ctx.timings) == {"test.one", "test.two"}
+
+
+def test_failing_rule_is_skipped_and_counted(computed, capsys):
+    engine = RuleEngine("test")
+    engine.rule("broken", 10)(lambda ctx: 1 / 0)
+    engine.rule("fine", 20)(lambda ctx: "ok")
+    assert engine.evaluate(RuleContext({})) == ["ok"]
+    assert {r["name"]: r["errors"] for r in engine.describe()} == {"broken": 1, "fine": 0}
+    assert "Rule broken failed" in capsys.readouterr().out
+
+
+def test_registration_errors(computed):
+    engine = RuleEngine("test")
+    with pytest.raises(ValueError):
+        engine.register(Rule("unknown", 10, lambda ctx: True, lambda ctx: None, requires=["t_missing"]))
+    engine.rule("twice", 10)(lambda ctx: None)
+    with pytest.raises(ValueError):
+        engine.rule("twice", 20)(lambda ctx: None)
+    engine.unregister("twice")
+    assert engine.describe() == []
+
+
+def test_agent_rules_on_budgets():
+    new = {"total_budget": 1000, "remaining": 1000, "categories": {"food": 1000}, "expenses": []}
+    emitted = recommendation_engine.evaluate(RuleContext(new))
+    assert [r["type"] for r in emitted] == ["learning", "optimization"]  # welcome stops the rest
+
+    spent = {**new, "remaining": 0, "categories": {"food": 0},
+             "expenses": [{"amount": 1000, "category": "food", "timestamp": "2026-10-01T10:00:00"}]}
+    assert len(feedback_engine.evaluate(RuleContext(spent))) == 1
+    assert feedback_engine.evaluate(RuleContext(spent))[0].startswith("🚨 Budget depleted")
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.db import db
+from app.db.store import DataStore
+from app.routes.budget import BudgetCreate, create_budget
+from app.routes.expenses import ExpenseCreate, add_expense
+from app.routes.wallet import AddFundsRequest, add_funds
+from app.services import reconciler as reconciler_module
+from app.services.reconciler import Reconciler, apply_fixes, evaluate, scan
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    monkeypatch.setattr(db, "FILE", str(path))
+    monkeypatch.setattr(reconciler_module, "store", DataStore(max_delay_ms=1))
+    return path
+
+
+def _budget():
+    async def build():
+        data = {}
+        await create_budget(BudgetCreate(total_budget=500, categories=["food", "venue"]), data)
+        await add_funds(AddFundsRequest(amount=40), data)
+        for amount, category in ((12.345, "food"), (30, "venue"), (7.5, "food")):
+            await add_expense(ExpenseCreate(amount=amount, category=category), data)
+        return data
+
+    return asyncio.run(build())
+
+
+def _checks(found):
+    return sorted((d["check"], d["subject"]) for d in evaluate(found).listed)
+
+
+def test_consistent_budget_has_no_discrepancies(data_file):
+    db.save_data(_budget())
+    # A tiny chunk size splits every value across reads
+    found = scan(str(data_file), chunk_size=7)
+    assert found["expenses"] == 3 and found["wallet_transactions"] == 1
+    assert found["spent"] == {"food": 19.85, "venue": 30.0}
+    assert evaluate(found).count == 0
+
+
+def test_derived_values_are_repaired_and_raw_records_only_reported(data_file):
+    data = _budget()
+    data["categories"]["food"] += 5
+    data["remaining"] += 5
+    data["ledger"]["balances"]["wallet"] = 1.0
+    data["expenses"][0]["amount"] = 99.0
+    db.save_data(data)
+
+    found = scan(str(data_file))
+    findings = evaluate(found)
+    assert {("category_projection", "food"), ("ledger_balance_cache", "wallet"),
+            ("spent_vs_expenses", "food")} <= set(_checks(found))
+    assert not next(d for d in findings.listed if d["check"] == "spent_vs_expenses")["repairable"]
+
+    apply_fixes(data, findings.fixes)
+    db.save_data(data)
+    # Only the edited expense record is left: it disagrees with the ledger and the remaining total
+    assert {check for check, _ in _checks(scan(str(data_file)))} == {
+        "spent_vs_expenses", "remaining_vs_records"}
+
+
+def test_run_repairs_through_the_store(data_file):
+    data = _budget()
+    data["remaining"] = 0.0
+    db.save_data(data)
+    reconciler = Reconciler(interval_s=0)
+
+    async def scenario():
+        first = await reconciler.run(repair=True)
+        second = await reconciler.run()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["status"] == "discrepancies" and first["repair"] == {"status": "applied", "fixed": 1}
+    assert second["status"] == "ok" and second["repair"] is None
+    assert [r["id"] for r in reconciler.list_reports()] == [second["id"], first["id"]]
+    assert db.load_data()["remaining"] == data["categories"]["food"] + data["categories"]["venue"]
+
+
+def test_repair_is_skipped_when_the_budget_changed(data_file, monkeypatch):
+    data = _budget()
+    data["remaining"] = 0.0
+    db.save_data(data)
+    store = reconciler_module.store
+    scanned = reconciler_module.scan
+
+    def scan_then_write(path, chunk_size):
+        found = scanned(path, chunk_size)
+        store.run_from_thread(lambda data: data.setdefault("notes", []).append("edited"))
+        return found
+
+    monkeypatch.setattr(reconciler_module, "scan", scan_then_write)
+
+    async def scenario():
+        async with store.read():  # the store is bound to this loop, as it is in the app
+            pass
+        return await Reconciler(interval_s=0).run(repair=True)
+
+    report = asyncio.run(scenario())
+    assert report["repair"]["status"] == "skipped"
+    assert db.load_data()["remaining"] == 0.0
+
+
+def test_missing_or_unreadable_file(data_file):
+    reconciler = Reconciler(interval_s=0)
+    assert asyncio.run(reconciler.run())["status"] == "no_data"
+    data_file.write_text("[]")
+    report = asyncio.run(reconciler.run())
+    assert report["status"] == "error" and reconciler.get(report["id"]) is report
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.budget import DashboardFields, get_dashboard
+from app.routes.payment import get_transactions, list_money_requests
+from app.services.money_requests import MoneyRequests
+
+
+def _body(response):
+    return json.loads(response.body)
+
+
+def _document():
+    data = {"total_budget": 100.0, "categories": {"food": 100.0}, "expenses": [], "remaining": 100.0,
+            "ledger": {"entries": [], "balances": {}}}
+    request = MoneyRequests.create(data, "a@example.com", 20.0, "dues")
+    request["reminder_state"] = {"sent": 2}  # not declared by MoneyRequestRecord
+    return data
+
+
+def test_money_request_lists_leave_out_undeclared_fields():
+    data = _document()
+    listed = _body(asyncio.run(list_money_requests(data, None)))["money_requests"]
+    assert len(listed) == 1
+    assert "reminder_state" not in listed[0]
+    assert listed[0]["amount"] == 20.0
+
+    listed = _body(asyncio.run(get_transactions(data, frozenset({"amount", "reminder_state"}))))
+    assert listed["money_requests"] == [{"amount": 20.0}]
+
+
+def test_dashboard_leaves_out_internal_state():
+    data = _document()
+    dashboard = _body(asyncio.run(get_dashboard(data, frozenset({"total_budget", "ledger"}))))
+    assert dashboard == {"total_budget": 100.0}
+
+    dashboard = _body(asyncio.run(get_dashboard(data, None)))
+    assert "ledger" not in dashboard and "money_request_index" not in dashboard
+    assert [r["amount"] for r in dashboard["money_requests"]] == [20.0]
+
+
+def test_unknown_selected_field_is_rejected():
+    selected_fields = DashboardFields.__metadata__[0].dependency
+    assert asyncio.run(selected_fields("total_budget, remaining")) == {"total_budget", "remaining"}
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(selected_fields("total_budget,ledger"))
+    assert error.value.status_code == 400
+
+
+def test_empty_dashboard_keeps_the_selection():
+    dashboard = _body(asyncio.run(get_dashboard({}, frozenset({"feedback"}))))
+    assert dashboard == {"feedback": "No budget created yet"}
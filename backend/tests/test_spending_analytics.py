@@ -0,0 +1,62 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import spending_analytics
+from app.services.spending_analytics import ColumnCache, ExpenseColumns, SpendingAnalytics, wall_seconds
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def _expenses():
+    return [
+        {"amount": 40.0, "category": "food", "timestamp": (NOW - timedelta(days=20)).isoformat()},
+        {"amount": 10.0, "category": "decor", "timestamp": (NOW - timedelta(days=3)).isoformat() + "+02:00"},
+        {"amount": 5.5, "category": "food", "processed_at": (NOW - timedelta(days=1)).isoformat() + "Z"},
+        {"amount": 2.0, "category": "misc"}  # undated
+    ]
+
+
+def test_totals_velocity_and_rolling_windows():
+    result = SpendingAnalytics.analyze(_expenses(), columns=ExpenseColumns(_expenses()), now=NOW)
+    assert result["category_totals"] == {"food": 45.5, "decor": 10.0, "misc": 2.0}
+    assert result["expense_count"] == 4
+    assert result["active_days"] == pytest.approx(19, abs=0.2)
+    assert result["rolling_7d"] == {"food": 5.5, "decor": 10.0, "misc": 0.0}
+    assert result["rolling_30d"]["food"] == 45.5
+
+
+def test_pure_python_path_gives_the_same_result(monkeypatch):
+    with_default = SpendingAnalytics.analyze(_expenses(), columns=ExpenseColumns(_expenses()), now=NOW)
+    monkeypatch.setattr(spending_analytics, "np", None)
+    pure = SpendingAnalytics.analyze(_expenses(), columns=ExpenseColumns(_expenses()), now=NOW)
+    assert pure["category_totals"] == with_default["category_totals"]
+    assert pure["rolling_7d"] == with_default["rolling_7d"]
+    assert pure["active_days"] == pytest.approx(with_default["active_days"])
+
+
+def test_bulk_timestamps_match_wall_seconds():
+    pytest.importorskip("numpy")
+    times = [
+        "2026-10-05T12:00:00", "2026-10-05T12:00:00.123456+02:00", "2026-10-05T12:00:00-05:30",
+        "2026-10-05T12:00:00Z", "2026-10-05 08:00:00+0100", "2026-10-05", "", None
+    ]
+    for value, expected in zip(spending_analytics._wall_seconds_array(times), map(wall_seconds, times)):
+        assert (math.isnan(value) and math.isnan(expected)) or value == expected
+
+
+def test_column_cache_extends_on_append_and_rebuilds_on_delete():
+    cache = ColumnCache()
+    expenses = _expenses()
+    first = cache.of(expenses)
+    assert cache.of(expenses) is first
+
+    expenses.append({"amount": 7.0, "category": "venue", "timestamp": NOW.isoformat()})
+    extended = cache.of(expenses)
+    assert cache.rebuilds == 1 and extended.count == 5 and first.count == 4
+    assert extended.categories[-1] == "venue"
+
+    expenses.pop(1)
+    assert cache.of(expenses).count == 4
+    assert cache.rebuilds == 2
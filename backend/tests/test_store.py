@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.db import db
+from app.db.store import DataStore
+from app.routes.budget import BudgetCreate, create_budget
+from app.routes.expenses import ExpenseCreate, add_expense
+from app.services import metrics as metrics_module
+from app.services.metrics import DB_WRITE_SECONDS, metrics
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "FILE", str(tmp_path / "data.json"))
+    return DataStore(max_delay_ms=20)
+
+
+async def _write(store, handler, payload):
+    async with store.write() as data:
+        return await handler(payload, data)
+
+
+def test_failed_writer_does_not_fail_its_batch(store):
+    async def scenario():
+        await _write(store, create_budget, BudgetCreate(total_budget=1000, categories=["food", "venue"]))
+        return await asyncio.gather(
+            _write(store, add_expense, ExpenseCreate(amount=1, category="food")),
+            _write(store, add_expense, ExpenseCreate(amount=1, category="venue")),
+            _write(store, add_expense, ExpenseCreate(amount=1, category="nope")),
+            _write(store, add_expense, ExpenseCreate(amount=1, category="food")),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert [isinstance(r, HTTPException) for r in results] == [False, False, True, False]
+    assert results[2].status_code == 400
+
+    saved = db.load_data()
+    assert saved["remaining"] == 997.0
+    assert len(saved["expenses"]) == 3
+
+
+def test_writer_that_raises_after_changing_is_undone(store):
+    async def scenario():
+        await _write(store, create_budget, BudgetCreate(total_budget=1000, categories=["food", "venue"]))
+
+        async def partial(data):
+            data["expenses"].append({"amount": 5, "category": "food"})
+            data["categories"]["food"] -= 5
+            del data["categories"]["venue"]
+            data["remaining"] = 0
+            raise ValueError("halfway")
+
+        valid = asyncio.ensure_future(_write(store, add_expense, ExpenseCreate(amount=2, category="food")))
+        with pytest.raises(ValueError):
+            async with store.write() as data:
+                await partial(data)
+        await valid
+        async with store.read() as data:
+            return data["remaining"], len(data["expenses"]), sorted(data["categories"])
+
+    remaining, expenses, categories = asyncio.run(scenario())
+    assert remaining == 998.0
+    assert expenses == 1
+    assert categories == ["food", "venue"]
+    assert db.load_data()["remaining"] == 998.0
+
+
+def test_batch_write_is_labelled_background(store, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(DB_WRITE_SECONDS, "series", {})
+
+    class Route:
+        path = "/add-expense"
+
+    async def scenario():
+        metrics_module._request_scope.set({"route": Route()})
+        assert metrics_module.current_route() == "/add-expense"
+        await _write(store, create_budget, BudgetCreate(total_budget=100, categories=["food"]))
+
+    asyncio.run(scenario())
+    assert list(DB_WRITE_SECONDS.series) == [("background",)]
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app.services.vendor_aggregator import VendorAdapter, VendorPriceAggregator
+from benchmarks.stub_vendors import StubVendor
+
+
+@pytest.fixture
+def stubs():
+    started = []
+
+    def start(name, delays=None):
+        vendor = StubVendor(name, delays).start()
+        started.append(vendor)
+        return vendor
+
+    yield start
+    for vendor in started:
+        vendor.stop()
+
+
+def _run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_fan_out_costs_the_slowest_vendor(stubs):
+    vendors = [stubs(f"v{i}", [0.2]) for i in range(3)]
+    aggregator = VendorPriceAggregator([VendorAdapter(v.name, v.url, timeout=1.0, hedge_after=1.0) for v in vendors])
+
+    async def scenario():
+        try:
+            await aggregator.aggregate("food")  # warm-up: client and connections
+            start = time.perf_counter()
+            result = await aggregator.aggregate("food")
+            return result, time.perf_counter() - start
+        finally:
+            await aggregator.close()
+
+    result, elapsed = _run(scenario)
+    assert set(result["vendors"].values()) == {"live"}
+    assert len(result["quotes"]) == 15
+    assert elapsed < 0.45  # sequential calls would take 0.6 s
+
+
+def test_slow_attempt_is_beaten_by_the_hedge(stubs):
+    vendor = stubs("hedge", [0.0, 0.8, 0.0])
+    aggregator = VendorPriceAggregator([VendorAdapter(vendor.name, vendor.url, timeout=1.0, hedge_after=0.1)])
+
+    async def scenario():
+        try:
+            await aggregator.aggregate("food")
+            start = time.perf_counter()
+            result = await aggregator.aggregate("food")
+            return result, time.perf_counter() - start
+        finally:
+            await aggregator.close()
+
+    result, elapsed = _run(scenario)
+    assert result["vendors"] == {"hedge": "live"}
+    assert vendor.hits == 3 and elapsed < 0.5
+
+
+def test_vendor_past_its_deadline_is_served_from_cache(stubs):
+    vendor = stubs("slow", [0.0, 1.0])
+    aggregator = VendorPriceAggregator([VendorAdapter(vendor.name, vendor.url, timeout=0.3, hedge_after=1.0)])
+
+    async def scenario():
+        try:
+            assert (await aggregator.aggregate("food"))["vendors"] == {"slow": "live"}
+            start = time.perf_counter()
+            result = await aggregator.aggregate("food")
+            return result, time.perf_counter() - start
+        finally:
+            await aggregator.close()
+
+    result, elapsed = _run(scenario)
+    assert result["vendors"] == {"slow": "cache"} and result["quotes"]
+    assert elapsed < 0.5
+
+
+def test_circuit_breaker_lets_one_probe_through(stubs):
+    vendor = stubs("flaky", [0.2])
+    adapter = VendorAdapter(vendor.name, vendor.url, timeout=1.0, hedge_after=1.0)
+    adapter.breaker.reset_timeout = 0.3
+    aggregator = VendorPriceAggregator([adapter])
+
+    async def scenario():
+        try:
+            vendor.failing = True
+            for _ in range(adapter.breaker.failure_threshold):
+                await aggregator.aggregate("food")
+            assert adapter.breaker.state == "open"
+            hits = vendor.hits
+            await aggregator.aggregate("food")
+            assert vendor.hits == hits, "an open breaker called the vendor"
+
+            # Half-open: of 20 concurrent searches only one reaches the (still failing) vendor
+            await asyncio.sleep(adapter.breaker.reset_timeout)
+            await asyncio.gather(*(aggregator.aggregate("food") for _ in range(20)))
+            assert vendor.hits == hits + 1
+            assert adapter.breaker.state == "open"
+
+            # The next probe succeeds and closes it again
+            vendor.failing = False
+            await asyncio.sleep(adapter.breaker.reset_timeout)
+            results = await asyncio.gather(*(aggregator.aggregate("food") for _ in range(20)))
+            assert vendor.hits == hits + 2
+            assert adapter.breaker.state == "closed"
+            assert sum(r["vendors"]["flaky"] == "live" for r in results) == 1
+        finally:
+            await aggregator.close()
+
+    _run(scenario)
+
+
+def test_catalog_stub_prices_are_merged_into_search(stubs):
+    from app.services.personal_shopper import PersonalShopperAI
+    from benchmarks.stub_vendors import PRICE_FACTOR, catalog_by_vendor
+
+    catalog = catalog_by_vendor()
+    vendors = [StubVendor(name, catalog=catalog[name]).start() for name in catalog if "food" in catalog[name]]
+    aggregator = VendorPriceAggregator([VendorAdapter(v.name, v.url, timeout=1.0, hedge_after=1.0) for v in vendors])
+
+    async def scenario():
+        try:
+            return await aggregator.aggregate("food")
+        finally:
+            await aggregator.close()
+            for v in vendors:
+                v.stop()
+
+    products = PersonalShopperAI.search_products("food", {}, _run(scenario)["quotes"])
+    catalog_prices = {p["name"]: p["price"] for p in PersonalShopperAI.PRODUCT_DATABASE["food"]}
+    assert products and all(p["live_price"] for p in products)
+    assert all(p["price"] == round(catalog_prices[p["name"]] * PRICE_FACTOR, 2) for p in products)
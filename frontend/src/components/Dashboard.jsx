@@ -190,7 +190,23 @@ export default function Dashboard({ refresh }) {
         throw new Error(error.detail || `HTTP error! status: ${response.status}`)
       }
       
-      const result = await response.json()
+      // Receipt is verified in the background; poll the job until it finishes
+      const queued = await response.json()
+      let job = null
+      do {
+        await new Promise(resolve => setTimeout(resolve, 500))
+        const jobResponse = await fetch(`${API_URL}${queued.status_url}`)
+        job = await jobResponse.json()
+        if (!jobResponse.ok) {
+          throw new Error(job.detail || `HTTP error! status: ${jobResponse.status}`)
+        }
+      } while (job.status === "queued" || job.status === "running")
+      
+      if (job.status !== "completed" || !job.result) {
+        throw new Error(job.error?.detail || "Receipt processing failed")
+      }
+      
+      const result = job.result
       setVerificationResult(result)
       
       // Show verification result
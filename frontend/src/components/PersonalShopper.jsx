@@ -51,7 +51,7 @@ export default function PersonalShopper({ onPurchaseComplete }) {
     }
   }
 
-  const handlePurchase = async (productIndex) => {
+  const handlePurchase = async (product) => {
     if (!confirm("AI will autonomously make this purchase. Continue?")) {
       return
     }
@@ -63,7 +63,8 @@ export default function PersonalShopper({ onPurchaseComplete }) {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
-          product_index: productIndex,
+          quote_id: results.quote_id,
+          product_id: product.product_id,
           category,
           auto_add_expense: true,
           use_wallet: useWallet
@@ -309,7 +310,7 @@ export default function PersonalShopper({ onPurchaseComplete }) {
                     
                     <button 
                       className="purchase-btn"
-                      onClick={() => handlePurchase(idx)}
+                      onClick={() => handlePurchase(product)}
                       disabled={purchasing}
                     >
                       {purchasing ? "Processing..." : "🤖 Let AI Purchase This"}